@@ -0,0 +1,346 @@
+"""Benchmarks for tmenu's render, input and startup paths.
+
+Usage::
+
+    python benchmarks/run.py                       # full run, table on stdout
+    python benchmarks/run.py --quick               # skip the 1M-item cases
+    python benchmarks/run.py --json out.json       # also write results
+    python benchmarks/run.py --compare old.json    # ratios against a saved run
+
+Menus are drawn on a fake ``stdscr`` so ``_draw`` and key handling are
+timed without a terminal. Time to first frame is measured end to end by
+running ``python -m tmenu`` on a pty and waiting for the separator row.
+"""
+
+from __future__ import annotations
+
+import argparse
+import curses
+import json
+import os
+import platform
+import pty
+import select
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tmenu import TMenu, load_config  # noqa: E402
+from tmenu import title as title_mod  # noqa: E402
+from tmenu.types import ColorScheme  # noqa: E402
+
+COLORS = ColorScheme(normal=0, selected=1, prompt=2)
+SEPARATOR = "─".encode()
+
+
+class FakeScreen:
+    """Headless stand-in for a curses window."""
+
+    def __init__(self, h: int = 40, w: int = 120):
+        self.size = (h, w)
+
+    def getmaxyx(self):
+        return self.size
+
+    def addstr(self, y, x, text, attr=0):
+        pass
+
+    def erase(self):
+        pass
+
+    def move(self, y, x):
+        pass
+
+    def clrtoeol(self):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+
+def _stats(name: str, samples: list[float], **params) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "name": name,
+        **params,
+        "unit": "ms",
+        "samples": len(ms),
+        "min": round(ms[0], 4),
+        "median": round(statistics.median(ms), 4),
+        "p95": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "mean": round(statistics.fmean(ms), 4),
+    }
+
+
+def _time(
+    fn: Callable[[], object],
+    repeat: int,
+    setup: Callable[[], object] | None = None,
+) -> list[float]:
+    """Time *repeat* calls of *fn*, each after an untimed *setup*."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# ── Render and input ─────────────────────────────────────────────────────────
+
+
+def bench_keystrokes(sizes: list[int], repeat: int) -> list[dict]:
+    curses.doupdate = lambda: None  # nothing to flush on a fake screen
+    results = []
+    for n in sizes:
+        items = [
+            f"item {i:07d} /usr/share/applications/app-{i}.desktop" for i in range(n)
+        ]
+        menu = TMenu(items)
+        screen = FakeScreen()
+        menu._draw(screen, COLORS)
+
+        def move():
+            menu._handle_key("j")
+            menu._draw(screen, COLORS)
+
+        results.append(_stats("draw/move", _time(move, repeat), items=n))
+
+        # Each sample types the next character of "app-12" onto its prefix,
+        # so every keystroke filters a candidate set that still matches.
+        menu._handle_key("/")
+        query = "app-12"
+        typed = min(repeat, len(query) if n >= 1_000_000 else repeat)
+        pos = iter(range(typed))
+        at = 0
+
+        def back_to_prefix():
+            nonlocal at
+            at = next(pos) % len(query)
+            menu.set_query(query[:at])
+            menu._draw(screen, COLORS)
+
+        def type_char():
+            menu._handle_key(query[at])
+            menu._draw(screen, COLORS)
+
+        samples = _time(type_char, typed, back_to_prefix)
+        results.append(_stats("draw/search", samples, items=n))
+    return results
+
+
+def bench_figlet(repeat: int) -> list[dict]:
+    results = []
+    if title_mod._figlet_module() is None:
+        return results
+    with tempfile.TemporaryDirectory() as cache:
+        os.environ["XDG_CACHE_HOME"] = cache
+
+        def cold():
+            title_mod._memory.clear()
+            title_mod.render_figlet("tmenu", "standard", 60, disk_cache=False)
+
+        def disk():
+            title_mod._memory.clear()
+            title_mod.render_figlet("tmenu", "standard", 60)
+
+        def memory():
+            title_mod.render_figlet("tmenu", "standard", 60)
+
+        results.append(_stats("figlet/render", _time(cold, repeat)))
+        title_mod.render_figlet("tmenu", "standard", 60)
+        results.append(_stats("figlet/disk-cache", _time(disk, repeat)))
+        results.append(_stats("figlet/memory", _time(memory, repeat)))
+    return results
+
+
+# ── Config loading ───────────────────────────────────────────────────────────
+
+
+def _write_tree(root: Path, files: int, items: int) -> Path:
+    menus = root / "menus"
+    menus.mkdir()
+    for f in range(files):
+        lines = ["[menu]"]
+        lines += [f'"Entry {f}-{i}" = "echo {f} {i}"' for i in range(items)]
+        lines += [f"[submenu.sub{f}]", f'"Nested {f}" = "true"']
+        (menus / f"menu{f:04d}.toml").write_text("\n".join(lines) + "\n")
+    config = root / "config.toml"
+    config.write_text(
+        f'[display]\ntitle = "Bench"\ntheme = "nord"\ntheme_dir = "{menus}"\n'
+    )
+    return config
+
+
+def bench_load_config(trees: list[int], repeat: int) -> list[dict]:
+    from tmenu.cache import load_config_cached
+
+    results = []
+    for files in trees:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["XDG_CACHE_HOME"] = os.path.join(tmp, "cache")
+            config = str(_write_tree(Path(tmp), files, 20))
+            samples = _time(lambda: load_config(config), repeat)
+            results.append(_stats("load_config/parse", samples, files=files))
+            load_config_cached(config)
+            samples = _time(lambda: load_config_cached(config), repeat)
+            results.append(_stats("load_config/snapshot", samples, files=files))
+    return results
+
+
+# ── Time to first frame ──────────────────────────────────────────────────────
+
+
+def _first_frame(argv: list[str], stdin: bytes | None, env: dict) -> float:
+    """Seconds from spawn until the menu's separator row is drawn."""
+    t0 = time.perf_counter()
+    pid, fd = pty.fork()
+    if pid == 0:
+        if stdin is not None:
+            r, w = os.pipe()
+            os.write(w, stdin)
+            os.close(w)
+            os.dup2(r, 0)
+        try:
+            os.execvpe(argv[0], argv, env)
+        finally:
+            os._exit(127)
+    elapsed = None
+    out = b""
+    try:
+        while elapsed is None:
+            ready, _, _ = select.select([fd], [], [], 10)
+            if not ready:
+                raise RuntimeError(f"no frame from {argv}")
+            out += os.read(fd, 65536)
+            if SEPARATOR in out:
+                elapsed = time.perf_counter() - t0
+        os.write(fd, b"q")
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            ready, _, _ = select.select([fd], [], [], 0.1)
+            if ready:
+                try:
+                    if not os.read(fd, 65536):
+                        break
+                except OSError:
+                    break
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                pid = 0
+                break
+    finally:
+        if pid:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+        os.close(fd)
+    return elapsed
+
+
+def bench_first_frame(repeat: int) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "TERM": "xterm-256color",
+            "XDG_CACHE_HOME": os.path.join(tmp, "cache"),
+            "XDG_CONFIG_HOME": os.path.join(tmp, "config"),
+            "PYTHONPATH": str(ROOT),
+        }
+        config = Path(tmp) / "config.toml"
+        config.write_text(
+            '[display]\ntitle = "Bench"\ntheme = "nord"\n'
+            '[menu]\nOne = "true"\nTwo = "true"\n'
+        )
+        python = [sys.executable, "-m", "tmenu"]
+        lines = "".join(f"line {i}\n" for i in range(1000)).encode()
+
+        _first_frame(python + ["-c", str(config)], None, env)  # warm caches
+        samples = [
+            _first_frame(python + ["-c", str(config)], None, env) for _ in range(repeat)
+        ]
+        results.append(_stats("first_frame/config", samples))
+        samples = [_first_frame(python, lines, env) for _ in range(repeat)]
+        results.append(_stats("first_frame/stdin", samples, items=1000))
+    return results
+
+
+# ── Reporting ────────────────────────────────────────────────────────────────
+
+
+def _key(result: dict) -> tuple:
+    return tuple(
+        (k, v)
+        for k, v in result.items()
+        if k not in ("unit", "samples", "min", "median", "p95", "mean")
+    )
+
+
+def _print_table(results: list[dict], baseline: dict[tuple, dict]) -> None:
+    for r in results:
+        params = " ".join(f"{k}={v}" for k, v in _key(r) if k != "name")
+        line = f"{r['name']:<22} {params:<14} median {r['median']:>10.3f} ms"
+        line += f"   p95 {r['p95']:>10.3f} ms"
+        old = baseline.get(_key(r))
+        if old and old["median"]:
+            line += f"   x{r['median'] / old['median']:.2f} vs baseline"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--quick", action="store_true", help="Skip 1M-item cases")
+    parser.add_argument("--repeat", type=int, default=30, help="Samples per case")
+    parser.add_argument("--json", metavar="FILE", help="Write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Baseline JSON to compare")
+    parser.add_argument(
+        "--no-pty", action="store_true", help="Skip time-to-first-frame"
+    )
+    args = parser.parse_args()
+
+    sizes = [10, 10_000] if args.quick else [10, 10_000, 1_000_000]
+    results = bench_keystrokes(sizes, args.repeat)
+    results += bench_figlet(args.repeat)
+    results += bench_load_config([10, 200], max(3, args.repeat // 5))
+    if not args.no_pty:
+        results += bench_first_frame(max(3, args.repeat // 5))
+
+    baseline: dict[tuple, dict] = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {_key(r): r for r in json.load(f)["results"]}
+    _print_table(results, baseline)
+
+    if args.json:
+        try:
+            rev = subprocess.run(
+                ["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        except OSError:
+            rev = ""
+        report = {
+            "meta": {
+                "revision": rev,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,47 @@
 #!/usr/bin/env python3
 """Tests for tmenu"""
 
-from tmenu import Action, Config, Selection, TMenu, load_config
+import curses
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from tmenu import (
+    Action,
+    Config,
+    Selection,
+    TMenu,
+    cache,
+    cli,
+)
+from tmenu import client as client_mod
+from tmenu import config as config_mod
+from tmenu import daemon as daemon_mod
+from tmenu import events as events_mod
+from tmenu import headless
+from tmenu import history as history_mod
+from tmenu import lines as lines_mod
+from tmenu import load_config, profiling, theme_index
+from tmenu import title as title_mod
+from tmenu import trace
+from tmenu import watch as watch_mod
+from tmenu import width as width_mod
+from tmenu.client import MessageReader, _request, send_message
+from tmenu.daemon import DaemonState
+from tmenu.events import EventLoop
+from tmenu.fuzzy import FuzzyFilter, fuzzy_match
+from tmenu.generators import Generators, parse_output
+from tmenu.items import ItemKind, ItemList
+from tmenu.lines import MappedLines, PipeLines
+from tmenu.preview import Previewer, clean_output, expand_command
+from tmenu.render import Renderer
+from tmenu.types import ColorScheme
+from tmenu.width import WidthCache, cut, display_width, tail
 
 
 class TestTMenu:
@@ -61,6 +101,1262 @@ class TestHandleSelection:
         menu = TMenu(["item1"])
         assert menu._handle_selection(999) is None
 
+    def test_items_named_like_sentinels(self):
+        menu = TMenu(["Exit", "← Back", "Exit"], is_submenu=True)
+        assert menu._handle_selection(0) == Selection(Action.COMMAND, "Exit")
+        assert menu._handle_selection(1) == Selection(Action.COMMAND, "← Back")
+        assert menu._handle_selection(2) == Selection(Action.COMMAND, "Exit")
+        assert menu.result_index == 2  # duplicates stay distinct
+        assert menu._handle_selection(3) == Selection(Action.BACK)
+        assert menu._handle_selection(4) == Selection(Action.EXIT)
+
+    def test_item_table_columns(self):
+        subs = {"Apps": {"Browser": "firefox"}}
+        menu = TMenu(
+            ["Apps", "Gen", "Missing", "Run"],
+            menu_items={
+                "Apps": "submenu:Apps",
+                "Gen": "gen:ls",
+                "Missing": "submenu:Nope",
+                "Run": "true",
+            },
+            submenus=subs,
+        )
+        items = menu.all_items
+        assert [items.kind(i) for i in range(len(items))] == [
+            ItemKind.SUBMENU,
+            ItemKind.GENERATOR,
+            ItemKind.COMMAND,
+            ItemKind.COMMAND,
+            ItemKind.EXIT,
+        ]
+        assert [items.command(i) for i in range(4)] == [
+            "Apps",
+            "gen:ls",
+            "submenu:Nope",
+            "true",
+        ]
+        assert list(items.commands_of(ItemKind.GENERATOR)) == ["gen:ls"]
+
+    def test_appended_items_are_classified(self):
+        menu = TMenu(["a"], menu_items={"a": "x", "b": "y"})
+        menu.append_items(["b", "c"])
+        assert menu._handle_selection(1) == Selection(Action.COMMAND, "y")
+        assert menu._handle_selection(2) == Selection(Action.COMMAND, "c")
+
+
+class TestStreaming:
+    def test_append_keeps_sentinels_last(self):
+        menu = TMenu(["a"], is_submenu=True)
+        menu.append_items(["b", "c"])
+        assert menu.all_items == ["a", "b", "c", "← Back", "Exit"]
+
+    def test_append_shifts_selected_sentinel(self):
+        menu = TMenu(["a"])
+        menu.selected_index = menu.all_items.index("Exit")
+        menu.append_items(["b"])
+        assert menu.all_items[menu.selected_index] == "Exit"
+
+
+class TestFuzzy:
+    def test_subsequence_match(self):
+        m = fuzzy_match("foo/bar.py", "fb")
+        assert m is not None
+        assert m.positions == [0, 4]
+        assert fuzzy_match("foo", "fb") is None
+
+    def test_boundary_beats_inner_match(self):
+        assert fuzzy_match("foo-bar", "fb").score > fuzzy_match("xfoxbx", "fb").score
+
+    def test_smart_case(self):
+        assert fuzzy_match("readme", "ReA") is None
+        assert fuzzy_match("ReadMe", "RM") is not None
+        assert fuzzy_match("ReadMe", "rm") is not None
+
+    def test_stable_order_for_equal_scores(self):
+        f = FuzzyFilter(["ab1", "xyz", "ab2", "ab3"])
+        assert f.set_query("ab") == [0, 2, 3]
+
+    def test_incremental_stack(self):
+        f = FuzzyFilter(["apple", "banana", "grape", "apricot"])
+        f.set_query("ap")
+        narrowed = f.set_query("apr")
+        assert narrowed == [3]
+        assert len(f._stack) == 2
+        assert f.set_query("ap") == [0, 3, 2]
+        assert len(f._stack) == 1
+        assert f.set_query("") is None
+
+    def test_extend_updates_levels(self):
+        items = ["apple", "grape"]
+        f = FuzzyFilter(items)
+        f.set_query("ap")
+        f.set_query("app")
+        items.append("applet")
+        f.extend(3)
+        assert f.results == [0, 2]
+        f.set_query("ap")
+        assert 2 in f.results
+
+
+class TestMenuFilter:
+    def test_query_filters_view_and_keeps_exit(self):
+        menu = TMenu(["firefox", "files", "htop"])
+        menu.set_query("fi")
+        assert menu._count() == 3
+        assert menu._handle_selection(1) == Selection(Action.COMMAND, "files")
+        assert menu._handle_selection(2) == Selection(Action.EXIT)
+
+    def test_search_keys(self):
+        menu = TMenu(["alpha", "beta"])
+        menu.searching = True
+        for ch in "bt":
+            assert menu._handle_search_key(ch)
+        assert menu.query == "bt"
+        assert menu._handle_search_key(127)
+        assert menu.query == "b"
+        assert menu._handle_search_key("\x1b")
+        assert not menu.searching and menu.query == ""
+        assert menu._count() == 3
+
+    def test_streamed_items_are_filtered(self):
+        menu = TMenu(["alpha"])
+        menu.set_query("be")
+        menu.append_items(["beta", "gamma"])
+        assert menu._handle_selection(0) == Selection(Action.COMMAND, "beta")
+
+
+class FakeScreen:
+    """Minimal stand-in for a curses window that records writes."""
+
+    def __init__(self, h: int = 24, w: int = 80):
+        self.size = (h, w)
+        self.writes: list[tuple[int, int, str]] = []
+        self.erased = 0
+
+    def getmaxyx(self):
+        return self.size
+
+    def addstr(self, y, x, text, attr=0):
+        self.writes.append((y, x, text))
+
+    def erase(self):
+        self.erased += 1
+
+    def move(self, y, x):
+        pass
+
+    def clrtoeol(self):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+
+@pytest.fixture
+def screen(monkeypatch):
+    monkeypatch.setattr(curses, "doupdate", lambda: None)
+    return FakeScreen()
+
+
+COLORS = ColorScheme(normal=0, selected=1, prompt=2)
+
+
+class TestRenderer:
+    def test_unchanged_frame_writes_nothing(self, screen):
+        out = Renderer(screen)
+        for _ in range(2):
+            out.addstr(1, 0, "hello")
+            out.commit()
+        assert screen.erased == 1
+        assert out.rows_written == 0
+
+    def test_selection_move_redraws_two_rows(self, screen):
+        menu = TMenu(["a", "b", "c"], title="T")
+        menu._draw(screen, COLORS)
+        screen.writes.clear()
+        menu._move_down()
+        menu._draw(screen, COLORS)
+        assert {y for y, _, _ in screen.writes} == {
+            menu._positions[0].y,
+            menu._positions[1].y,
+        }
+        assert screen.erased == 1
+
+    def test_unprintable_shown_as_replacement(self, screen):
+        out = Renderer(screen)
+        out.addstr(0, 0, "a\udcffb\nc\td")
+        out.commit()
+        assert screen.writes == [(0, 0, "a\ufffdb\ufffdc d")]
+
+    def test_mouse_hit_test_by_row(self, screen):
+        menu = TMenu(["a", "b", "c"])
+        menu._draw(screen, COLORS)
+        row = menu._positions[2]
+        menu._handle_mouse(curses.BUTTON1_CLICKED, row.x_start, row.y)
+        assert menu.selected_index == 2
+        assert menu._handle_mouse(curses.BUTTON1_CLICKED, 0, row.y + 5) is None
+        assert menu.selected_index == 2
+        assert menu._handle_mouse(
+            curses.BUTTON1_DOUBLE_CLICKED, row.x_start, menu._positions[1].y
+        ) == Selection(Action.COMMAND, "b")
+
+    def test_resize_forces_full_repaint(self, screen):
+        menu = TMenu(["a"])
+        menu._draw(screen, COLORS)
+        screen.size = (30, 100)
+        menu._draw(screen, COLORS)
+        assert screen.erased == 2
+
+    def test_layout_computed_once_per_size(self, screen, monkeypatch):
+        menu = TMenu(["a", "b"], title="T")
+        calls = []
+        render = menu._render_title
+        monkeypatch.setattr(
+            menu, "_render_title", lambda w: calls.append(w) or render(w)
+        )
+        for _ in range(3):
+            menu._move_down()
+            menu._draw(screen, COLORS)
+        assert calls == [60]
+        screen.size = (24, 40)
+        menu._draw(screen, COLORS)
+        assert calls == [60, 36]
+        assert menu._layout.title == ((9, 19, "T"),)
+
+
+class TestDisplayWidth:
+    def test_wide_and_zero_width_characters(self):
+        assert display_width("abc") == 3
+        assert display_width("日本語") == 6
+        assert display_width("e\u0301") == 1  # e + combining acute
+        assert display_width("\U0001f600") == 2
+        assert cut("日本語", 5) == (2, 4)
+        assert cut("e\u0301x", 1) == (2, 1)
+        assert tail("/日本語", 5) == "本語" and tail("/abc", 2) == "bc"
+        assert display_width("a\tb") == 3  # a tab is drawn as one space
+
+    def test_widths_measured_once(self, monkeypatch):
+        calls = []
+        real = width_mod.display_width
+        monkeypatch.setattr(
+            width_mod, "display_width", lambda t: calls.append(t) or real(t)
+        )
+        cache = WidthCache(["日本語テキスト", "ok"])
+        for _ in range(3):
+            assert cache.fit(0, 5) == ("日本", 4)
+            assert cache.width(1) == 2
+        assert calls == ["日本語テキスト", "ok"]
+
+    def test_draw_truncates_by_columns(self, screen):
+        screen.size = (24, 14)
+        menu = TMenu(["日本語のテキスト", "plain"], config=Config(width=14))
+        menu.selected_index = 1
+        menu._draw(screen, COLORS)
+        rows = {y: text for y, _, text in screen.writes}
+        row = rows[menu._positions[0].y]
+        assert row == "日本語の"  # 8 columns: a 10-column menu less its margin
+        assert display_width(rows[menu._positions[1].y]) == 10
+
+    def test_search_prompt_keeps_tail_by_columns(self, screen):
+        screen.size = (24, 14)
+        menu = TMenu(["a"], config=Config(width=14))
+        menu.searching = True
+        menu.query = "日本語のテキスト"
+        menu._draw(screen, COLORS)
+        prompt = next(t for _, _, t in screen.writes if t.endswith(" "))
+        assert prompt == "テキスト "
+
+
+class CountingFiglet:
+    renders = 0
+
+    def __init__(self, font, width):
+        self.font = font
+
+    def renderText(self, text):
+        CountingFiglet.renders += 1
+        return f"<{text}:{self.font}>\n"
+
+
+class TestTitleCache:
+    @pytest.fixture(autouse=True)
+    def _figlet(self, monkeypatch):
+        monkeypatch.setattr(title_mod, "_memory", {})
+        fake = type("pyfiglet", (), {"Figlet": CountingFiglet})
+        monkeypatch.setattr(title_mod, "_figlet_module", lambda: fake)
+        CountingFiglet.renders = 0
+
+    def test_memoized_across_menus(self):
+        cfg = Config(figlet=True, figlet_cache=False)
+        for _ in range(3):
+            menu = TMenu(["a"], config=cfg, title="Hi")
+            assert menu._render_title() == ("<Hi:standard>",)
+            menu._render_title()
+        assert CountingFiglet.renders == 1
+
+    def test_disk_cache_survives_process_cache(self, monkeypatch):
+        assert title_mod.render_figlet("Hi", "slant", 60) == ("<Hi:slant>",)
+        monkeypatch.setattr(title_mod, "_memory", {})
+        assert title_mod.render_figlet("Hi", "slant", 60) == ("<Hi:slant>",)
+        assert CountingFiglet.renders == 1
+
+    def test_width_is_part_of_key(self):
+        title_mod.render_figlet("Hi", "standard", 40, disk_cache=False)
+        title_mod.render_figlet("Hi", "standard", 80, disk_cache=False)
+        assert CountingFiglet.renders == 2
+
+
+class TestStartup:
+    def test_heavy_modules_are_lazy(self):
+        code = (
+            "import sys, tmenu; print('pyfiglet' in sys.modules, 'x256' in sys.modules)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        assert out.stdout.split() == ["False", "False"]
+
+    def test_profile_phases(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiling, "_phases", [])
+        f = tmp_path / "config.toml"
+        f.write_text('[display]\ntheme = "nord"\n')
+        load_config(str(f))
+        names = [p.name for p in profiling.phases()]
+        assert "load_theme" in names
+        assert "load_custom_menus" in names
+
+
+class TestConfigCache:
+    @pytest.fixture
+    def counted(self, monkeypatch):
+        calls = []
+        real = cache.load_config
+
+        def counting(*args):
+            calls.append(args)
+            return real(*args)
+
+        monkeypatch.setattr(cache, "load_config", counting)
+        return calls
+
+    def _write(self, tmp_path, body):
+        f = tmp_path / "config.toml"
+        f.write_text(body)
+        return str(f)
+
+    def test_write_atomic_replaces_or_cleans_up(self, tmp_path):
+        path = tmp_path / "sub" / "data.bin"
+        cache._write_atomic(path, b"one")
+        cache._write_atomic(path, b"two")
+        assert path.read_bytes() == b"two"
+        blocked = tmp_path / "dir"
+        blocked.mkdir()
+        (blocked / "x").touch()  # os.replace cannot overwrite a non-empty dir
+        with pytest.raises(OSError):
+            cache._write_atomic(blocked, b"three")
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["dir", "sub"]
+        assert [p.name for p in path.parent.iterdir()] == ["data.bin"]
+
+    def test_second_load_uses_snapshot(self, tmp_path, counted):
+        path = self._write(tmp_path, '[display]\ntitle = "T"\n[menu]\nA = "a"\n')
+        first = cache.load_config_cached(path)
+        second = cache.load_config_cached(path)
+        assert len(counted) == 1
+        assert first == second
+        assert second[1] == {"A": "a"}
+
+    def test_edit_invalidates(self, tmp_path, counted):
+        path = self._write(tmp_path, '[menu]\nA = "a"\n')
+        cache.load_config_cached(path)
+        self._write(tmp_path, '[menu]\nA = "a"\nB = "b"\n')
+        _, items, _, _ = cache.load_config_cached(path)
+        assert items == {"A": "a", "B": "b"}
+        assert len(counted) == 2
+
+    def test_new_fragment_invalidates(self, tmp_path, counted):
+        menus = tmp_path / "menus"
+        menus.mkdir()
+        (menus / "a.toml").write_text('[menu]\nA = "a"\n')
+        path = self._write(tmp_path, f'[display]\ntheme_dir = "{menus}"\n')
+        cache.load_config_cached(path)
+        (menus / "b.toml").write_text('[menu]\nB = "b"\n')
+        os.utime(menus, ns=(0, 0))
+        _, items, _, _ = cache.load_config_cached(path)
+        assert items == {"A": "a", "B": "b"}
+
+
+class TestThemeIndex:
+    @pytest.fixture(autouse=True)
+    def env(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_DATA_DIRS", str(tmp_path / "data"))
+        monkeypatch.setattr(theme_index, "_memory", None)
+
+    def test_resolved_without_x256_after_first_build(self, tmp_path):
+        f = tmp_path / "config.toml"
+        f.write_text('[display]\ntheme = "nord"\n')
+        config, _, _, _ = load_config(str(f))
+        code = (
+            "import sys; from tmenu import load_config; "
+            f"c = load_config({str(f)!r})[0]; "
+            "print(c.foreground, c.truecolor['foreground'], 'x256' in sys.modules)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=os.environ,
+        )
+        assert out.stdout.split() == [
+            str(config.foreground),
+            str(0xD8DEE9),
+            "False",
+        ]
+
+    def test_user_theme_shadows_and_edits_invalidate(self, tmp_path):
+        assert theme_index.lookup("nord").path.endswith("tmenu/themes/nord.toml")
+        user = tmp_path / "config" / "tmenu" / "themes"
+        user.mkdir(parents=True)
+        theme = user / "nord.toml"
+        theme.write_text('[colors]\nforeground = "red"\n')
+        sources = []
+        resolved = theme_index.lookup("nord", sources)
+        assert resolved.path == str(theme)
+        assert resolved.colors["foreground"] == (1, -1)
+        assert theme in sources and user in sources
+
+        theme.write_text('[colors]\nforeground = "#ff0000"\nbackground = 3\n')
+        os.utime(theme, ns=(0, 0))
+        resolved = theme_index.lookup("nord")
+        assert resolved.colors["foreground"][1] == 0xFF0000
+        assert theme_index.lookup("missing") is None
+
+    def test_truecolor_palette_slots(self, tmp_path, monkeypatch):
+        f = tmp_path / "config.toml"
+        f.write_text(
+            '[display]\ntheme = "nord"\n'
+            '[colors]\nforeground = "#102030"\nprompt_foreground = "#102030"\n'
+            'selection_foreground = "red"\n'
+        )
+        config, _, _, _ = load_config(str(f))
+        assert config.truecolor["foreground"] == 0x102030
+        assert "selection_foreground" not in config.truecolor
+        menu = TMenu(["a"], config=config)
+
+        monkeypatch.setenv("COLORTERM", "xterm")
+        assert menu._color_resolver()("foreground") == config.foreground
+
+        defined = []
+        monkeypatch.setenv("COLORTERM", "truecolor")
+        monkeypatch.setattr(curses, "COLORS", 256, raising=False)
+        monkeypatch.setattr(curses, "can_change_color", lambda: True)
+        monkeypatch.setattr(curses, "init_color", lambda *a: defined.append(a))
+        color = menu._color_resolver()
+        assert color("foreground") == 255
+        assert color("prompt_foreground") == 255
+        assert color("selection_background") == 254
+        assert color("selection_foreground") == 1
+        assert [c * 255 // 1000 for c in defined[0][1:]] == [16, 32, 48]
+
+        monkeypatch.setattr(curses, "COLORS", 1 << 24)
+        assert menu._color_resolver()("foreground") == 0x102030
+
+    def test_palette_slots_skip_plain_colors(self, monkeypatch):
+        config = Config(background=255, foreground=0, truecolor={"foreground": 0xABC})
+        monkeypatch.setenv("COLORTERM", "truecolor")
+        monkeypatch.setattr(curses, "COLORS", 256, raising=False)
+        monkeypatch.setattr(curses, "can_change_color", lambda: True)
+        monkeypatch.setattr(curses, "init_color", lambda *a: None)
+        color = TMenu(["a"], config=config)._color_resolver()
+        assert color("foreground") == 254
+        assert color("background") == 255
+
+
+class TestNavigationStack:
+    def _menu(self):
+        subs = {"Apps": {"Browser": "firefox", "Editor": "nvim"}}
+        items = {"Term": "foot", "Apps": "submenu:Apps"}
+        return TMenu(list(items), menu_items=items, submenus=subs, title="Main")
+
+    def test_enter_and_back_restores_cursor(self):
+        menu = self._menu()
+        menu.selected_index = 1
+        assert menu._navigate(menu._handle_selection(1)) is None
+        assert menu.title == "Apps"
+        assert menu.all_items == ["Browser", "Editor", "← Back", "Exit"]
+        menu.selected_index = 1
+        back = menu._handle_selection(menu.all_items.index("← Back"))
+        assert menu._navigate(back) is None
+        assert menu.title == "Main"
+        assert menu.selected_index == 1
+        assert not menu.is_submenu
+
+    def test_commands_pass_through(self):
+        menu = self._menu()
+        menu.enter_submenu("Apps", "Apps")
+        sel = menu._navigate(menu._handle_selection(0))
+        assert sel == Selection(Action.COMMAND, "firefox")
+
+    def test_back_at_root_is_returned(self):
+        menu = TMenu(["a"], is_submenu=True)
+        assert menu._navigate(Selection(Action.BACK)) == Selection(Action.BACK)
+
+
+class TestDaemon:
+    def test_message_passes_fd(self):
+        a, b = socket.socketpair()
+        r, w = os.pipe()
+        with a, b:
+            send_message(a, {"term": "xterm"}, [w])
+            send_message(a, {"pid": 1})
+            reader = MessageReader(b)
+            assert reader.read() == {"term": "xterm"}
+            assert reader.read() == {"pid": 1}
+            assert len(reader.fds) == 1
+            os.write(reader.fds[0], b"x")
+            assert os.read(r, 1) == b"x"
+        for fd in (r, w, *reader.fds):
+            os.close(fd)
+
+    def test_request_reports_daemon_error(self):
+        a, b = socket.socketpair()
+        r, w = os.pipe()
+        with a, b:
+            send_message(b, {"error": "fork failed"})
+            assert _request(a, w) == {"error": "fork failed"}
+            daemon_side = MessageReader(b)
+            assert "term" in daemon_side.read()
+        for fd in (r, w, *daemon_side.fds):
+            os.close(fd)
+
+    def test_peer_must_be_this_user(self, monkeypatch, tmp_path, capsys):
+        a, b = socket.socketpair()
+        with a, b:
+            assert client_mod.peer_uid(a) == os.getuid()
+        path = tmp_path / "tmenu.sock"
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with listener:
+            listener.bind(str(path))
+            listener.listen(1)
+            monkeypatch.setenv("TMENU_SOCKET", str(path))
+            monkeypatch.setattr(client_mod, "peer_uid", lambda sock: os.getuid() + 1)
+            with pytest.raises(SystemExit):
+                client_mod.main()
+        assert "not served by this user" in capsys.readouterr().err
+
+    def test_daemon_refuses_foreign_paths(self, tmp_path):
+        private = tmp_path / "run"
+        daemon_mod._private_dir(str(private))
+        daemon_mod._private_dir(str(private))  # an existing one of ours is fine
+        assert private.stat().st_mode & 0o777 == 0o700
+        private.chmod(0o755)
+        with pytest.raises(PermissionError):
+            daemon_mod._private_dir(str(private))
+        squatted = tmp_path / "tmenu.sock"
+        squatted.write_text("")
+        with pytest.raises(PermissionError):
+            daemon_mod._remove_stale(str(squatted))
+        assert squatted.exists()
+        daemon_mod._remove_stale(str(tmp_path / "missing.sock"))
+
+    def test_state_reloads_on_change(self, tmp_path):
+        f = tmp_path / "config.toml"
+        f.write_text('[menu]\nA = "a"\n')
+        state = DaemonState(str(f))
+        assert not state.refresh()
+        f.write_text('[menu]\nA = "a"\nB = "b"\n')
+        assert state.refresh()
+        assert list(state.new_menu().all_items) == ["A", "B", "Exit"]
+
+
+class LazyLines:
+    """Read-only sequence that synthesizes rows and counts lookups."""
+
+    def __init__(self, n):
+        self.n = n
+        self.lookups = 0
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        self.lookups += 1
+        return f"line {i}"
+
+
+class TestMappedLines:
+    def _lines(self, tmp_path, data: bytes) -> MappedLines:
+        path = tmp_path / "input.txt"
+        path.write_bytes(data)
+        lines = MappedLines.open(str(path), "utf-8").start()
+        if lines._thread.ident is not None:
+            lines._thread.join()
+        return lines
+
+    def test_index_skips_blank_lines(self, tmp_path):
+        lines = self._lines(tmp_path, b"one\n\n  \ntwo\r\n\xffthree")
+        assert len(lines) == 0  # nothing published before the first poll
+        lines.drain()
+        assert list(lines) == ["one", "two", "\udcffthree"]
+        assert lines.raw(2) == b"\xffthree"
+        assert lines[-1] == lines[2]
+        assert lines.done
+
+    def test_empty_file(self, tmp_path):
+        lines = self._lines(tmp_path, b"")
+        lines.wait_first()
+        assert len(lines) == 0
+        assert lines.done
+
+    def test_pipe_read0_keeps_exact_bytes(self, monkeypatch):
+        monkeypatch.setattr(lines_mod, "_CHUNK_SIZE", 4)  # split records
+        data = b"a b\n\0\0 \xff\xfe.txt\0last"
+        r, w = os.pipe()
+        lines = PipeLines(r, "utf-8", b"\0").start()
+        os.write(w, data)
+        os.close(w)
+        lines._thread.join()
+        lines.drain()
+        assert [lines.raw(i) for i in range(len(lines))] == [
+            b"a b\n",
+            b" \xff\xfe.txt",
+            b"last",
+        ]
+        assert lines[1] == " \udcff\udcfe.txt"
+        assert lines[1].encode("utf-8", "surrogateescape") == lines.raw(1)
+
+    def test_pipe_lines_match_mapped_lines(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(lines_mod, "_CHUNK_SIZE", 3)
+        data = b"one\r\n\n  \ntwo\nthree"
+        r, w = os.pipe()
+        piped = PipeLines(r, "utf-8").start()
+        os.write(w, data)
+        os.close(w)
+        piped._thread.join()
+        piped.drain()
+        mapped = self._lines(tmp_path, data)
+        mapped.drain()
+        assert list(piped) == list(mapped) == ["one", "two", "three"]
+        assert piped.done
+
+    def test_menu_polls_mapped_lines(self, tmp_path):
+        lines = self._lines(tmp_path, b"alpha\nbeta\n")
+        menu = TMenu(lines, stream=lines)
+        while menu.loading:
+            menu._poll_stream()
+        assert menu.all_items == ["alpha", "beta", "Exit"]
+        assert menu.all_items.backing is lines
+        menu.set_query("bt")
+        assert menu._handle_selection(0) == Selection(Action.COMMAND, "beta")
+        assert lines.raw(menu.result_index) == b"beta"
+
+
+class TestHistory:
+    def test_rank_by_frecency(self, tmp_path):
+        path = tmp_path / "history.bin"
+        h = history_mod.History(path=path)
+        h.record("b", "cmd-b")
+        h.record("c", "cmd-c")
+        h.record("c", "cmd-c")
+        fresh = history_mod.History(path=path)
+        commands = {"a": "cmd-a", "b": "cmd-b", "c": "cmd-c"}
+        assert fresh.rank(["a", "b", "c"], commands) == ["c", "b", "a"]
+        assert fresh.score(fresh.key("c", "cmd-c")) > 1.9
+        # Same label, other source: ranked independently.
+        assert history_mod.History("stdin:x", path).rank(["a", "c"]) == ["a", "c"]
+
+    def test_compaction_bounds_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(history_mod, "_MAX_RECORDS", 8)
+        monkeypatch.setattr(history_mod, "_KEEP_KEYS", 3)
+        path = tmp_path / "history.bin"
+        h = history_mod.History(path=path)
+        for i in range(20):
+            h.record("hot", "hot")
+            h.record(f"cold{i}", f"cold{i}")
+        assert path.stat().st_size < 8 * history_mod._RECORD.size
+        fresh = history_mod.History(path=path)
+        assert fresh.rank(["cold0", "hot"]) == ["hot", "cold0"]
+
+    def test_menu_ranks_submenus(self, tmp_path):
+        h = history_mod.History(path=tmp_path / "history.bin")
+        h.record("Shut down", "poweroff")
+        menu = TMenu(
+            ["Power"],
+            menu_items={"Power": "submenu:power"},
+            submenus={"power": {"Reboot": "reboot", "Shut down": "poweroff"}},
+            history=h,
+        )
+        menu.enter_submenu("power", "Power")
+        assert list(menu.all_items)[:2] == ["Shut down", "Reboot"]
+
+    def test_promote_resolves_backing_indices(self):
+        items = ItemList(["a", "b", "c", "d", "e"], ["Exit"])
+        items.promote([3, 1])
+        assert list(items) == ["d", "b", "a", "c", "e", "Exit"]
+        assert [items.source_index(i) for i in range(5)] == [3, 1, 0, 2, 4]
+        assert items.command(2) == "a" and items.width(0) == 1
+
+    def _piped_menu(self, h, first: bytes, rest: bytes) -> tuple[TMenu, int]:
+        """A menu opened on *first*, with *rest* still to be written."""
+        r, w = os.pipe()
+        lines = PipeLines(r, "utf-8").start()
+        os.write(w, first)
+        lines.wait_first()
+        menu = TMenu(lines, stream=lines, history=h)
+        os.write(w, rest)
+        return menu, w
+
+    def test_menu_ranks_piped_lines_when_complete(self, tmp_path):
+        h = history_mod.History("stdin:t", tmp_path / "history.bin")
+        h.record("gamma", "gamma")
+        menu, w = self._piped_menu(h, b"alpha\n", b"beta\ngamma\n")
+        assert menu.loading
+        os.close(w)
+        menu.finish_loading()
+        assert list(menu.all_items) == ["gamma", "alpha", "beta", "Exit"]
+        assert menu.all_items.backing[menu.all_items.source_index(0)] == "gamma"
+        assert menu._handle_selection(1) == Selection(Action.COMMAND, "alpha")
+
+    def test_piped_scope_is_a_digest_of_the_input(self, tmp_path):
+        path = tmp_path / "history.bin"
+        h = history_mod.History(None, path)
+        menu, w = self._piped_menu(h, b"alpha\n", b"beta\ngamma\n")
+        h.record("gamma", "gamma")  # input not complete yet: not recorded
+        assert h.scope is None and not path.exists()
+        os.close(w)
+        menu.finish_loading()
+        assert h.scope is not None and h.scope.startswith("stdin:")
+        h.record("gamma", "gamma")
+
+        same = history_mod.History(None, path)
+        menu, w = self._piped_menu(same, b"alpha\nbeta\n", b"gamma\n")
+        os.close(w)
+        menu.finish_loading()
+        assert same.scope == h.scope
+        assert list(menu.all_items)[0] == "gamma"
+
+        other = history_mod.History(None, path)
+        menu, w = self._piped_menu(other, b"alpha\n", b"beta\ngamma\ndelta\n")
+        os.close(w)
+        menu.finish_loading()
+        assert other.scope != h.scope
+        assert list(menu.all_items)[0] == "alpha"
+
+    def test_unknown_scope_reads_no_labels(self, tmp_path):
+        path = tmp_path / "history.bin"
+        history_mod.History("other", path).record("a", "a")
+        h = history_mod.History("stdin:t", path)
+        assert not h.known()
+        assert h.promoted(LazyLines(10**6)) == []
+        lines = LazyLines(3)
+        menu = TMenu(lines, history=h)
+        menu._rank_input()
+        assert menu._ranking is None and lines.lookups == 0
+
+    def test_piped_lines_keep_order_once_touched(self, tmp_path):
+        h = history_mod.History("stdin:t", tmp_path / "history.bin")
+        h.record("gamma", "gamma")
+        menu, w = self._piped_menu(h, b"alpha\nbeta\n", b"gamma\n")
+        menu.selected_index = 1
+        os.close(w)
+        menu.finish_loading()
+        assert list(menu.all_items) == ["alpha", "beta", "gamma", "Exit"]
+
+
+def _wait_preview(preview: Previewer, timeout: float = 5.0) -> list[str] | None:
+    deadline = time.monotonic() + timeout
+    while preview.pending and time.monotonic() < deadline:
+        preview.poll()
+        time.sleep(0.01)
+    return preview.lines()
+
+
+class TestPreview:
+    def test_command_expansion_and_cleanup(self):
+        assert expand_command("cat {}", "a b") == "cat 'a b'"
+        assert expand_command("file", "x;y") == "file 'x;y'"
+        assert clean_output(b"\x1b[1;31mred\x1b[0m\tx\n") == ["red x"]
+
+    def test_results_are_cached_lru(self):
+        preview = Previewer("echo", cache_size=1, debounce=0)
+        try:
+            preview.show("a")
+            assert _wait_preview(preview) == ["a"]
+            preview.show("b")
+            assert _wait_preview(preview) == ["b"]
+            preview.show("a")
+            assert preview.pending  # evicted by "b"
+        finally:
+            preview.close()
+
+    def test_moving_away_kills_stale_job(self):
+        preview = Previewer("sleep 30; echo", debounce=0)
+        try:
+            preview.show("slow")
+            preview.poll()
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                job = preview._jobs.get("slow")
+                if job is not None and job.proc is not None:
+                    break
+                time.sleep(0.01)
+            proc = job.proc
+            preview.show("other")
+            assert proc.wait(timeout=5) != 0
+            assert "slow" not in preview._cache
+        finally:
+            preview.close()
+
+    def test_pane_drawn_beside_list(self, screen):
+        screen.size = (10, 80)
+        preview = Previewer("echo preview of", debounce=0)
+        try:
+            menu = TMenu(["alpha", "beta"], preview=preview)
+            menu._poll_preview()
+            _wait_preview(preview)
+            menu._draw(screen, COLORS)
+        finally:
+            preview.close()
+        assert (0, 42, "preview of alpha") in screen.writes
+        assert all(x < 40 for y, x, text in screen.writes if "beta" in text)
+
+
+class TestLiveConfig:
+    def _setup(self, tmp_path):
+        menus = tmp_path / "menus"
+        menus.mkdir()
+        (menus / "a.toml").write_text('[menu]\nA = "a"\n')
+        (menus / "b.toml").write_text('[menu]\nB = "b"\n')
+        f = tmp_path / "config.toml"
+        f.write_text(
+            '[display]\ntheme = "nord"\ntitle = "T"\n'
+            f'theme_dir = "{menus}"\n[menu]\nTop = "top"\n'
+        )
+        return f, menus
+
+    def test_matches_load_config(self, tmp_path):
+        f, _ = self._setup(tmp_path)
+        live = watch_mod.LiveConfig(str(f))
+        assert (live.config, live.menu_items, live.submenus, live.title) == (
+            load_config(str(f))
+        )
+
+    def test_only_changed_fragment_is_reparsed(self, tmp_path, monkeypatch):
+        f, menus = self._setup(tmp_path)
+        live = watch_mod.LiveConfig(str(f))
+        parsed = []
+        real = watch_mod._load_toml
+        monkeypatch.setattr(
+            watch_mod, "_load_toml", lambda p: parsed.append(p.name) or real(p)
+        )
+        (menus / "b.toml").write_text('[menu]\nB = "b2"\n')
+        assert live.update({menus / "b.toml"}) == {"menus"}
+        assert parsed == ["b.toml"]
+        assert live.menu_items == {"Top": "top", "A": "a", "B": "b2"}
+
+        (menus / "a.toml").unlink()
+        assert live.update({menus / "a.toml"}) == {"menus"}
+        assert "A" not in live.menu_items
+
+    def test_broken_fragment_keeps_last_good_parse(self, tmp_path):
+        f, menus = self._setup(tmp_path)
+        live = watch_mod.LiveConfig(str(f))
+        (menus / "b.toml").write_text('[menu]\nB = "b2\n')  # unterminated
+        assert live.update({menus / "b.toml"}) == set()
+        assert live.menu_items == {"Top": "top", "A": "a", "B": "b"}
+
+    def test_color_and_display_changes(self, tmp_path):
+        f, _ = self._setup(tmp_path)
+        live = watch_mod.LiveConfig(str(f))
+        text = f.read_text()
+        f.write_text(text + '[colors]\nforeground = "#ff0000"\n')
+        assert live.update({f}) == {"colors"}
+        assert live.config.truecolor["foreground"] == 0xFF0000
+        f.write_text(text.replace('title = "T"', 'title = "U"\nwidth = 40'))
+        assert live.update({f}) == {"colors", "display", "title"}
+        f.write_text("[display\n")  # mid-edit: keep the last good config
+        assert live.update({f}) == set()
+        assert live.title == "U"
+
+    @pytest.mark.parametrize("inotify", [True, False])
+    def test_watcher_sees_writes_and_renames(self, tmp_path, monkeypatch, inotify):
+        if not inotify:
+            monkeypatch.setattr(watch_mod, "_libc", lambda: None)
+        f, menus = self._setup(tmp_path)
+        watcher = watch_mod.Watcher([f], [menus])
+        assert (watcher.fileno() is not None) is inotify
+        try:
+            time.sleep(0.01)  # a later mtime for the polling fallback
+            new = tmp_path / "config.toml.new"
+            new.write_text("[menu]\nX = 'x'\n")
+            os.replace(new, f)
+            (menus / "c.toml").write_text("")
+            (menus / "notes.txt").write_text("")
+            assert watcher.read() == {f, menus / "c.toml"}
+            assert watcher.read() == set()
+        finally:
+            watcher.close()
+
+    def test_replace_menus_keeps_place(self):
+        subs = {"Files": {"Home": "h", "Docs": "d"}}
+        menu = TMenu(
+            ["Web", "Files"],
+            menu_items={"Web": "w", "Files": "submenu:Files"},
+            submenus=subs,
+        )
+        menu._handle_key("j")
+        menu._handle_key("\n")
+        menu._handle_key("j")
+        assert menu.all_items[menu.selected_index] == "Docs"
+        subs = {"Files": {"New": "n", "Home": "h", "Docs": "d2"}}
+        menu.replace_menus(
+            {"Mail": "m", "Web": "w", "Files": "submenu:Files"}, subs, "T"
+        )
+        assert menu.title == "Files" and menu.all_items[menu.selected_index] == "Docs"
+        assert menu._handle_key("\n") == Selection(Action.COMMAND, "d2")
+        assert menu.leave_submenu()
+        assert menu.all_items[menu.selected_index] == "Files"
+        assert menu.title == "T"
+
+        menu.replace_menus({"Web": "w"}, {}, "T")  # the open submenu is gone
+        assert menu.all_items == ["Web", "Exit"] and not menu.is_submenu
+
+
+class TestEventLoop:
+    @pytest.fixture
+    def loop(self):
+        r, w = os.pipe()  # stands in for the tty
+        loop = EventLoop(r)
+        yield loop, w
+        loop.close()
+        os.close(r)
+        os.close(w)
+
+    def test_wake_from_thread_and_tty_input(self, loop):
+        loop, tty = loop
+        threading.Timer(0.05, loop.wake).start()
+        start = time.monotonic()
+        assert loop.wait(5) is False
+        assert time.monotonic() - start < 2
+        os.write(tty, b"j")
+        assert loop.wait(5) is True
+
+    def test_timers_run_when_due(self, loop):
+        loop, _ = loop
+        fired = []
+        loop.call_later(0.02, lambda: fired.append(1))
+        loop.wait(None)
+        assert fired == [1]
+
+    def test_resize_burst_is_coalesced(self, loop, monkeypatch):
+        loop, _ = loop
+        now = [100.0]
+        monkeypatch.setattr(events_mod.time, "monotonic", lambda: now[0])
+        assert not loop.take_resize()
+        for _ in range(10):  # a drag: one event every 10 ms
+            loop.request_resize()
+            now[0] += 0.01
+            assert not loop.take_resize()
+        now[0] += events_mod.RESIZE_SETTLE
+        assert loop.take_resize()
+        assert not loop.take_resize()
+
+    def test_long_resize_drag_still_relayouts(self, loop, monkeypatch):
+        loop, _ = loop
+        now = [100.0]
+        monkeypatch.setattr(events_mod.time, "monotonic", lambda: now[0])
+        taken = 0
+        for _ in range(100):  # one second of continuous dragging
+            loop.request_resize()
+            now[0] += 0.01
+            taken += loop.take_resize()
+        assert 1 <= taken <= 1 / events_mod.RESIZE_MAX_DELAY
+
+    def test_post_and_keys(self):
+        menu = TMenu(["a"])
+        menu.push_items(["b"])
+        menu.set_status("syncing")
+        assert menu._run_posted()
+        assert menu.all_items == ["a", "b", "Exit"] and menu.status == "syncing"
+        assert menu._handle_key("j") is None and menu.selected_index == 1
+        assert menu._handle_key("\n") == Selection(Action.COMMAND, "b")
+        assert menu._handle_key("q") is not None  # quit at the root
+
+    def test_push_to_read_only_items(self, tmp_path):
+        menu = TMenu(("a", "b"))
+        menu.push_items(["c"])
+        menu._run_posted()
+        assert menu.all_items == ["a", "b", "c", "Exit"]
+        assert menu.all_items.width(2) == 1
+
+        path = tmp_path / "input.txt"
+        path.write_bytes(b"x\n")
+        lines = MappedLines.open(str(path)).start()
+        lines.wait_first()
+        menu = TMenu(lines, stream=lines)
+        with pytest.raises(TypeError):
+            menu.push_items(["y"])
+        assert not menu._inbox
+
+
+class TestGenerators:
+    def _settle(self, gens: Generators, command: str) -> None:
+        deadline = time.monotonic() + 5
+        while gens.running(command) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_parse_output(self):
+        assert parse_output("a\tcmd a\n\n  \nb\n") == {"a": "cmd a", "b": "b"}
+
+    def test_stale_output_served_while_refreshing(self, tmp_path):
+        counter = tmp_path / "n"
+        command = f"gen:echo x >> {counter}; wc -l < {counter}"
+        gens = Generators(ttl=0)
+        gens.refresh(command)
+        self._settle(gens, command)
+        assert gens.lookup(command) == ({"1": "1"}, 1)
+
+        # A new session starts from the disk cache, then refreshes.
+        later = Generators(ttl=0)
+        assert later.lookup(command)[0] == {"1": "1"}
+        later.refresh(command)
+        self._settle(later, command)
+        assert later.lookup(command) == ({"2": "2"}, 2)
+
+    def test_fresh_output_is_not_rerun(self, tmp_path):
+        gens = Generators(ttl=3600)
+        gens.refresh("gen:echo a")
+        self._settle(gens, "gen:echo a")
+        gens.refresh("gen:echo a")
+        assert not gens.running("gen:echo a")
+        assert gens.lookup("gen:echo a")[1] == 1
+
+    def test_menu_swaps_in_generated_items(self):
+        command = "gen:printf 'one\\trun-one\\ntwo\\n'"
+        menu = TMenu(["Pick"], menu_items={"Pick": command})
+        sel = menu._handle_selection(0)
+        assert sel == Selection(Action.SUBMENU, command, "Pick")
+        menu._navigate(sel)
+        assert menu.loading and menu.all_items == ["← Back", "Exit"]
+        self._settle(menu._generators(), command)
+        assert menu._poll_generator()
+        assert menu.all_items == ["one", "two", "← Back", "Exit"]
+        assert menu._handle_selection(0) == Selection(Action.COMMAND, "run-one")
+        assert menu.leave_submenu() and menu.all_items == ["Pick", "Exit"]
+
+
+class TestTrace:
+    @pytest.fixture
+    def trace_file(self, tmp_path, monkeypatch):
+        path = tmp_path / "trace.log"
+        monkeypatch.setattr(trace, "path", str(path))
+        monkeypatch.setattr(trace, "enabled", True)
+        monkeypatch.setattr(trace, "_events", [])
+        return path
+
+    def test_phases_and_frames_are_written(self, trace_file, screen):
+        with profiling.phase("load_config"):
+            pass
+        menu = TMenu(["a", "b"])
+        menu._draw(screen, COLORS)
+        menu._trace_frame(time.perf_counter(), time.perf_counter(), 2)
+        trace.flush()
+        lines = trace_file.read_text().splitlines()
+        assert lines[0].startswith("# tmenu pid=")
+        kinds = [line.split("\t")[1:3] for line in lines[1:]]
+        assert kinds == [
+            ["phase", "load_config"],
+            ["draw", "frame"],
+            ["input", "key-to-paint"],
+        ]
+        assert int(lines[2].split("\t")[4]) > 0  # cells written
+
+    def test_report_percentiles(self, trace_file):
+        trace_file.write_text(
+            "# run\n" + "".join(f"{i}\tdraw\tframe\t{i}.0\t10\n" for i in range(1, 101))
+        )
+        (summary,) = trace.summarize(trace_file.read_text().splitlines())
+        assert (summary.count, summary.p50, summary.p90, summary.max) == (
+            100,
+            50.0,
+            90.0,
+            100.0,
+        )
+        assert "draw:frame" in trace.report(str(trace_file))
+
+
+class TestMultiSelect:
+    def test_marked_in_input_order_after_promotion(self, tmp_path, capsysbinary):
+        path = tmp_path / "input.txt"
+        path.write_bytes(b"r0\nr1\nr2\nr3\n")
+        lines = MappedLines.open(str(path)).start()
+        lines.wait()
+        lines.wait_first()
+        menu = TMenu(lines, stream=lines, multi=True)
+        menu.all_items.promote([3])
+        menu._handle_key("\t")
+        menu._handle_key("\t")
+        assert [menu.all_items[i] for i in menu.marked()] == ["r0", "r3"]
+        cli._write_items(lines, menu, menu.marked(), b"\n")
+        assert capsysbinary.readouterr().out == b"r0\nr3\n"
+
+    def test_tab_marks_and_moves_down(self):
+        menu = TMenu(["a", "b", "c"], multi=True)
+        menu._handle_key("\t")
+        menu._handle_key("\t")
+        menu._handle_key("\t")
+        menu._move_up()
+        menu._move_up()
+        menu._handle_key("\t")
+        assert menu.marked() == [0, 2]
+        assert menu.selected_index == 2
+        assert menu._handle_key("\n") == Selection(Action.COMMAND, "c")
+
+    def test_mark_all_covers_filtered_view_and_toggles(self):
+        menu = TMenu(["apple", "berry", "avocado"], multi=True)
+        menu._handle_key("/")
+        menu._handle_key("a")
+        menu._handle_key("\x14")  # Ctrl-T, in search mode too
+        assert menu.marked() == [0, 2]
+        menu._handle_key("\x14")
+        assert menu.marked() == []
+        menu.set_query("")
+        menu._handle_key("\x14")
+        assert menu.marked() == [0, 1, 2]
+
+    def test_marks_grow_with_stream_and_are_drawn(self, screen):
+        menu = TMenu(["a", "b"], multi=True)
+        menu._handle_key("\x14")
+        menu.append_items(["c"])
+        menu._move_up()
+        menu._move_up()
+        menu._handle_key("\t")
+        assert menu.marked() == [0, 1, 2]
+        menu._draw(screen, COLORS)
+        rows = {y: text for y, _, text in screen.writes}
+        marked = [rows[p.y] for p in menu._positions[:3]]
+        assert all("● " in row for row in marked)
+        assert "3 marked" in "".join(rows.values())
+
+    def test_single_select_has_no_marks(self):
+        menu = TMenu(["a", "b"])
+        menu._handle_key("\t")
+        assert menu.marks is None and menu.marked() == []
+        assert menu.selected_index == 0
+
+    def test_write_items(self, tmp_path, capsysbinary):
+        path = tmp_path / "input.txt"
+        path.write_bytes("één\ntwo\nthree\n".encode())
+        lines = MappedLines.open(str(path)).start()
+        lines.wait_first()
+        lines._thread.join()
+        lines.drain()
+        cli._write_items(lines, TMenu(lines), [0, 2], b"\0")
+        assert capsysbinary.readouterr().out == "één\0three\0".encode()
+
+
+class TestHeadless:
+    def _menu(self, **kwargs) -> TMenu:
+        subs = {"Files": {"Home": "nautilus ~", "Downloads": "nautilus ~/dl"}}
+        return TMenu(
+            ["Firefox", "Files", "Terminal"],
+            menu_items={
+                "Firefox": "firefox",
+                "Files": "submenu:Files",
+                "Terminal": "alacritty",
+            },
+            submenus=subs,
+            **kwargs,
+        )
+
+    def test_parse_keys(self):
+        assert headless.parse_keys("jj<Enter>") == ["j", "j", "\n"]
+        assert headless.parse_keys("<C-u><lt>x<Down>") == [
+            "\x15",
+            "<",
+            "x",
+            curses.KEY_DOWN,
+        ]
+        assert headless.parse_keys("a < b") == ["a", " ", "<", " ", "b"]
+        with pytest.raises(ValueError):
+            headless.parse_keys("<Nope>")
+
+    def test_select_navigates_submenus(self):
+        menu = self._menu()
+        keys = headless.parse_keys("/fil<Enter>/down<Enter>")
+        step = headless.select(menu, keys)
+        assert step.selection == Selection(Action.COMMAND, "nautilus ~/dl")
+        assert menu.all_items[step.indices[0]] == "Downloads"
+        # The next step starts again from the root.
+        step = headless.select(menu, headless.parse_keys("j<Enter>"))
+        assert step.indices == [] and step.selection is None  # entered Files
+        assert headless.select(menu, ["q"]).selection is None
+        assert headless.select(menu, ["G", "\n"]).selection == Selection(Action.EXIT)
+
+    def test_queries_share_one_menu(self):
+        menu = self._menu()
+        script = headless.Script(queries=["fi", "zz", "term"])
+        steps = list(headless.run(menu, script))
+        assert [[menu.all_items[i] for i in s.indices] for s in steps] == [
+            ["Firefox", "Files"],
+            [],
+            ["Terminal"],
+        ]
+        first = headless.Script(queries=["term", "home"], first=True)
+        values = [s.selection for s in headless.run(menu, first)]
+        assert values == [
+            Selection(Action.COMMAND, "alacritty"),
+            Selection(Action.EXIT),  # nothing matched, Exit was highlighted
+        ]
+
+    def test_multi_select_and_streamed_input(self):
+        r, w = os.pipe()
+        os.write(w, b"alpha\nbeta\ngamma\n")
+        os.close(w)
+        lines = PipeLines(r, "utf-8").start()
+        lines.wait_first()
+        menu = TMenu(lines, stream=lines, multi=True)
+        script = headless.Script(headless.parse_keys("<Tab>j<Tab>g<Enter>"))
+        (step,) = headless.run(menu, script)
+        assert step.indices == [0, 2]
+        assert len(menu.all_items) == 4
+
+    def test_generator_submenu_is_awaited(self):
+        command = "gen:sleep 0.1; printf 'one\\trun-one\\n'"
+        menu = TMenu(["Pick"], menu_items={"Pick": command})
+        step = headless.select(menu, ["\n", "\n"])
+        assert step.selection == Selection(Action.COMMAND, "run-one")
+
+
+class TestVirtualItems:
+    def test_item_list_trailer(self):
+        items = ItemList(["a", "b"], ("Exit",))
+        assert len(items) == 3
+        assert items[-1] == "Exit"
+        assert items[1:] == ["b", "Exit"]
+        items.extend(["c"])
+        assert items == ["a", "b", "c", "Exit"]
+
+    def test_read_only_backing_is_copied_on_extend(self):
+        backing = ("a",)
+        items = ItemList(backing)
+        items.extend(["b"])
+        assert list(items) == ["a", "b"] and backing == ("a",)
+
+    def test_draw_touches_only_visible_rows(self, screen):
+        lines = LazyLines(10_000_000)
+        menu = TMenu(lines, config=Config(height=10))
+        menu._draw(screen, COLORS)
+        first = lines.lookups
+        assert first < 100
+        menu._move_down()
+        menu._draw(screen, COLORS)
+        assert lines.lookups - first <= 24
+        assert menu._handle_selection(1) == Selection(Action.COMMAND, "line 1")
+
 
 class TestLoadConfig:
     def test_nonexistent_file(self):
@@ -94,6 +1390,16 @@ class TestLoadConfig:
         config, _, _, _ = load_config(str(f))
         assert config.foreground == -1
 
+    def test_submenu_tables(self, tmp_path):
+        f = tmp_path / "config.toml"
+        f.write_text(
+            '[menu]\nApps = "submenu:Apps"\n'
+            '[submenu.Apps]\nBrowser = "firefox"\n'
+            '["submenu.Tools"]\nTop = "htop"\n'
+        )
+        _, _, submenus, _ = load_config(str(f))
+        assert submenus == {"Apps": {"Browser": "firefox"}, "Tools": {"Top": "htop"}}
+
     def test_display_without_colors(self, tmp_path):
         f = tmp_path / "config.toml"
         f.write_text('[display]\ncentered = false\nwidth = 80\ntitle = "Test"\n')
@@ -117,3 +1423,34 @@ class TestIntegration:
         menu = TMenu(items)
         assert len(menu.all_items) == len(items) + 1
         assert "Exit" in menu.all_items
+
+    def test_theme_dir_fragments_merge_in_sorted_order(self, tmp_path):
+        menus = tmp_path / "menus"
+        menus.mkdir()
+        for i in range(12):  # enough to take the thread-pool path
+            (menus / f"{i:02d}.toml").write_text(f'[menu]\nShared = "from {i}"\n')
+        (menus / "05.toml").write_text("not toml =\n")
+        f = tmp_path / "config.toml"
+        f.write_text(f'[display]\ntheme_dir = "{menus}"\n')
+        _, menu_items, _, _ = load_config(str(f))
+        assert menu_items == {"Shared": "from 11"}
+
+        errors = []
+        config_mod._load_custom_menus(str(menus), errors=errors)
+        assert [e.path.name for e in errors] == ["05.toml"]
+        assert errors[0].error
+
+    def test_check_config_reports_bad_fragments(self, tmp_path, capsys):
+        menus = tmp_path / "menus"
+        menus.mkdir()
+        (menus / "good.toml").write_text('[menu]\nA = "a"\n')
+        (menus / "bad.toml").write_text("[menu\n")
+        f = tmp_path / "config.toml"
+        f.write_text(f'[display]\ntheme_dir = "{menus}"\n')
+        with pytest.raises(SystemExit) as exc:
+            cli._run_check_config(str(f))
+        assert exc.value.code == 1
+        out = capsys.readouterr().out
+        assert "2 files" in out
+        assert "ERROR" in out and "bad.toml" in out
+        assert " ms  good.toml" in out
@@ -1,18 +1,30 @@
 """tmenu - dmenu for terminal"""
 
-from tmenu.cli import main
-from tmenu.colors import parse_color
-from tmenu.config import load_config, load_theme
-from tmenu.menu import TMenu
-from tmenu.types import Action, Config, Selection
+import importlib
 
-__all__ = [
-    "TMenu",
-    "Config",
-    "Action",
-    "Selection",
-    "main",
-    "load_config",
-    "load_theme",
-    "parse_color",
-]
+from tmenu import profiling
+
+# Public names are resolved on first access, so that lightweight entry points
+# such as ``tmenu.client`` do not pay for curses, TOML and the menu code.
+_EXPORTS = {
+    "TMenu": "tmenu.menu",
+    "Config": "tmenu.types",
+    "Action": "tmenu.types",
+    "Selection": "tmenu.types",
+    "main": "tmenu.cli",
+    "load_config": "tmenu.config",
+    "load_theme": "tmenu.config",
+    "parse_color": "tmenu.colors",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'tmenu' has no attribute {name!r}")
+    with profiling.phase(f"import {module}"):
+        value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,124 @@
+"""Compiled config snapshot cache under ``$XDG_CACHE_HOME/tmenu``."""
+
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+from pathlib import Path
+from typing import Dict, Tuple
+
+from tmenu.config import _default_config_path, _xdg_cache_home, load_config
+from tmenu.types import Config
+
+_FORMAT_VERSION = 3
+
+Stamp = tuple  # (path, mtime_ns, size); mtime_ns and size are None if missing
+LoadedConfig = Tuple[Config, Dict[str, str], Dict[str, Dict[str, str]], str]
+
+
+def _stamp(path: Path) -> Stamp:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (str(path), None, None)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Replace *path* with *data* in one step, creating its directory.
+
+    The data goes to a temporary file beside it that is renamed over
+    *path*, so a concurrent reader sees the old file or the new one, never
+    a partial write. Raises OSError, after removing the temporary file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _snapshot_path(config_path: str) -> Path:
+    key = "\0".join(
+        (
+            os.path.abspath(config_path),
+            os.environ.get("XDG_CONFIG_HOME", ""),
+            os.environ.get("XDG_DATA_DIRS", ""),
+        )
+    )
+    digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+    return _xdg_cache_home() / "tmenu" / f"config-{digest}.bin"
+
+
+def _read_snapshot(path: Path) -> LoadedConfig | None:
+    """Return the cached result if every recorded source is unchanged."""
+    try:
+        with open(path, "rb") as f:
+            snap = marshal.load(f)
+        if snap["version"] != _FORMAT_VERSION:
+            return None
+        if snap["cwd"] is not None and snap["cwd"] != os.getcwd():
+            return None
+        for stamp in snap["stamps"]:
+            if _stamp(Path(stamp[0])) != tuple(stamp):
+                return None
+        return (
+            Config(**snap["config"]),
+            snap["menu_items"],
+            snap["submenus"],
+            snap["title"],
+        )
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        return None
+
+
+def _write_snapshot(
+    path: Path, loaded: LoadedConfig, stamps: list[Stamp], cwd: str | None
+) -> None:
+    config, menu_items, submenus, title = loaded
+    snap = {
+        "version": _FORMAT_VERSION,
+        "cwd": cwd,
+        "stamps": stamps,
+        "config": dict(config.__dict__),
+        "menu_items": menu_items,
+        "submenus": submenus,
+        "title": title,
+    }
+    try:
+        _write_atomic(path, marshal.dumps(snap))
+    except (OSError, ValueError):
+        pass
+
+
+def load_config_cached(config_path: str | None = None) -> LoadedConfig:
+    """Like :func:`load_config`, but served from a snapshot when possible.
+
+    The snapshot records the mtime and size of every source: the config
+    file, each theme path probed, the ``theme_dir`` directory and each
+    fragment in it. It is rebuilt as soon as any of them changes.
+    """
+    config_path = _default_config_path(config_path)
+    if not config_path or not os.path.exists(config_path):
+        return load_config(config_path)
+
+    snap_path = _snapshot_path(config_path)
+    cached = _read_snapshot(snap_path)
+    if cached is not None:
+        return cached
+
+    sources: list[Path] = []
+    loaded = load_config(config_path, sources)
+    stamps = [_stamp(p) for p in sources]
+    theme_dir = loaded[0].theme_dir
+    relative = bool(theme_dir) and not Path(theme_dir).expanduser().is_absolute()
+    _write_snapshot(snap_path, loaded, stamps, os.getcwd() if relative else None)
+    return loaded
@@ -5,27 +5,138 @@ from __future__ import annotations
 import argparse
 import curses
 import os
-import shlex
+import stat
 import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
-from tmenu.config import _xdg_config_home, load_config
+from tmenu import headless, profiling, trace
+from tmenu.cache import load_config_cached
+from tmenu.config import (
+    _default_config_path,
+    _read_fragments,
+    _read_toml,
+    _xdg_config_home,
+    load_config,
+    load_theme,
+)
+from tmenu.execute import exec_command
+from tmenu.headless import Script, Step
+from tmenu.history import History
+from tmenu.lines import MappedLines, PipeLines
 from tmenu.menu import TMenu
+from tmenu.preview import Previewer
 from tmenu.types import Action, Config
 
+if TYPE_CHECKING:
+    from tmenu.watch import LiveConfig
 
-def _run_stdin_mode(title: str, config: Config) -> None:
-    """Pipe mode: read items from stdin, print selection to stdout."""
-    items = [line for line in sys.stdin.read().splitlines() if line.strip()]
-    if not items:
-        print("Error: No items received from stdin.", file=sys.stderr)
+
+def _stdin_is_file() -> bool:
+    try:
+        return stat.S_ISREG(os.fstat(0).st_mode)
+    except OSError:
+        return False
+
+
+def _stdin_has_items() -> bool:
+    """True if stdin is a pipe, socket or regular file rather than a device."""
+    try:
+        mode = os.fstat(0).st_mode
+    except OSError:
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISREG(mode) or stat.S_ISSOCK(mode)
+
+
+def _write_items(
+    lines: MappedLines | PipeLines, menu: TMenu, indices: list[int], end: bytes
+) -> None:
+    """Write the menu's items at *indices* to stdout, each followed by *end*.
+
+    Records are written byte-for-byte as they were read, whatever their
+    encoding and wherever frecency placed them in the menu.
+    """
+    source = menu.all_items.source_index
+    sys.stdout.flush()
+    sys.stdout.buffer.writelines(lines.raw(source(i)) + end for i in indices)
+    sys.stdout.flush()
+
+
+def _open_lines(input_path: str | None, read0: bool) -> MappedLines | PipeLines:
+    """Start indexing the items and wait for the first one.
+
+    A regular file, given with ``--input`` or redirected to stdin, is
+    memory-mapped; anything else is read as a stream.
+    """
+    sep = b"\0" if read0 else b"\n"
+    lines: MappedLines | PipeLines
+    try:
+        if input_path is not None or _stdin_is_file():
+            fd = os.open(input_path, os.O_RDONLY) if input_path else os.dup(0)
+            lines = MappedLines(fd, sys.stdin.encoding, sep).start()
+        else:
+            lines = PipeLines(os.dup(0), sys.stdin.encoding, sep).start()
+    except OSError as e:
+        print(f"Error: Cannot read {input_path or 'stdin'}: {e}", file=sys.stderr)
         sys.exit(1)
+    lines.wait_first()
+    if not lines:
+        where = input_path or "stdin"
+        print(f"Error: No items received from {where}.", file=sys.stderr)
+        sys.exit(1)
+    return lines
 
-    menu = TMenu(items, config=config, title=title)
+
+def _run_stdin_mode(
+    title: str,
+    config: Config,
+    input_path: str | None = None,
+    preview: Previewer | None = None,
+    multi: bool = False,
+    read0: bool = False,
+    print0: bool = False,
+    script: Script | None = None,
+) -> None:
+    """Pipe mode: read items from stdin, print selection to stdout.
+
+    Items are streamed: the menu opens as soon as the first line arrives and
+    keeps growing until the producer closes the pipe. A regular file, given
+    with ``--input`` or redirected to stdin, is memory-mapped instead. Input
+    stays bytes until a row is shown, so the selection is printed exactly as
+    it was read. With *multi*, every marked item is printed, or the
+    highlighted one if none are marked. With *script*, the whole input is
+    read and the script's results are printed instead; no tty is needed.
+    """
+    lines = _open_lines(input_path, read0)
+
+    # Piped input sets are told apart by their content, so the scope is
+    # bound once the whole input has been read.
+    history = History(None)
+    menu = TMenu(
+        lines,
+        config=config,
+        title=title,
+        stream=lines,
+        history=history if config.frecency else None,
+        preview=preview,
+        multi=multi,
+    )
+    end = b"\0" if print0 else b"\n"
+    if script is not None:
+        _run_script(
+            menu, script, lambda step: _write_items(lines, menu, step.indices, end)
+        )
 
     try:
-        with open("/dev/tty", "r") as tty:
-            saved_fd = os.dup(0)
-            os.dup2(tty.fileno(), 0)
+        with open(os.open("/dev/tty", os.O_RDWR), "r") as tty:
+            # curses draws on stdout; when that is a pipe (``$(... | tmenu)``)
+            # the screen goes to the terminal and stdout keeps the selection.
+            redirected = (0,) if os.isatty(1) else (0, 1)
+            sys.stdout.flush()
+            saved_fds = [os.dup(fd) for fd in redirected]
+            for fd in redirected:
+                os.dup2(tty.fileno(), fd)
             saved_stdin = sys.stdin
             sys.stdin = tty
             try:
@@ -33,15 +144,24 @@ def _run_stdin_mode(title: str, config: Config) -> None:
             except KeyboardInterrupt:
                 sys.exit(130)
             finally:
-                os.dup2(saved_fd, 0)
-                os.close(saved_fd)
+                if preview is not None:
+                    preview.close()
+                for fd, saved in zip(redirected, saved_fds):
+                    os.dup2(saved, fd)
+                    os.close(saved)
                 sys.stdin = saved_stdin
     except OSError:
         print("Error: Cannot open /dev/tty for interactive input.", file=sys.stderr)
         sys.exit(1)
 
     if result is not None and result.action == Action.COMMAND:
-        print(result.value)
+        lines.drain()
+        if lines.done:  # input that never ended has no scope to record under
+            history.bind(lines)
+        history.record(result.value, result.value)
+        assert menu.result_index is not None
+        indices = menu.marked() or [menu.result_index]
+        _write_items(lines, menu, indices, end)
         sys.exit(0)
     sys.exit(1)
 
@@ -51,8 +171,15 @@ def _run_config_mode(
     menu_items: dict[str, str],
     submenus: dict[str, dict[str, str]],
     title: str,
+    preview: Previewer | None = None,
+    script: Script | None = None,
+    live: LiveConfig | None = None,
 ) -> None:
-    """Config mode: navigate menus and execute the selected command."""
+    """Config mode: navigate menus and execute the selected command.
+
+    With *script*, the chosen commands (or, for plain ``--filter`` queries,
+    the matching labels) are printed rather than executed.
+    """
     if not menu_items:
         cfg_path = _xdg_config_home() / "tmenu" / "config.toml"
         print(
@@ -63,58 +190,120 @@ def _run_config_mode(
         )
         sys.exit(1)
 
-    stack: list[tuple[str, str]] = []
-    cur_items = menu_items
-    cur_title = title
-
-    while True:
-        menu = TMenu(
-            list(cur_items.keys()),
-            config=config,
-            menu_items=cur_items,
-            submenus=submenus,
-            title=cur_title,
-            is_submenu=bool(stack),
+    history = History()
+    menu = TMenu(
+        list(menu_items.keys()),
+        config=config,
+        menu_items=menu_items,
+        submenus=submenus,
+        title=title,
+        history=history if config.frecency else None,
+        preview=preview,
+        live=live,
+    )
+    if script is not None:
+
+        def write(step: Step) -> None:
+            if step.selection is not None:
+                print(step.selection.value)
+            else:
+                print(*(menu.all_items[i] for i in step.indices), sep="\n")
+
+        _run_script(menu, script, write)
+
+    try:
+        sel = curses.wrapper(menu.run)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    finally:
+        if preview is not None:
+            preview.close()
+
+    if sel is None or sel.action != Action.COMMAND:
+        sys.exit(0)
+
+    history.record(menu.all_items[menu.result_index], sel.value)
+    profiling.flush()
+    trace.flush()
+    exec_command(sel.value)
+
+
+def _run_script(menu: TMenu, script: Script, write: Callable[[Step], None]) -> None:
+    """Headless mode: play *script* against *menu* and exit.
+
+    Exits 0 only if every step chose or matched something.
+    """
+    answered = True
+    try:
+        for step in headless.run(menu, script):
+            if step.indices:
+                write(step)
+            else:
+                answered = False
+    except KeyboardInterrupt:
+        sys.exit(130)
+    sys.stdout.flush()
+    sys.exit(0 if answered else 1)
+
+
+def _run_check_config(config_path: str | None) -> None:
+    """Validate the config, its theme and every theme_dir fragment."""
+    path = _default_config_path(config_path)
+    if not path:
+        print("No config file found; built-in defaults apply.")
+        return
+
+    failures = 0
+
+    def show(ok: bool, seconds: float, what: str, error: str | None = None):
+        status = "ok   " if ok else "ERROR"
+        line = f"  {status} {seconds * 1000:8.2f} ms  {what}"
+        print(f"{line}: {error}" if error else line)
+
+    print(f"config {path}")
+    main_file = _read_toml(Path(path))
+    show(main_file.data is not None, main_file.seconds, path, main_file.error)
+    if main_file.data is None:
+        sys.exit(1)
+
+    display = main_file.data.get("display", {})
+    theme_name = str(display.get("theme", "")).strip()
+    if theme_name:
+        start = time.perf_counter()
+        theme = load_theme(theme_name)
+        found = theme is not None
+        failures += not found
+        print(f"theme {theme_name}")
+        show(
+            found,
+            time.perf_counter() - start,
+            theme_name,
+            None if found else "not found",
         )
 
-        try:
-            sel = curses.wrapper(menu.run)
-        except KeyboardInterrupt:
-            sys.exit(130)
-
-        if sel is None or sel.action == Action.EXIT:
-            sys.exit(0)
-
-        if sel.action == Action.BACK:
-            if stack:
-                stack.pop()
-                if stack:
-                    name, label = stack[-1]
-                    cur_items = submenus[name]
-                    cur_title = label
-                else:
-                    cur_items = menu_items
-                    cur_title = title
-            continue
-
-        if sel.action == Action.SUBMENU:
-            stack.append((sel.value, sel.label))
-            cur_items = submenus[sel.value]
-            cur_title = sel.label
-            continue
+    theme_dir = str(display.get("theme_dir", ""))
+    if theme_dir:
+        dirpath = Path(theme_dir).expanduser()
+        if not dirpath.is_dir():
+            print(f"theme_dir {dirpath}: not a directory")
+            failures += 1
+        else:
+            start = time.perf_counter()
+            fragments = _read_fragments(dirpath)
+            wall = time.perf_counter() - start
+            total = sum(f.seconds for f in fragments)
+            print(
+                f"theme_dir {dirpath}: {len(fragments)} files, "
+                f"{wall * 1000:.2f} ms wall, {total * 1000:.2f} ms summed"
+            )
+            for f in fragments:
+                show(f.data is not None, f.seconds, f.path.name, f.error)
+                failures += f.data is None
 
-        try:
-            parts = shlex.split(sel.value)
-            os.execvp(parts[0], parts)
-        except FileNotFoundError:
-            print(f"tmenu: command not found: {sel.value}", file=sys.stderr)
-            sys.exit(127)
-        except PermissionError:
-            print(f"tmenu: permission denied: {sel.value}", file=sys.stderr)
-            sys.exit(126)
-        except Exception as e:
-            print(f"tmenu: error executing command: {e}", file=sys.stderr)
-            sys.exit(1)
+    if failures:
+        print(f"{failures} problem(s) found.")
+        sys.exit(1)
+    print("No problems found.")
 
 
 def main() -> None:
@@ -124,11 +313,164 @@ def main() -> None:
     parser.add_argument(
         "--placeholder", help="Title to display when reading from stdin"
     )
+    parser.add_argument(
+        "--input",
+        metavar="FILE",
+        help="Read items from FILE (memory-mapped) and print the selection",
+    )
+    parser.add_argument(
+        "--preview",
+        metavar="CMD",
+        help="Show the output of CMD for the highlighted item in a side pane "
+        "({} is replaced by the item, otherwise it is appended)",
+    )
+    parser.add_argument(
+        "--multi",
+        action="store_true",
+        help="Pipe mode: mark items with Tab (Ctrl-T marks the whole view) "
+        "and print every marked item",
+    )
+    parser.add_argument(
+        "--read0",
+        action="store_true",
+        help="Pipe mode: items are separated by NUL instead of newline",
+    )
+    parser.add_argument(
+        "--print0",
+        action="store_true",
+        help="Pipe mode: end printed items with NUL instead of newline",
+    )
+    script = parser.add_mutually_exclusive_group()
+    script.add_argument(
+        "--select",
+        metavar="KEYS",
+        help="Press KEYS (e.g. 'jj<Enter>' or '/fire<Enter>') without a "
+        "terminal and print what they choose",
+    )
+    script.add_argument(
+        "--filter",
+        action="append",
+        metavar="QUERY",
+        help="Print the items matching QUERY without a terminal (repeatable)",
+    )
+    parser.add_argument(
+        "--first",
+        action="store_true",
+        help="With --filter: print only the best match, or the command it runs",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Config mode: apply edits to the config, theme and theme_dir "
+        "files while the menu is open",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse the config files instead of using the compiled snapshot",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Print import and config-load timings to stderr on exit "
+        "(also enabled by TMENU_STARTUP_PROFILE=1)",
+    )
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="Validate the config, theme and theme_dir fragments, with load "
+        "times, and exit",
+    )
+    parser.add_argument(
+        "--trace-report",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help="Summarize a trace recorded with TMENU_TRACE=FILE and exit "
+        "(defaults to $TMENU_TRACE)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep config and menus loaded and serve tmenu-client over a socket",
+    )
+    parser.add_argument(
+        "--socket", help="Socket path for --daemon (default: $XDG_RUNTIME_DIR)"
+    )
     args = parser.parse_args()
 
-    config, menu_items, submenus, title = load_config(args.config)
+    if args.startup_profile or profiling.enabled_by_env():
+        profiling.enable()
+
+    if args.check_config:
+        _run_check_config(args.config)
+        return
+
+    if args.trace_report is not None:
+        path = args.trace_report or trace.path
+        if not path:
+            parser.error("--trace-report needs a FILE or TMENU_TRACE")
+        trace.enabled = False  # do not trace the report itself
+        try:
+            text = trace.report(path)
+        except OSError as e:
+            print(f"Error: Cannot read trace: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(text)
+        return
+
+    if args.daemon:
+        from tmenu.daemon import serve
+
+        serve(args.config, args.socket)
+        return
 
-    if not sys.stdin.isatty():
-        _run_stdin_mode(args.placeholder or "", config)
+    script = None
+    if args.select is not None or args.filter:
+        try:
+            keys = None if args.select is None else headless.parse_keys(args.select)
+        except ValueError as e:
+            parser.error(f"--select: {e}")
+        script = Script(keys, args.filter or (), args.first)
+    elif args.first:
+        parser.error("--first needs --filter")
+
+    # Headless runs are often started from scripts with stdin on /dev/null;
+    # there, only a pipe, socket or file counts as items.
+    if script is not None:
+        pipe_mode = args.input is not None or _stdin_has_items()
+    else:
+        pipe_mode = args.input is not None or not sys.stdin.isatty()
+    if (args.multi or args.read0 or args.print0) and not pipe_mode:
+        parser.error("--multi, --read0 and --print0 need items on stdin or --input")
+    if args.watch and (pipe_mode or script is not None):
+        parser.error("--watch only applies to the interactive config menu")
+
+    preview = Previewer(args.preview) if args.preview and script is None else None
+
+    live = None
+    with profiling.phase("load_config"):
+        if args.watch:
+            from tmenu.watch import LiveConfig
+
+            # Kept parsed per file, so an edit re-reads only that file.
+            live = LiveConfig(args.config)
+            config, menu_items, submenus = live.config, live.menu_items, live.submenus
+            title = live.title
+        else:
+            load = load_config if args.no_cache else load_config_cached
+            config, menu_items, submenus, title = load(args.config)
+
+    if pipe_mode:
+        _run_stdin_mode(
+            args.placeholder or "",
+            config,
+            args.input,
+            preview,
+            args.multi,
+            args.read0,
+            args.print0,
+            script,
+        )
     else:
-        _run_config_mode(config, menu_items, submenus, title)
+        _run_config_mode(config, menu_items, submenus, title, preview, script, live)
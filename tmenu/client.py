@@ -0,0 +1,152 @@
+"""Thin client for ``tmenu --daemon``.
+
+Only standard-library modules that are cheap to import are used here, so a
+hotkey launch pays for interpreter startup and little else. The client
+passes its terminal to the daemon, waits for the selection, and runs the
+command itself, so it inherits the caller's environment and working
+directory exactly as ``tmenu`` would.
+"""
+
+from __future__ import annotations
+
+import array
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+from typing import Sequence
+
+_MAX_MSG = 65536
+
+
+def default_socket_path() -> str:
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "tmenu.sock")
+    # A private directory, created 0700 by the daemon: a bare path in /tmp
+    # could be taken first by another user.
+    return os.path.join("/tmp", f"tmenu-{os.getuid()}", "tmenu.sock")
+
+
+def peer_uid(sock: socket.socket) -> int | None:
+    """The uid of the process at the other end of *sock*, if known."""
+    try:
+        cred = sock.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+    except (AttributeError, OSError):  # SO_PEERCRED is Linux-only
+        return None
+    return struct.unpack("3i", cred)[1]
+
+
+def send_message(sock: socket.socket, msg: dict, fds: Sequence[int] = ()) -> None:
+    """Send one JSON line, optionally passing file descriptors along."""
+    data = json.dumps(msg).encode() + b"\n"
+    if fds:
+        anc = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))]
+        sent = sock.sendmsg([data], anc)
+        data = data[sent:]
+    if data:
+        sock.sendall(data)
+
+
+class MessageReader:
+    """Split a stream socket into JSON lines, collecting passed fds."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.fds: list[int] = []
+        self._buf = b""
+
+    def read(self) -> dict | None:
+        """Return the next message, or None if the peer closed the socket."""
+        while b"\n" not in self._buf:
+            fds = array.array("i")
+            data, anc, _, _ = self.sock.recvmsg(
+                _MAX_MSG, socket.CMSG_SPACE(4 * fds.itemsize)
+            )
+            for level, kind, payload in anc:
+                if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                    usable = len(payload) - len(payload) % fds.itemsize
+                    fds.frombytes(payload[:usable])
+            self.fds.extend(fds)
+            if not data:
+                return None
+            self._buf += data
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+
+def _request(sock: socket.socket, tty: int) -> dict | None:
+    send_message(
+        sock,
+        {
+            "term": os.environ.get("TERM", ""),
+            "colorterm": os.environ.get("COLORTERM", ""),
+        },
+        [tty],
+    )
+    reader = MessageReader(sock)
+    hello = reader.read()
+    if hello is None or "error" in hello:  # the daemon could not start a menu
+        return hello
+    child = int(hello["pid"])
+
+    # The tty delivers Ctrl-C and resizes to us, not to the daemon's child.
+    def forward(signum, _frame):
+        try:
+            os.kill(child, signum)
+        except OSError:
+            pass
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGWINCH, forward)
+    return reader.read()
+
+
+def main() -> None:
+    """Ask a running daemon for a selection; fall back to plain ``tmenu``."""
+    path = os.environ.get("TMENU_SOCKET") or default_socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        from tmenu.cli import main as cli_main
+
+        cli_main()
+        return
+    # The tty and the command to run must only ever go to our own daemon.
+    if peer_uid(sock) != os.getuid():
+        sock.close()
+        print(f"tmenu: {path} is not served by this user", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        tty = os.open("/dev/tty", os.O_RDWR | os.O_NOCTTY)
+    except OSError:
+        print("Error: Cannot open /dev/tty for interactive input.", file=sys.stderr)
+        sys.exit(1)
+
+    with sock:
+        reply = _request(sock, tty)
+    os.close(tty)
+
+    if reply is None:
+        print("tmenu: daemon closed the connection", file=sys.stderr)
+        sys.exit(1)
+    if reply.get("error"):
+        print(f"tmenu: {reply['error']}", file=sys.stderr)
+        sys.exit(1)
+    if reply.get("action") != "COMMAND":
+        sys.exit(130 if reply.get("interrupted") else 0)
+
+    from tmenu.execute import exec_command
+
+    exec_command(reply["value"])
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from x256 import x256  # type: ignore[import-untyped]
+from tmenu import profiling
 
 NAMED_COLORS: dict[str, int] = {
     "black": 0,
@@ -20,6 +20,30 @@ def _is_hex6(s: str) -> bool:
     return len(s) == 6 and all(c in "0123456789abcdefABCDEF" for c in s)
 
 
+_x256 = None
+
+
+def _from_hex(hex6: str) -> int:
+    # x256 is only needed for hex colors, so it is imported on first use.
+    global _x256
+    if _x256 is None:
+        with profiling.phase("import x256"):
+            from x256 import x256 as _x256  # type: ignore[import-untyped]
+    return _x256.from_hex(hex6)
+
+
+def hex_rgb(value: int | str) -> int:
+    """Return ``0xRRGGBB`` for a hex color string, or -1 for anything else."""
+    if not isinstance(value, str):
+        return -1
+    value = value.strip()
+    if value.startswith("#") or _is_hex6(value):
+        hex6 = value.lstrip("#")
+        if _is_hex6(hex6):
+            return int(hex6, 16)
+    return -1
+
+
 def parse_color(value: int | str) -> int:
     """Convert a hex string, color name, or int to a 256-color terminal number."""
     if isinstance(value, int):
@@ -30,7 +54,7 @@ def parse_color(value: int | str) -> int:
     value = value.strip()
 
     if value.startswith("#") or _is_hex6(value):
-        return x256.from_hex(value.lstrip("#").lower())
+        return _from_hex(value.lstrip("#").lower())
 
     try:
         return int(value)
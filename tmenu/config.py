@@ -3,41 +3,82 @@
 from __future__ import annotations
 
 import os
+import time
 from pathlib import Path
+from typing import NamedTuple
 
 try:
     import tomllib
 except ImportError:
     import tomli as tomllib  # type: ignore[no-redef]
 
-from tmenu.colors import parse_color
-from tmenu.types import Config
+from tmenu import profiling
+from tmenu.colors import hex_rgb, parse_color
+from tmenu.types import COLOR_FIELDS, Config
 
 
 def _xdg_config_home() -> Path:
     return Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"))
 
 
-def _load_toml(path: Path) -> dict | None:
-    """Load a TOML file, returning None on failure."""
+def _xdg_cache_home() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+
+
+_PARALLEL_FRAGMENTS = 4  # fragment count from which theme_dir is read in parallel
+_FRAGMENT_WORKERS = 8
+
+
+class TomlFile(NamedTuple):
+    """Outcome of reading one TOML file."""
+
+    path: Path
+    data: dict | None
+    error: str | None
+    seconds: float
+
+
+def _read_toml(path: Path) -> TomlFile:
+    """Load a TOML file, keeping the error and the time it took."""
+    start = time.perf_counter()
     try:
         with open(path, "rb") as f:
-            return tomllib.load(f)
-    except (OSError, tomllib.TOMLDecodeError):
-        return None
+            data, error = tomllib.load(f), None
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        data, error = None, str(e)
+    return TomlFile(path, data, error, time.perf_counter() - start)
 
 
-def load_theme(theme_name: str) -> dict | None:
-    """Search for a theme TOML in XDG config, package dir, and XDG data dirs."""
-    candidates = [
-        _xdg_config_home() / "tmenu" / "themes" / f"{theme_name}.toml",
-        Path(__file__).parent / "themes" / f"{theme_name}.toml",
+def _load_toml(path: Path) -> dict | None:
+    """Load a TOML file, returning None on failure."""
+    return _read_toml(path).data
+
+
+def _theme_dirs() -> list[Path]:
+    """Theme directories, highest priority first."""
+    dirs = [
+        _xdg_config_home() / "tmenu" / "themes",
+        Path(__file__).parent / "themes",
     ]
     for d in os.environ.get("XDG_DATA_DIRS", "/usr/local/share:/usr/share").split(":"):
         if d:
-            candidates.append(Path(d) / "tmenu" / "themes" / f"{theme_name}.toml")
+            dirs.append(Path(d) / "tmenu" / "themes")
+    return dirs
+
 
-    for path in candidates:
+def _theme_candidates(theme_name: str) -> list[Path]:
+    return [d / f"{theme_name}.toml" for d in _theme_dirs()]
+
+
+def load_theme(theme_name: str, sources: list[Path] | None = None) -> dict | None:
+    """Search for a theme TOML in XDG config, package dir, and XDG data dirs.
+
+    Every probed path, up to and including the one loaded, is appended to
+    *sources* if given.
+    """
+    for path in _theme_candidates(theme_name):
+        if sources is not None:
+            sources.append(path)
         if path.exists():
             data = _load_toml(path)
             if data is not None:
@@ -45,10 +86,49 @@ def load_theme(theme_name: str) -> dict | None:
     return None
 
 
+def _iter_submenus(data: dict):
+    """Yield ``(name, items)`` for each submenu table in parsed TOML.
+
+    ``[submenu.NAME]`` parses as a nested ``submenu`` table; a quoted
+    ``["submenu.NAME"]`` key is accepted too.
+    """
+    nested = data.get("submenu")
+    if isinstance(nested, dict):
+        for name, val in nested.items():
+            if isinstance(val, dict):
+                yield name, val
+    for key, val in data.items():
+        if key.startswith("submenu.") and isinstance(val, dict):
+            yield key[8:], val
+
+
+def _read_fragments(dirpath: Path) -> list[TomlFile]:
+    """Read every ``*.toml`` in *dirpath*, in sorted order.
+
+    Larger directories are read on a thread pool so file I/O overlaps;
+    results keep the sorted order regardless of which file finishes first.
+    """
+    paths = sorted(dirpath.glob("*.toml"))
+    if len(paths) < _PARALLEL_FRAGMENTS:
+        return [_read_toml(path) for path in paths]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = min(_FRAGMENT_WORKERS, len(paths))
+    with ThreadPoolExecutor(workers, thread_name_prefix="tmenu-config") as pool:
+        return list(pool.map(_read_toml, paths))
+
+
 def _load_custom_menus(
     menu_dir: str,
+    sources: list[Path] | None = None,
+    errors: list[TomlFile] | None = None,
 ) -> tuple[dict[str, str], dict[str, dict[str, str]]]:
-    """Load .toml menu files from a directory."""
+    """Load .toml menu files from a directory.
+
+    The directory and every file read are appended to *sources* if given.
+    Files that fail to load are skipped and appended to *errors* if given.
+    """
     items: dict[str, str] = {}
     subs: dict[str, dict[str, str]] = {}
 
@@ -56,32 +136,65 @@ def _load_custom_menus(
         return items, subs
 
     dirpath = Path(menu_dir).expanduser()
+    if sources is not None:
+        sources.append(dirpath)
     if not dirpath.is_dir():
         return items, subs
 
-    for path in sorted(dirpath.glob("*.toml")):
-        data = _load_toml(path)
-        if data is None:
+    for fragment in _read_fragments(dirpath):
+        if sources is not None:
+            sources.append(fragment.path)
+        if fragment.data is None:
+            if errors is not None:
+                errors.append(fragment)
             continue
-        if "menu" in data:
-            items.update(data["menu"])
-        for key, val in data.items():
-            if key.startswith("submenu."):
-                subs.setdefault(key[8:], {}).update(val)
+        _merge_fragment(items, subs, fragment.data)
 
     return items, subs
 
 
+def _merge_fragment(
+    items: dict[str, str], subs: dict[str, dict[str, str]], data: dict
+) -> None:
+    """Merge one parsed ``theme_dir`` fragment into *items* and *subs*."""
+    if "menu" in data:
+        items.update(data["menu"])
+    for name, val in _iter_submenus(data):
+        subs.setdefault(name, {}).update(val)
+
+
 def _apply_colors(opts: Config, colors: dict) -> None:
     """Set color fields on *opts* from a ``{name: value}`` mapping."""
-    for key, val in colors.items():
-        if hasattr(opts, key):
-            setattr(opts, key, parse_color(val))
+    _apply_resolved(
+        opts, {key: (parse_color(val), hex_rgb(val)) for key, val in colors.items()}
+    )
+
+
+def _apply_resolved(opts: Config, colors: dict[str, tuple[int, int]]) -> None:
+    """Set color fields from ``{name: (xterm-256, 0xRRGGBB or -1)}``."""
+    for key, (number, rgb) in colors.items():
+        if key in COLOR_FIELDS:
+            setattr(opts, key, number)
+            if rgb >= 0:
+                opts.truecolor[key] = rgb
+            else:
+                opts.truecolor.pop(key, None)
 
 
 def _apply_display(opts: Config, display: dict) -> str:
     """Set display fields on *opts* and return the title string."""
-    _fields = {"centered", "width", "height", "figlet", "figlet_font", "theme_dir"}
+    _fields = {
+        "centered",
+        "width",
+        "height",
+        "figlet",
+        "figlet_font",
+        "figlet_cache",
+        "frecency",
+        "generator_ttl",
+        "generator_cache",
+        "theme_dir",
+    }
     for key, val in display.items():
         if key in _fields:
             expected = type(getattr(opts, key))
@@ -89,53 +202,75 @@ def _apply_display(opts: Config, display: dict) -> str:
     return str(display.get("title", ""))
 
 
+def _build_config(
+    data: dict, theme_colors: dict[str, tuple[int, int]] | None
+) -> tuple[Config, str]:
+    """Config and title from a parsed config file and its theme's colors."""
+    opts = Config()
+    # Theme colors (lowest priority)
+    if theme_colors:
+        _apply_resolved(opts, theme_colors)
+    # Explicit colors override theme
+    if "colors" in data:
+        _apply_colors(opts, data["colors"])
+    # Display settings + title
+    title = ""
+    display = data.get("display", {})
+    if display:
+        title = _apply_display(opts, display)
+    return opts, title
+
+
+def _build_menus(data: dict) -> tuple[dict[str, str], dict[str, dict[str, str]]]:
+    """Menu items and submenus defined in a parsed config file itself."""
+    menu_items: dict[str, str] = dict(data.get("menu", {}))
+    submenus = {name: dict(val) for name, val in _iter_submenus(data)}
+    return menu_items, submenus
+
+
+def _default_config_path(config_path: str | None) -> str | None:
+    if config_path is None:
+        default = _xdg_config_home() / "tmenu" / "config.toml"
+        if default.exists():
+            return str(default)
+    return config_path
+
+
 def load_config(
     config_path: str | None = None,
+    sources: list[Path] | None = None,
 ) -> tuple[Config, dict[str, str], dict[str, dict[str, str]], str]:
     """Load configuration, menu items, submenus, and title from a TOML file.
 
     If no path is given, looks for ``$XDG_CONFIG_HOME/tmenu/config.toml``.
     Missing files are not an error — the Config dataclass defaults apply.
+    Every file and directory consulted is appended to *sources* if given.
     """
-    if config_path is None:
-        default = _xdg_config_home() / "tmenu" / "config.toml"
-        if default.exists():
-            config_path = str(default)
+    config_path = _default_config_path(config_path)
+    if config_path and sources is not None:
+        sources.append(Path(config_path))
 
-    opts = Config()
-    menu_items: dict[str, str] = {}
-    submenus: dict[str, dict[str, str]] = {}
-    title = ""
-
-    data = _load_toml(Path(config_path)) if config_path else None
+    with profiling.phase("parse_config"):
+        data = _load_toml(Path(config_path)) if config_path else None
     if data is None:
-        return opts, menu_items, submenus, title
+        return Config(), {}, {}, ""
 
-    # Theme colors (lowest priority)
-    display = data.get("display", {})
-    theme_name = display.get("theme", "").strip()
+    theme_colors = None
+    theme_name = data.get("display", {}).get("theme", "").strip()
     if theme_name:
-        theme = load_theme(theme_name)
-        if theme and "colors" in theme:
-            _apply_colors(opts, theme["colors"])
+        from tmenu import theme_index
 
-    # Explicit colors override theme
-    if "colors" in data:
-        _apply_colors(opts, data["colors"])
+        with profiling.phase("load_theme"):
+            theme = theme_index.lookup(theme_name, sources)
+        if theme is not None:
+            theme_colors = theme.colors
 
-    # Display settings + title
-    if display:
-        title = _apply_display(opts, display)
-
-    # Menu items and submenus
-    if "menu" in data:
-        menu_items.update(data["menu"])
-    for key, val in data.items():
-        if key.startswith("submenu."):
-            submenus[key[8:]] = dict(val)
+    opts, title = _build_config(data, theme_colors)
+    menu_items, submenus = _build_menus(data)
 
     # Merge custom menus from theme_dir
-    custom_items, custom_subs = _load_custom_menus(opts.theme_dir)
+    with profiling.phase("load_custom_menus"):
+        custom_items, custom_subs = _load_custom_menus(opts.theme_dir, sources)
     menu_items.update(custom_items)
     for name, sub_items in custom_subs.items():
         submenus.setdefault(name, {}).update(sub_items)
@@ -0,0 +1,215 @@
+"""Resident ``tmenu --daemon`` server.
+
+The daemon loads the config, themes and figlet titles once and keeps them in
+memory. For each client it forks: the child inherits the preloaded state,
+takes over the client's tty, runs the menu and replies with the selection.
+Config sources are re-checked between connections and reloaded in place
+when any of them changes.
+"""
+
+from __future__ import annotations
+
+import curses
+import os
+import socket
+import stat
+import sys
+from pathlib import Path
+
+from tmenu import trace
+from tmenu.cache import _stamp
+from tmenu.client import MessageReader, default_socket_path, send_message
+from tmenu.config import _xdg_config_home, load_config
+from tmenu.generators import GEN_PREFIX
+from tmenu.history import History
+from tmenu.menu import TMenu
+from tmenu.title import render_figlet
+from tmenu.types import Action
+
+_WATCH_INTERVAL = 1.0  # seconds between source checks while idle
+
+
+class DaemonState:
+    """Preloaded config, menus and title renders, reloaded on change."""
+
+    def __init__(self, config_path: str | None):
+        self.config_path = config_path
+        self.reload()
+
+    def reload(self) -> None:
+        sources: list[Path] = []
+        if self.config_path is None:
+            # Track the default location even while it does not exist yet.
+            sources.append(_xdg_config_home() / "tmenu" / "config.toml")
+        self.config, self.menu_items, self.submenus, self.title = load_config(
+            self.config_path, sources
+        )
+        self._stamps = [_stamp(p) for p in sources]
+        self._warm_titles()
+
+    def refresh(self) -> bool:
+        """Reload if any source changed since the last load."""
+        if all(_stamp(Path(s[0])) == s for s in self._stamps):
+            return False
+        self.reload()
+        return True
+
+    def _warm_titles(self) -> None:
+        cfg = self.config
+        if not cfg.figlet:
+            return
+        titles = {self.title}
+        for items in (self.menu_items, *self.submenus.values()):
+            titles.update(
+                label
+                for label, cmd in items.items()
+                if cmd.startswith(("submenu:", GEN_PREFIX))
+            )
+        for title in filter(None, titles):
+            render_figlet(title, cfg.figlet_font, cfg.width, cfg.figlet_cache)
+
+    def new_menu(self) -> TMenu:
+        return TMenu(
+            list(self.menu_items.keys()),
+            config=self.config,
+            menu_items=self.menu_items,
+            submenus=self.submenus,
+            title=self.title,
+            history=History() if self.config.frecency else None,
+        )
+
+
+def _reap() -> None:
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+def _run_child(conn: socket.socket, tty: int, request: dict, state: DaemonState):
+    """Body of the forked per-client process. Never returns."""
+    status = 0
+    try:
+        os.dup2(tty, 0)
+        os.dup2(tty, 1)
+        os.close(tty)
+        if request.get("term"):
+            os.environ["TERM"] = request["term"]
+        if request.get("colorterm"):
+            os.environ["COLORTERM"] = request["colorterm"]
+        send_message(conn, {"pid": os.getpid()})
+
+        reply: dict = {"action": None}
+        try:
+            menu = state.new_menu()
+            sel = curses.wrapper(menu.run)
+        except KeyboardInterrupt:
+            reply["interrupted"] = True
+        else:
+            if sel is not None:
+                reply = {"action": sel.action.name, "value": sel.value}
+                reply["label"] = sel.label
+            if sel is not None and sel.action == Action.COMMAND:
+                History().record(menu.all_items[menu.result_index], sel.value)
+        send_message(conn, reply)
+    except Exception as e:
+        status = 1
+        try:
+            send_message(conn, {"error": str(e)})
+        except OSError:
+            pass
+    finally:
+        trace.flush()
+        os._exit(status)
+
+
+def _handle(listener: socket.socket, conn: socket.socket, state: DaemonState):
+    reader = MessageReader(conn)
+    try:
+        request = reader.read()
+    except (OSError, ValueError):
+        request = None
+    if request is None or not reader.fds:
+        for fd in reader.fds:
+            os.close(fd)
+        conn.close()
+        return
+
+    tty, extra = reader.fds[0], reader.fds[1:]
+    for fd in extra:
+        os.close(fd)
+
+    pid = os.fork()
+    if pid == 0:
+        listener.close()
+        _run_child(conn, tty, request, state)
+    os.close(tty)
+    conn.close()
+
+
+def _private_dir(path: str) -> None:
+    """Create *path* 0700, or check that an existing one is ours alone."""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{path} is not a private directory of this user")
+
+
+def _remove_stale(path: str) -> None:
+    """Remove a socket left by an earlier daemon of ours; refuse anything else."""
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{path} exists and is not a socket of this user")
+    os.unlink(path)
+
+
+def serve(config_path: str | None, socket_path: str | None = None) -> None:
+    """Listen for clients until interrupted."""
+    path = socket_path or default_socket_path()
+    try:
+        if socket_path is None:
+            _private_dir(os.path.dirname(path))
+        _remove_stale(path)
+    except OSError as e:
+        print(f"tmenu: cannot listen on {path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    state = DaemonState(config_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(old_umask)
+    listener.listen(16)
+    listener.settimeout(_WATCH_INTERVAL)
+    print(f"tmenu: listening on {path}", file=sys.stderr)
+
+    try:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                _reap()
+                state.refresh()
+                continue
+            conn.settimeout(None)
+            state.refresh()
+            _handle(listener, conn, state)
+            _reap()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,132 @@
+"""Event loop for the interactive menu."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import selectors
+import signal
+import threading
+import time
+from typing import Callable
+
+# A burst of resize events (dragging a window edge or a tiling split) is
+# handled once it has been quiet this long, or at the latest after
+# RESIZE_MAX_DELAY, so the screen keeps up with a long drag.
+RESIZE_SETTLE = 0.05
+RESIZE_MAX_DELAY = 0.25
+
+
+class EventLoop:
+    """Wait on the tty, a wakeup pipe, SIGWINCH and timers at once.
+
+    Background threads (the stdin reader, preview workers, embedding code
+    calling :meth:`TMenu.post`) call :meth:`wake`, which is safe from any
+    thread and from signal handlers, so the menu loop can block until
+    there is actually something to do instead of polling.
+    """
+
+    def __init__(self, tty_fd: int):
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(tty_fd, selectors.EVENT_READ, "tty")
+        self._selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        self._timers: list[tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._resize_first: float | None = None  # start of a pending burst
+        self._resize_last = 0.0
+        self._old_winch = None
+        self._winch_installed = False
+        if threading.current_thread() is threading.main_thread():
+            self._old_winch = signal.signal(signal.SIGWINCH, self._on_winch)
+            self._winch_installed = True
+
+    def wake(self) -> None:
+        """Interrupt a pending :meth:`wait`."""
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:  # pipe full (already awake) or closed
+            pass
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> None:
+        """Run *callback* from :meth:`wait` once *delay* seconds have passed.
+
+        Only call this from the thread that runs the loop.
+        """
+        heapq.heappush(
+            self._timers, (time.monotonic() + delay, next(self._seq), callback)
+        )
+
+    def add_reader(self, fd: int, callback: Callable[[], None]) -> None:
+        """Run *callback* from :meth:`wait` whenever *fd* is readable."""
+        self._selector.register(fd, selectors.EVENT_READ, callback)
+
+    def remove_reader(self, fd: int) -> None:
+        self._selector.unregister(fd)
+
+    def request_resize(self) -> None:
+        """Note that the terminal was resized (SIGWINCH or ``KEY_RESIZE``)."""
+        now = time.monotonic()
+        if self._resize_first is None:
+            self._resize_first = now
+        self._resize_last = now
+        self.wake()
+
+    def _resize_due(self) -> float | None:
+        first = self._resize_first
+        if first is None:
+            return None
+        return min(self._resize_last + RESIZE_SETTLE, first + RESIZE_MAX_DELAY)
+
+    def take_resize(self) -> bool:
+        """True once after each burst of resizes has settled."""
+        due = self._resize_due()
+        if due is None or time.monotonic() < due:
+            return False
+        self._resize_first = None
+        return True
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until input, a wakeup, a due timer or *timeout* seconds.
+
+        Due timers are run before returning. Returns True if the tty has
+        input to read.
+        """
+        if self._timers:
+            until_timer = max(0.0, self._timers[0][0] - time.monotonic())
+            timeout = until_timer if timeout is None else min(timeout, until_timer)
+        resize_due = self._resize_due()
+        if resize_due is not None:
+            until_resize = max(0.0, resize_due - time.monotonic())
+            timeout = until_resize if timeout is None else min(timeout, until_resize)
+        tty_ready = False
+        for key, _ in self._selector.select(timeout):
+            if key.data == "tty":
+                tty_ready = True
+            elif callable(key.data):
+                key.data()
+            else:
+                try:
+                    while os.read(self._wake_r, 4096):
+                        pass
+                except OSError:
+                    pass
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            heapq.heappop(self._timers)[2]()
+        return tty_ready
+
+    def close(self) -> None:
+        if self._winch_installed:
+            # A handler installed from C (curses' own) cannot be put back.
+            old = self._old_winch if self._old_winch is not None else signal.SIG_DFL
+            signal.signal(signal.SIGWINCH, old)
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _on_winch(self, _signum, _frame) -> None:
+        self.request_resize()
@@ -0,0 +1,24 @@
+"""Replace the current process with the command selected in config mode."""
+
+from __future__ import annotations
+
+import os
+import shlex
+import sys
+from typing import NoReturn
+
+
+def exec_command(command: str) -> NoReturn:
+    """``exec`` *command*, exiting with a shell-style status if that fails."""
+    try:
+        parts = shlex.split(command)
+        os.execvp(parts[0], parts)
+    except FileNotFoundError:
+        print(f"tmenu: command not found: {command}", file=sys.stderr)
+        sys.exit(127)
+    except PermissionError:
+        print(f"tmenu: permission denied: {command}", file=sys.stderr)
+        sys.exit(126)
+    except Exception as e:
+        print(f"tmenu: error executing command: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,187 @@
+"""fzf-style fuzzy matching with an incremental result stack."""
+
+from __future__ import annotations
+
+from typing import NamedTuple, Sequence
+
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = SCORE_MATCH // 2
+BONUS_NONWORD = SCORE_MATCH // 2
+BONUS_CAMEL = BONUS_BOUNDARY + SCORE_GAP_EXTENSION
+BONUS_CONSECUTIVE = -(SCORE_GAP_START + SCORE_GAP_EXTENSION)
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+
+_NONWORD, _LOWER, _UPPER, _LETTER, _NUMBER = range(5)
+
+# Results are sorted on a single int: best score first, then input order.
+_IDX_BITS = 40
+_IDX_MASK = (1 << _IDX_BITS) - 1
+_SCORE_CEIL = 1 << 20
+
+
+def _char_class(c: str) -> int:
+    if c.islower():
+        return _LOWER
+    if c.isupper():
+        return _UPPER
+    if c.isdigit():
+        return _NUMBER
+    if c.isalpha():
+        return _LETTER
+    return _NONWORD
+
+
+def _bonus(prev: int, cls: int) -> int:
+    if prev == _NONWORD and cls != _NONWORD:
+        return BONUS_BOUNDARY
+    if (prev == _LOWER and cls == _UPPER) or (prev != _NUMBER and cls == _NUMBER):
+        return BONUS_CAMEL
+    if cls == _NONWORD:
+        return BONUS_NONWORD
+    return 0
+
+
+def _match_term(text: str, hay: str, term: str) -> tuple[int, list[int]] | None:
+    """Score one term against *text* (fzf v1: forward scan, backward shrink)."""
+    pos = -1
+    for ch in term:
+        pos = hay.find(ch, pos + 1)
+        if pos < 0:
+            return None
+    end = pos = pos + 1
+    for ch in reversed(term):
+        pos = hay.rfind(ch, 0, pos)
+    start = pos
+
+    score = 0
+    positions: list[int] = []
+    in_gap = False
+    consecutive = 0
+    first_bonus = 0
+    pidx = 0
+    prev = _char_class(text[start - 1]) if 0 < start <= len(text) else _NONWORD
+    for idx in range(start, end):
+        cls = _char_class(text[idx]) if idx < len(text) else _NONWORD
+        if pidx < len(term) and hay[idx] == term[pidx]:
+            positions.append(idx)
+            score += SCORE_MATCH
+            bonus = _bonus(prev, cls)
+            if consecutive == 0:
+                first_bonus = bonus
+            else:
+                if bonus >= BONUS_BOUNDARY and bonus > first_bonus:
+                    first_bonus = bonus
+                bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+            score += bonus * BONUS_FIRST_CHAR_MULTIPLIER if pidx == 0 else bonus
+            in_gap = False
+            consecutive += 1
+            pidx += 1
+        else:
+            score += SCORE_GAP_EXTENSION if in_gap else SCORE_GAP_START
+            in_gap = True
+            consecutive = 0
+            first_bonus = 0
+        prev = cls
+    return score, positions
+
+
+class Match(NamedTuple):
+    score: int
+    positions: list[int]
+
+
+def fuzzy_match(text: str, query: str) -> Match | None:
+    """Match *query* against *text*. Returns None if it does not match.
+
+    The query is split on whitespace and every term must match. Matching is
+    case-insensitive unless the query contains an uppercase letter.
+    """
+    terms = query.split()
+    case_sensitive = query != query.lower()
+    hay = text if case_sensitive else text.lower()
+    if not case_sensitive:
+        terms = [t.lower() for t in terms]
+
+    total = 0
+    positions: set[int] = set()
+    for term in terms:
+        m = _match_term(text, hay, term)
+        if m is None:
+            return None
+        total += m[0]
+        positions.update(m[1])
+    return Match(total, sorted(positions))
+
+
+class _Level(NamedTuple):
+    query: str
+    keys: list[int]
+    indices: list[int]
+
+
+class FuzzyFilter:
+    """Incremental fuzzy filter over the first *size* entries of *items*.
+
+    Each query that extends the previous one is matched only against the
+    previous results and pushed on a stack; deleting characters pops back to
+    the cached level, so typing and backspacing never rescan everything.
+    """
+
+    def __init__(self, items: Sequence[str], size: int | None = None):
+        self._items = items
+        self._size = len(items) if size is None else size
+        self._stack: list[_Level] = []
+
+    @property
+    def query(self) -> str:
+        return self._stack[-1].query if self._stack else ""
+
+    @property
+    def results(self) -> list[int] | None:
+        """Matching item indices, best first; None when no query is active."""
+        return self._stack[-1].indices if self._stack else None
+
+    def _rank(self, query: str, candidates) -> list[int]:
+        items = self._items
+        keys = []
+        for idx in candidates:
+            m = fuzzy_match(items[idx], query)
+            if m is not None:
+                keys.append(((_SCORE_CEIL - m.score) << _IDX_BITS) | idx)
+        keys.sort()
+        return keys
+
+    def set_query(self, query: str) -> list[int] | None:
+        """Filter for *query*, reusing cached levels where possible."""
+        if not query.split():
+            self._stack.clear()
+            return None
+        while self._stack and not query.startswith(self._stack[-1].query):
+            self._stack.pop()
+        if self._stack and self._stack[-1].query == query:
+            return self._stack[-1].indices
+        candidates = self._stack[-1].indices if self._stack else range(self._size)
+        keys = self._rank(query, candidates)
+        self._stack.append(_Level(query, keys, [k & _IDX_MASK for k in keys]))
+        return self._stack[-1].indices
+
+    def extend(self, size: int) -> None:
+        """Account for items appended up to *size*, updating every level."""
+        candidates: Sequence[int] = range(self._size, size)
+        self._size = size
+        for i, level in enumerate(self._stack):
+            new_keys = self._rank(level.query, candidates)
+            if not new_keys:
+                break
+            keys = sorted(level.keys + new_keys)
+            self._stack[i] = _Level(level.query, keys, [k & _IDX_MASK for k in keys])
+            candidates = [k & _IDX_MASK for k in new_keys]
+
+    def positions(self, idx: int) -> list[int]:
+        """Matched character positions of item *idx* for the current query."""
+        if not self._stack:
+            return []
+        m = fuzzy_match(self._items[idx], self.query)
+        return m.positions if m is not None else []
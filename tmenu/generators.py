@@ -0,0 +1,148 @@
+"""Generator submenus: entries whose items come from running a command."""
+
+from __future__ import annotations
+
+import hashlib
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from tmenu.cache import _write_atomic
+from tmenu.config import _xdg_cache_home
+
+GEN_PREFIX = "gen:"
+_MAX_CONCURRENT = 4
+
+
+def parse_output(text: str) -> dict[str, str]:
+    """Turn generator output into menu items.
+
+    Each non-blank line is an item. A tab splits it into the label and the
+    command to run; without one, the label is the command.
+    """
+    items: dict[str, str] = {}
+    for line in text.splitlines():
+        label, sep, command = line.partition("\t")
+        label = label.strip()
+        if label:
+            items[label] = command.strip() if sep else label
+    return items
+
+
+def _disk_path(command: str) -> Path:
+    digest = hashlib.blake2b(command.encode(), digest_size=16).hexdigest()
+    return _xdg_cache_home() / "tmenu" / "gen" / digest
+
+
+class _Entry:
+    __slots__ = ("items", "fetched", "version", "running", "done")
+
+    def __init__(self) -> None:
+        self.items: dict[str, str] | None = None
+        self.fetched = 0.0  # wall-clock time of the output in items
+        self.version = 0
+        self.running = False
+        self.done = threading.Event()  # set whenever no run is in flight
+        self.done.set()
+
+
+class Generators:
+    """Run ``gen:`` commands in the background and cache their items.
+
+    Output is kept in memory and under ``$XDG_CACHE_HOME/tmenu/gen``, so a
+    generator opened in a later session shows its last items at once.
+    Entries older than *ttl* seconds are served as they are while a refresh
+    runs; :attr:`notify` is called when a refresh lands.
+    """
+
+    def __init__(self, ttl: float = 60.0, disk_cache: bool = True):
+        self.ttl = ttl
+        self.disk_cache = disk_cache
+        self.notify: Callable[[], None] | None = None
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(_MAX_CONCURRENT)
+
+    def _entry(self, command: str) -> _Entry:
+        """Entry for *command*, seeded from the disk cache. Lock held."""
+        entry = self._entries.get(command)
+        if entry is None:
+            entry = self._entries[command] = _Entry()
+            if self.disk_cache:
+                path = _disk_path(command)
+                try:
+                    entry.items = parse_output(path.read_text(encoding="utf-8"))
+                    entry.fetched = path.stat().st_mtime
+                    entry.version = 1
+                except (OSError, UnicodeDecodeError):
+                    pass
+        return entry
+
+    def lookup(self, command: str) -> tuple[dict[str, str] | None, int]:
+        """Cached items of *command* (possibly stale) and their version."""
+        with self._lock:
+            entry = self._entry(command)
+            return entry.items, entry.version
+
+    def running(self, command: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(command)
+            return entry is not None and entry.running
+
+    def wait(self, command: str, timeout: float | None = None) -> None:
+        """Block until a run of *command* in flight, if any, has landed."""
+        with self._lock:
+            entry = self._entry(command)
+        entry.done.wait(timeout)
+
+    def refresh(self, command: str) -> None:
+        """Start running *command* unless its output is fresh or on its way."""
+        with self._lock:
+            entry = self._entry(command)
+            if entry.running or (
+                entry.items is not None and time.time() - entry.fetched < self.ttl
+            ):
+                return
+            entry.running = True
+            entry.done.clear()
+        threading.Thread(
+            target=self._run, args=(command,), name="tmenu-gen", daemon=True
+        ).start()
+
+    def _run(self, command: str) -> None:
+        with self._slots:
+            shell = command[len(GEN_PREFIX) :]
+            try:
+                proc = subprocess.run(
+                    ["sh", "-c", shell],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+                text = proc.stdout.decode("utf-8", "replace")
+            except OSError:
+                text = ""
+        items = parse_output(text)
+        # On disk before it is reported done, so a new session sees it.
+        if self.disk_cache:
+            self._write_disk(command, text)
+
+        with self._lock:
+            entry = self._entries[command]
+            entry.items = items
+            entry.fetched = time.time()
+            entry.version += 1
+            entry.running = False
+            entry.done.set()
+        notify = self.notify
+        if notify is not None:
+            notify()
+
+    @staticmethod
+    def _write_disk(command: str, text: str) -> None:
+        try:
+            _write_atomic(_disk_path(command), text.encode("utf-8"))
+        except OSError:
+            pass
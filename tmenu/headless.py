@@ -0,0 +1,110 @@
+"""Scripted menu runs without a terminal (``--select`` and ``--filter``).
+
+The menu is driven through the same key handling, filtering and submenu
+navigation as an interactive session, so a script sees exactly what a user
+pressing the same keys would. One loaded menu answers any number of steps;
+each starts again from the root level with an empty query.
+"""
+
+from __future__ import annotations
+
+import curses
+import re
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+from tmenu.menu import TMenu
+from tmenu.types import Action, Selection
+
+_NAMED_KEYS: dict[str, int | str] = {
+    "enter": "\n",
+    "tab": "\t",
+    "esc": "\x1b",
+    "bs": "\x7f",
+    "space": " ",
+    "lt": "<",
+    "up": curses.KEY_UP,
+    "down": curses.KEY_DOWN,
+    "home": curses.KEY_HOME,
+    "end": curses.KEY_END,
+    "pgup": curses.KEY_PPAGE,
+    "pgdn": curses.KEY_NPAGE,
+}
+_KEY_NAME = re.compile(r"<([^<>\s]+)>")
+
+
+def parse_keys(spec: str) -> list[int | str]:
+    """Split a key script into the keys :meth:`TMenu.feed` takes.
+
+    Plain characters stand for themselves; ``<Enter>``, ``<Tab>``,
+    ``<Esc>``, ``<BS>``, ``<Space>``, ``<Up>``, ``<Down>``, ``<Home>``,
+    ``<End>``, ``<PgUp>``, ``<PgDn>``, ``<C-x>`` (Ctrl+x) and ``<lt>`` (a
+    literal ``<``) name the rest, case-insensitively.
+    """
+    keys: list[int | str] = []
+    pos = 0
+    for m in _KEY_NAME.finditer(spec):
+        keys.extend(spec[pos : m.start()])
+        name = m.group(1).lower()
+        if len(name) == 3 and name.startswith("c-") and "a" <= name[2] <= "z":
+            keys.append(chr(ord(name[2]) & 0x1F))
+        elif name in _NAMED_KEYS:
+            keys.append(_NAMED_KEYS[name])
+        else:
+            raise ValueError(f"unknown key {m.group(0)}")
+        pos = m.end()
+    keys.extend(spec[pos:])
+    return keys
+
+
+class Step(NamedTuple):
+    """Outcome of one scripted step.
+
+    *indices* index ``menu.all_items``: the chosen item (or every marked
+    one), or all matches of a plain query, best first. *selection* is the
+    Selection that ended the step, if any.
+    """
+
+    indices: list[int]
+    selection: Selection | None = None
+
+
+def select(menu: TMenu, keys: Iterable[int | str]) -> Step:
+    """Press *keys* from a fresh start and report what they chose."""
+    menu.reset()
+    sel = menu.feed(keys)
+    if sel is None or sel.action != Action.COMMAND:
+        return Step([], sel)
+    assert menu.result_index is not None
+    return Step(menu.marked() or [menu.result_index], sel)
+
+
+def first_match(menu: TMenu, query: str) -> Step:
+    """Search for *query* and accept the best match, as ``/query<Enter>`` would."""
+    return select(menu, ["/", *query, "\n"])
+
+
+def matches(menu: TMenu, query: str) -> Step:
+    """Every root-level item matching *query*, best first."""
+    menu.reset()
+    return Step(menu.filter(query))
+
+
+class Script(NamedTuple):
+    """What to play against a menu: ``--select`` keys and/or ``--filter``
+    queries, the latter accepting their best match when *first* is set."""
+
+    keys: list[int | str] | None = None
+    queries: Sequence[str] = ()
+    first: bool = False
+
+
+def run(menu: TMenu, script: Script) -> Iterator[Step]:
+    """Load *menu* fully, then play each step of *script* against it."""
+    menu.finish_loading()
+    if script.keys is not None:
+        yield select(menu, script.keys)
+    for query in script.queries:
+        if script.first:
+            yield first_match(menu, query)
+        else:
+            yield matches(menu, query)
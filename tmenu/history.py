@@ -0,0 +1,190 @@
+"""Frecency history of selected commands under ``$XDG_STATE_HOME/tmenu``.
+
+The store is a flat file of fixed 24-byte records: a 16-byte key, a weight
+and a timestamp. A key is an 8-byte digest of the scope followed by one of
+the item, so a scope with nothing recorded is known without hashing any of
+its items. Each selection appends one record. Scores decay with a
+half-life, so a key's records collapse exactly into one (weight, time)
+pair; when the file outgrows its bound it is rewritten that way, keeping
+only the highest-scoring keys.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Sequence, Tuple
+
+from tmenu.cache import _write_atomic
+
+_RECORD = struct.Struct("<16sfI")  # key, weight, unix time
+_HALF_LIFE = 7 * 24 * 3600.0  # seconds for a selection to lose half its weight
+_MAX_RECORDS = 1024  # compact once the file holds this many records
+_KEEP_KEYS = 256  # keys surviving a compaction
+_MIN_SCORE = 1e-3  # compaction drops keys that decayed below this
+_SCOPE_RECORDS = 64  # leading records that identify a piped input set
+_DIGEST = 8  # bytes of each half of a key
+
+
+def _xdg_state_home() -> Path:
+    return Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state")
+
+
+def default_path() -> Path:
+    return _xdg_state_home() / "tmenu" / "history.bin"
+
+
+def _decay(weight: float, since: float, now: float) -> float:
+    return weight * 2.0 ** ((since - now) / _HALF_LIFE)
+
+
+class History:
+    """Frecency scores for the items of one menu source.
+
+    *scope* separates sources that could share labels: config menus use
+    ``""``, so the same line piped from two different commands is ranked
+    independently. Piped input passes None and calls :meth:`bind` once the
+    input is complete; until then nothing is ranked or recorded.
+    """
+
+    def __init__(self, scope: str | None = "", path: Path | None = None):
+        self.scope = scope
+        self.path = path or default_path()
+        self._entries: Dict[bytes, Tuple[float, int]] | None = None
+        self._scopes: set[bytes] = set()  # scope digests with entries
+        self._digest: tuple[str, bytes] | None = None  # scope, its digest
+        self._records = 0
+
+    def bind(self, items: Sequence[str]) -> None:
+        """Scope an unscoped history to the complete input *items*: a digest
+        of its count and leading records."""
+        if self.scope is not None:
+            return
+        h = hashlib.blake2b(str(len(items)).encode(), digest_size=16)
+        for i in range(min(len(items), _SCOPE_RECORDS)):
+            h.update(items[i].encode("utf-8", "surrogateescape") + b"\0")
+        self.scope = f"stdin:{h.hexdigest()}"
+
+    def _scope_digest(self) -> bytes:
+        scope = self.scope
+        assert scope is not None
+        if self._digest is None or self._digest[0] != scope:
+            data = scope.encode("utf-8", "replace")
+            self._digest = (scope, hashlib.blake2b(data, digest_size=_DIGEST).digest())
+        return self._digest[1]
+
+    def key(self, label: str, command: str) -> bytes:
+        data = "\0".join((label, command)).encode("utf-8", "replace")
+        item = hashlib.blake2b(data, digest_size=_DIGEST).digest()
+        return self._scope_digest() + item
+
+    def known(self) -> bool:
+        """True if anything has been recorded under this scope."""
+        if self.scope is None or not self._load():
+            return False
+        return self._scope_digest() in self._scopes
+
+    def _load(self) -> Dict[bytes, Tuple[float, int]]:
+        if self._entries is not None:
+            return self._entries
+        entries: Dict[bytes, Tuple[float, int]] = {}
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        usable = len(data) - len(data) % _RECORD.size  # ignore a torn tail
+        for key, weight, stamp in _RECORD.iter_unpack(data[:usable]):
+            old = entries.get(key)
+            if old is None:
+                entries[key] = (weight, stamp)
+            elif stamp >= old[1]:
+                entries[key] = (_decay(old[0], old[1], stamp) + weight, stamp)
+            else:
+                entries[key] = (old[0] + _decay(weight, stamp, old[1]), old[1])
+        self._entries = entries
+        self._scopes = {key[:_DIGEST] for key in entries}
+        self._records = usable // _RECORD.size
+        return entries
+
+    def score(self, key: bytes, now: float | None = None) -> float:
+        entry = self._load().get(key)
+        if entry is None:
+            return 0.0
+        return _decay(entry[0], entry[1], time.time() if now is None else now)
+
+    def rank(
+        self, labels: Sequence[str], commands: Mapping[str, str] | None = None
+    ) -> list[str]:
+        """*labels* by descending score; unseen labels keep their order."""
+        first = self.promoted(labels, commands)
+        if not first:
+            return list(labels)
+        seen = set(first)
+        rest = (label for i, label in enumerate(labels) if i not in seen)
+        return [labels[i] for i in first] + list(rest)
+
+    def promoted(
+        self, labels: Sequence[str], commands: Mapping[str, str] | None = None
+    ) -> list[int]:
+        """Indices of the *labels* that have a score, best first.
+
+        Only these move; every other label keeps its place after them. Each
+        label is hashed, unless nothing was ever recorded under this scope;
+        only those whose digest is among the scope's keys are scored.
+        """
+        if not self.known():
+            return []
+        prefix = self._scope_digest()
+        wanted = {key[_DIGEST:] for key in self._load() if key.startswith(prefix)}
+        commands = commands or {}
+        blake2b = hashlib.blake2b
+        now = time.time()
+        scored = []
+        for i, label in enumerate(labels):
+            data = f"{label}\0{commands.get(label, label) if commands else label}"
+            item = blake2b(data.encode("utf-8", "replace"), digest_size=_DIGEST)
+            if item.digest() in wanted:
+                scored.append((-self.score(prefix + item.digest(), now), i))
+        scored.sort()
+        return [i for _, i in scored]
+
+    def record(self, label: str, command: str) -> None:
+        """Append one selection, compacting the file when it is full."""
+        if self.scope is None:
+            return
+        entries = self._load()
+        key = self.key(label, command)
+        now = int(time.time())
+        old = entries.get(key)
+        entries[key] = (1.0 + (_decay(old[0], old[1], now) if old else 0.0), now)
+        self._scopes.add(key[:_DIGEST])
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._records + 1 >= _MAX_RECORDS:
+                self._compact(now)
+            else:
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                try:
+                    os.write(fd, _RECORD.pack(key, 1.0, now))
+                finally:
+                    os.close(fd)
+                self._records += 1
+        except OSError:
+            pass
+
+    def _compact(self, now: int) -> None:
+        assert self._entries is not None
+        live = [
+            (key, _decay(weight, stamp, now))
+            for key, (weight, stamp) in self._entries.items()
+        ]
+        live.sort(key=lambda item: -item[1])
+        live = [(k, s) for k, s in live[:_KEEP_KEYS] if s >= _MIN_SCORE]
+        _write_atomic(self.path, b"".join(_RECORD.pack(k, s, now) for k, s in live))
+        self._entries = {k: (s, now) for k, s in live}
+        self._scopes = {k[:_DIGEST] for k in self._entries}
+        self._records = len(live)
@@ -0,0 +1,177 @@
+"""Virtual item table used as the menu model."""
+
+from __future__ import annotations
+
+import enum
+from bisect import bisect_right
+from itertools import compress
+from typing import Iterator, MutableSequence, Sequence, overload
+
+from tmenu.width import WidthCache, cut, display_width
+
+
+class ItemKind(enum.IntEnum):
+    """What choosing an item does. Stored one byte per item."""
+
+    COMMAND = 0
+    SUBMENU = 1
+    GENERATOR = 2
+    BACK = 3
+    EXIT = 4
+
+
+class ItemList(Sequence[str]):
+    """User items followed by fixed trailing labels (Back/Exit), uncopied.
+
+    *items* is used directly as the backing store, so anything that behaves
+    like a sequence of strings works: a plain list, or a lazily decoded line
+    index over a large file. Only the rows that are actually looked up are
+    ever materialized.
+
+    As a sequence it holds the labels. Parallel columns give each item's
+    command (the submenu name for submenus) and :class:`ItemKind`, so a
+    selection is dispatched by index, never by comparing labels. Without
+    *commands*, every user item is a command that runs as its own label,
+    which is how piped input is stored. Display widths are measured once per
+    item, as rows are first drawn.
+
+    :meth:`promote` moves a few items to the front without touching the
+    backing store; every index taken or returned is then a view index, and
+    :meth:`source_index` gives the backing store's.
+    """
+
+    def __init__(
+        self,
+        items: Sequence[str],
+        trailer: Sequence[str] = (),
+        commands: list[str] | None = None,
+        kinds: bytearray | None = None,
+        trailer_kinds: Sequence[ItemKind] = (),
+    ):
+        self._items = items
+        self._trailer = tuple(trailer)
+        self._commands = commands
+        self._kinds = kinds
+        self._trailer_kinds = tuple(trailer_kinds) or (ItemKind.EXIT,) * len(
+            self._trailer
+        )
+        self._widths = WidthCache(items)
+        self._first: list[int] = []  # promoted backing indices, in view order
+        self._skips: list[int] = []  # sorted promoted indices, minus their rank
+
+    @property
+    def backing(self) -> Sequence[str]:
+        return self._items
+
+    @property
+    def user_count(self) -> int:
+        """Number of items before the trailing labels."""
+        return len(self._items)
+
+    def promote(self, indices: Sequence[int]) -> None:
+        """Show the user items at backing *indices* first, in that order,
+        and the rest after them in backing order."""
+        self._first = list(indices)
+        self._skips = [b - rank for rank, b in enumerate(sorted(self._first))]
+
+    def source_index(self, index: int) -> int:
+        """Backing-store index of user item *index*."""
+        first = self._first
+        if not first:
+            return index
+        if index < len(first):
+            return first[index]
+        rest = index - len(first)
+        return rest + bisect_right(self._skips, rest)
+
+    def __len__(self) -> int:
+        return len(self._items) + len(self._trailer)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        n = len(self._items)
+        if index < 0:
+            index += n + len(self._trailer)
+        if 0 <= index < n:
+            return self._items[self.source_index(index)]
+        if index < 0:
+            raise IndexError("item index out of range")
+        return self._trailer[index - n]
+
+    def __iter__(self) -> Iterator[str]:
+        if self._first:
+            yield from map(self.__getitem__, range(len(self._items)))
+        else:
+            yield from self._items
+        yield from self._trailer
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"ItemList({len(self._items)} items, trailer={self._trailer!r})"
+
+    def width(self, index: int) -> int:
+        """Terminal columns item *index* takes."""
+        n = len(self._items)
+        if index >= n:
+            return display_width(self._trailer[index - n])
+        return self._widths.width(self.source_index(index))
+
+    def fit(self, index: int, width: int) -> tuple[str, int]:
+        """Item *index* cut to at most *width* columns, and its width."""
+        n = len(self._items)
+        if index >= n:
+            label = self._trailer[index - n]
+            end, cols = cut(label, width)
+            return label[:end], cols
+        return self._widths.fit(self.source_index(index), width)
+
+    def kind(self, index: int) -> ItemKind:
+        n = len(self._items)
+        if index >= n:
+            return self._trailer_kinds[index - n]
+        if self._kinds is None:
+            return ItemKind.COMMAND
+        return ItemKind(self._kinds[self.source_index(index)])
+
+    def command(self, index: int) -> str:
+        """The command of user item *index*, or the submenu it opens."""
+        if self._commands is None:
+            return self[index]
+        return self._commands[self.source_index(index)]
+
+    def commands_of(self, kind: ItemKind) -> Iterator[str]:
+        """Commands of every user item of *kind*, in backing order."""
+        if self._kinds is None or self._commands is None:
+            return iter(() if kind != ItemKind.COMMAND else self._items)
+        return compress(self._commands, map(kind.__eq__, self._kinds))
+
+    def extend(
+        self,
+        items: Sequence[str],
+        commands: list[str] | None = None,
+        kinds: bytearray | None = None,
+    ) -> None:
+        """Append to the backing store, copying a read-only one into a list
+        first.
+
+        *commands* and *kinds* default to running each label as a command.
+        """
+        backing = self._items
+        if not isinstance(backing, MutableSequence):
+            backing = self._items = list(backing)
+            self._widths = WidthCache(backing)
+        if self._commands is not None and self._kinds is not None:
+            self._commands.extend(items if commands is None else commands)
+            self._kinds.extend(bytes(len(items)) if kinds is None else kinds)
+        backing.extend(items)
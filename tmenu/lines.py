@@ -0,0 +1,238 @@
+"""Byte-level line indexes for stdin and file input.
+
+Input is never split into Python strings up front. A background thread
+scans the raw bytes and records each record's byte range in two
+``array('Q')`` columns; rows are decoded (with ``surrogateescape``) only
+when they are looked up for display or matching, and the exact bytes stay
+available through ``raw()`` for output.
+"""
+
+from __future__ import annotations
+
+import locale
+import mmap
+import os
+import threading
+from abc import abstractmethod
+from array import array
+from itertools import accumulate, compress, islice, repeat
+from operator import add, methodcaller, sub
+from typing import Callable, Iterator, Sequence, TypeVar
+
+_CHUNK_SIZE = 1 << 20  # bytes read or indexed at a time
+
+_ends_with_cr = methodcaller("endswith", b"\r")
+
+_L = TypeVar("_L", bound="_Lines")
+
+
+class _Lines(Sequence[str]):
+    """Records of a byte buffer, indexed on a background thread.
+
+    With the default ``b"\\n"`` separator, a trailing ``\\r`` is dropped and
+    blank lines are skipped. With any other separator (``b"\\0"`` for
+    ``--read0``) records are kept byte for byte and only empty ones are
+    skipped.
+
+    It also acts as the menu's stream source: :meth:`drain` publishes the
+    records indexed so far, so ``len()`` only changes when the menu polls.
+    """
+
+    def __init__(self, encoding: str | None = None, sep: bytes = b"\n"):
+        self._encoding = encoding or locale.getpreferredencoding(False)
+        self._sep = sep
+        self._buf: mmap.mmap | bytearray | None = None
+        self._starts = array("Q")
+        self._lengths = array("L")
+        self._indexed = 0
+        self._count = 0
+        self._eof = False
+        self._ready = threading.Event()
+        self.notify: Callable[[], None] | None = None  # called as lines are indexed
+        self._thread = threading.Thread(
+            target=self._index, name="tmenu-index", daemon=True
+        )
+
+    def start(self: _L) -> _L:
+        if self._eof:
+            self._ready.set()
+        else:
+            self._thread.start()
+        return self
+
+    # ── Stream source protocol ───────────────────────────────────────────────
+
+    @property
+    def done(self) -> bool:
+        return self._eof and self._count == self._indexed
+
+    def wait_first(self) -> None:
+        """Block until a line is indexed or the scan is over."""
+        self._ready.wait()
+        self.drain()
+
+    def wait(self) -> None:
+        """Block until the whole input is indexed."""
+        if self._thread.ident is not None:
+            self._thread.join()
+
+    def drain(self) -> None:
+        """Publish newly indexed lines."""
+        self._count = self._indexed
+
+    # ── Sequence ─────────────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slice(self, index: int) -> bytes | bytearray:
+        if not 0 <= index < self._count:
+            raise IndexError("line index out of range")
+        assert self._buf is not None
+        start = self._starts[index]
+        return self._buf[start : start + self._lengths[index]]
+
+    def raw(self, index: int) -> bytes:
+        """The record's bytes exactly as read, without its separator."""
+        return bytes(self._slice(index))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        return self._slice(index).decode(self._encoding, "surrogateescape")
+
+    def __iter__(self) -> Iterator[str]:
+        buf, encoding = self._buf, self._encoding
+        spans = zip(islice(self._starts, self._count), self._lengths)
+        for start, length in spans:
+            yield buf[start : start + length].decode(encoding, "surrogateescape")
+
+    # ── Indexing ─────────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def _index(self) -> None:
+        """Index the whole input; runs on the background thread."""
+
+    def _scan(self, buf, pos: int, limit: int, final: bool) -> int:
+        """Index the records in ``buf[pos:limit]``, a block at a time.
+
+        Returns the offset of the first byte not yet indexed: the start of
+        an unterminated last record, unless *final*.
+        """
+        sep = self._sep
+        with memoryview(buf) as view:  # slices of it copy a block just once
+            while pos < limit:
+                end = buf.rfind(sep, pos, min(limit, pos + _CHUNK_SIZE))
+                if end < 0:  # a record longer than a block
+                    end = buf.find(sep, pos, limit)
+                if end < 0:
+                    if not final:
+                        break
+                    end = limit
+                self._add_block(bytes(view[pos:end]), pos)
+                pos = end + len(sep)
+        return min(pos, limit)
+
+    def _add_block(self, block: bytes, base: int) -> None:
+        """Record where the records in *block* (found at *base*) lie.
+
+        The block is split in C, which makes a short-lived bytes object per
+        record (and, for lines, a stripped one to spot blank lines); only
+        the offsets and lengths are kept. No per-record Python loop runs.
+        """
+        sep = self._sep
+        parts = block.split(sep)
+        lengths = list(map(len, parts))
+        starts = list(accumulate(map(add, lengths, repeat(len(sep))), initial=base))
+        starts.pop()
+        if sep == b"\n":
+            if b"\r" in block:
+                lengths = list(map(sub, lengths, map(_ends_with_cr, parts)))
+            keep: list = list(map(bytes.strip, parts))  # empty for blank lines
+        else:
+            keep = lengths
+        if not all(keep):
+            starts = list(compress(starts, keep))
+            lengths = list(compress(lengths, keep))
+        self._starts.fromlist(starts)
+        self._lengths.fromlist(lengths)
+        self._indexed = len(self._lengths)
+        if self._indexed and not self._ready.is_set():
+            self._ready.set()
+        self._notify()
+
+    def _finish(self) -> None:
+        self._eof = True
+        self._ready.set()
+        self._notify()
+
+    def _notify(self) -> None:
+        notify = self.notify
+        if notify is not None:
+            notify()
+
+
+class MappedLines(_Lines):
+    """Records of a regular file, mmap'd and decoded only when accessed."""
+
+    def __init__(self, fd: int, encoding: str | None = None, sep: bytes = b"\n"):
+        super().__init__(encoding, sep)
+        try:
+            self._buf = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._eof = True
+            self._ready.set()
+        finally:
+            os.close(fd)
+
+    @classmethod
+    def open(
+        cls, path: str, encoding: str | None = None, sep: bytes = b"\n"
+    ) -> MappedLines:
+        return cls(os.open(path, os.O_RDONLY), encoding, sep)
+
+    def _index(self) -> None:
+        buf = self._buf
+        assert buf is not None
+        self._scan(buf, 0, len(buf), final=True)
+        self._finish()
+
+
+class PipeLines(_Lines):
+    """Records read from a pipe in large chunks into one growing buffer.
+
+    Each chunk is read straight into the buffer through a memoryview. It is
+    then indexed a block at a time: each block is copied once and split to
+    find its records, and only their offsets and lengths outlive the scan.
+    Rows are decoded into str only when looked up. The reader owns *fd* and
+    closes it at EOF.
+    """
+
+    def __init__(self, fd: int, encoding: str | None = None, sep: bytes = b"\n"):
+        super().__init__(encoding, sep)
+        self._fd = fd
+        self._buf = bytearray()
+
+    def _index(self) -> None:
+        buf = self._buf
+        assert isinstance(buf, bytearray)
+        filled = pos = 0
+        try:
+            with open(self._fd, "rb", buffering=0, closefd=True) as f:
+                while True:
+                    if len(buf) - filled < _CHUNK_SIZE:
+                        # Grow geometrically; the view below must not be
+                        # alive while the buffer is resized.
+                        buf.extend(bytes(max(_CHUNK_SIZE, len(buf))))
+                    with memoryview(buf) as view:
+                        n = f.readinto(view[filled : filled + _CHUNK_SIZE])
+                    if not n:
+                        break
+                    filled += n
+                    pos = self._scan(buf, pos, filled, final=False)
+        except OSError:
+            pass
+        self._scan(buf, pos, filled, final=True)
+        self._finish()
@@ -0,0 +1,57 @@
+"""Mark state for multi-select menus."""
+
+from __future__ import annotations
+
+from collections import deque
+from itertools import compress, repeat
+from typing import Iterable, Iterator
+
+
+def _consume(iterator: Iterator) -> None:
+    deque(iterator, maxlen=0)
+
+
+class Marks:
+    """Marked item indices as a flag per item in one ``bytearray``.
+
+    Marking a range, marking a list of filter results, counting and
+    membership all run in C, so selecting every item of a million-line
+    view costs a slice assignment rather than a Python loop.
+    """
+
+    def __init__(self, size: int = 0):
+        self._flags = bytearray(size)
+
+    def resize(self, size: int) -> None:
+        """Cover item indices up to *size* (the item count only grows)."""
+        if size > len(self._flags):
+            self._flags.extend(bytes(size - len(self._flags)))
+
+    def __contains__(self, index: int) -> bool:
+        flags = self._flags
+        return 0 <= index < len(flags) and flags[index] == 1
+
+    def __len__(self) -> int:
+        return self._flags.count(1)
+
+    def __bool__(self) -> bool:
+        return 1 in self._flags
+
+    def toggle(self, index: int) -> None:
+        self._flags[index] ^= 1
+
+    def mark_range(self, start: int, stop: int) -> None:
+        self._flags[start:stop] = b"\x01" * (stop - start)
+
+    def mark(self, indices: Iterable[int]) -> None:
+        _consume(map(self._flags.__setitem__, indices, repeat(1)))
+
+    def unmark(self, indices: Iterable[int]) -> None:
+        _consume(map(self._flags.__setitem__, indices, repeat(0)))
+
+    def clear(self) -> None:
+        self._flags[:] = bytes(len(self._flags))
+
+    def indices(self) -> Iterator[int]:
+        """Marked indices in ascending (input) order."""
+        return compress(range(len(self._flags)), self._flags)
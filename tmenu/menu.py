@@ -3,13 +3,35 @@
 from __future__ import annotations
 
 import curses
+import os
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Iterable, NamedTuple, Sequence
 
-try:
-    import pyfiglet  # type: ignore[import-untyped]
-except ImportError:
-    pyfiglet = None
+from tmenu import profiling, trace
+from tmenu.events import EventLoop
+from tmenu.fuzzy import FuzzyFilter
+from tmenu.generators import GEN_PREFIX, Generators
+from tmenu.items import ItemKind, ItemList
+from tmenu.lines import MappedLines, PipeLines
+from tmenu.marks import Marks
+from tmenu.render import Renderer
+from tmenu.title import render_figlet
+from tmenu.types import (
+    COLOR_FIELDS,
+    Action,
+    ColorScheme,
+    Config,
+    ItemPosition,
+    Selection,
+)
+from tmenu.width import char_width, cut, display_width, tail
 
-from tmenu.types import Action, ColorScheme, Config, ItemPosition, Selection
+if TYPE_CHECKING:
+    from tmenu.history import History
+    from tmenu.preview import Previewer
+    from tmenu.watch import LiveConfig, Watcher
 
 _LABEL_BACK = "← Back"
 _LABEL_EXIT = "Exit"
@@ -20,6 +42,51 @@ _KEYS_DOWN = frozenset({ord("j"), curses.KEY_DOWN, 14})  # j, Down, Ctrl-N
 _KEYS_HOME = frozenset({ord("g"), curses.KEY_HOME, 1})  # g, Home, Ctrl-A
 _KEYS_END = frozenset({ord("G"), curses.KEY_END, 5})  # G, End, Ctrl-E
 _KEYS_QUIT = frozenset({27, ord("e"), ord("q")})  # Esc, e, q
+_KEYS_BACKSPACE = frozenset({curses.KEY_BACKSPACE, 127, 8})
+_KEY_SEARCH = ord("/")
+_KEY_CLEAR_QUERY = 21  # Ctrl-U
+_KEY_TOGGLE_MARK = 9  # Tab
+_KEY_MARK_ALL = 20  # Ctrl-T
+
+_FRAME_INTERVAL = 1 / 60  # seconds; redraws are coalesced to one per frame
+_PREVIEW_MIN_W = 30  # narrowest list (and pane) that still gets a preview
+_MARKER = "● "  # prefix of marked rows in multi-select mode
+
+
+_TRAILER_ROOT = ((_LABEL_EXIT,), (ItemKind.EXIT,))
+_TRAILER_SUBMENU = ((_LABEL_BACK, _LABEL_EXIT), (ItemKind.BACK, ItemKind.EXIT))
+
+_CANCEL = Selection(Action.EXIT)  # identity marks quitting from the root menu
+
+
+class _Level(NamedTuple):
+    """Saved model and cursor state of a menu level on the navigation stack."""
+
+    all_items: ItemList
+    menu_items: dict[str, str]
+    title: str
+    is_submenu: bool
+    selected_index: int
+    scroll_offset: int
+    query: str
+    searching: bool
+    filter: FuzzyFilter
+    matches: list[int] | None
+    generator: str | None
+    generator_version: int
+    marks: Marks | None
+    submenu: str | None
+
+
+class _Layout(NamedTuple):
+    """Screen geometry for one terminal size, title and list height."""
+
+    pane_x: int  # first column of the preview pane, 0 without one
+    pane_w: int
+    start_x: int
+    menu_w: int
+    title: tuple[tuple[int, int, str], ...]  # (y, x, text) per title line
+    sep_y: int
 
 
 class TMenu:
@@ -27,25 +94,42 @@ class TMenu:
 
     def __init__(
         self,
-        items: list[str],
+        items: Sequence[str],
         config: Config | dict | None = None,
         menu_items: dict[str, str] | None = None,
         submenus: dict[str, dict[str, str]] | None = None,
         title: str = "",
         is_submenu: bool = False,
+        stream: MappedLines | PipeLines | None = None,
+        history: History | None = None,
+        preview: Previewer | None = None,
+        multi: bool = False,
+        live: LiveConfig | None = None,
     ):
-        self.all_items = list(items)
-        if is_submenu:
-            self.all_items.append(_LABEL_BACK)
-        self.all_items.append(_LABEL_EXIT)
-
-        self.selected_index = 0
-        self.scroll_offset = 0
-        self.menu_items = menu_items or {}
         self.submenus = submenus or {}
-        self.title = title
-        self.is_submenu = is_submenu
+        self.live = live  # config to follow while running (``--watch``)
+        self.multi = multi
+        self.history = history
+        self.preview = preview
+        self._levels: list[_Level] = []
         self._positions: list[ItemPosition] = []
+        self._renderer: Renderer | None = None
+        self._layout_key: tuple | None = None
+        self._layout: _Layout | None = None
+        self._stream = stream
+        self.result_index: int | None = None  # item index of the last COMMAND
+        self.status = ""
+        self._inbox: deque[Callable[[TMenu], object]] = deque()
+        self._loop: EventLoop | None = None
+        self._gen_cache: Generators | None = None
+        self._submenu: str | None = None  # name of the submenu shown
+        self._watcher: Watcher | None = None
+        self._changed_files: set = set()
+        self._ranking: threading.Thread | None = None
+        menu_items = menu_items or {}
+        self._set_model(self._ranked(items, menu_items), menu_items, title, is_submenu)
+        if stream is not None and stream.done:  # the full item set is known
+            self._rank_input()
 
         if isinstance(config, Config):
             self.config = config
@@ -55,50 +139,473 @@ class TMenu:
                 **{k: v for k, v in merged.items() if k in Config.__dataclass_fields__}
             )
 
+    def _set_model(
+        self,
+        items: Sequence[str],
+        menu_items: dict[str, str],
+        title: str,
+        is_submenu: bool,
+    ) -> None:
+        """Replace the displayed items and reset cursor and filter state."""
+        if is_submenu:
+            trailer, kinds = _TRAILER_SUBMENU
+        else:
+            trailer, kinds = _TRAILER_ROOT
+        commands, item_kinds = None, None
+        if menu_items or self.submenus:
+            commands, item_kinds = self._classify(items, menu_items)
+        self.all_items = ItemList(items, trailer, commands, item_kinds, kinds)
+
+        self.menu_items = menu_items
+        self.title = title
+        self.is_submenu = is_submenu
+        self.selected_index = 0
+        self.scroll_offset = 0
+
+        self.query = ""
+        self.searching = False
+        self._filter = FuzzyFilter(self.all_items, self._n_items)
+        self._matches: list[int] | None = None
+        self._view_version = 0
+        self._indent_key: tuple | None = None
+        self._indent = 0
+        self._generator: str | None = None  # gen: command shown at this level
+        self._generator_version = 0
+        self.marks = Marks(self._n_items) if self.multi else None
+
+    @property
+    def _n_items(self) -> int:
+        return self.all_items.user_count
+
+    def _classify(
+        self, labels: Sequence[str], menu_items: dict[str, str]
+    ) -> tuple[list[str], bytearray]:
+        """Resolve each label once into the item table's command and kind."""
+        commands: list[str] = []
+        kinds = bytearray()
+        for label in labels:
+            command = menu_items.get(label, label)
+            kind = ItemKind.COMMAND
+            if command.startswith(GEN_PREFIX) and label in menu_items:
+                kind = ItemKind.GENERATOR
+            elif command.startswith(_SUBMENU_PREFIX):
+                name = command[len(_SUBMENU_PREFIX) :]
+                if name in self.submenus:
+                    command, kind = name, ItemKind.SUBMENU
+            commands.append(command)
+            kinds.append(kind)
+        return commands, kinds
+
+    def _ranked(self, items: Sequence[str], menu_items: dict[str, str]):
+        """*items* in frecency order when history ranking is on.
+
+        A line index is ranked by :meth:`_rank_input` once it is complete.
+        """
+        if self.history is None or not isinstance(items, list):
+            return items
+        return self.history.rank(items, menu_items)
+
+    def _rank_input(self) -> None:
+        """Rank a complete line index by frecency, off the menu's thread.
+
+        Nothing is read unless selections were recorded for this input.
+        Scoring hashes every line, so it runs on a thread of its own and
+        posts the lines to promote back to the menu.
+        """
+        history = self.history
+        if history is None:
+            return
+        backing = self.all_items.backing
+        history.bind(backing)
+        if not history.known():
+            return
+
+        def rank() -> None:
+            first = history.promoted(backing)
+            if first:
+                self.post(lambda menu: menu._promote(backing, first))
+
+        self._ranking = threading.Thread(target=rank, name="tmenu-rank", daemon=True)
+        self._ranking.start()
+
+    def _promote(self, backing: Sequence[str], first: list[int]) -> None:
+        """Show the lines at *first* on top, unless the user has already
+        started working with the rows (searched, moved through or marked):
+        those stay in input order rather than shifting away."""
+        if self.all_items.backing is not backing:
+            return
+        if self.query or self.selected_index or self.marks:
+            return
+        self.all_items.promote(first)
+        self._view_version += 1
+
+    # ── Submenu navigation ───────────────────────────────────────────────────
+
+    def enter_submenu(self, name: str, label: str) -> None:
+        """Push the current level and show submenu *name* titled *label*."""
+        self._levels.append(
+            _Level(
+                self.all_items,
+                self.menu_items,
+                self.title,
+                self.is_submenu,
+                self.selected_index,
+                self.scroll_offset,
+                self.query,
+                self.searching,
+                self._filter,
+                self._matches,
+                self._generator,
+                self._generator_version,
+                self.marks,
+                self._submenu,
+            )
+        )
+        if name.startswith(GEN_PREFIX):
+            generators = self._generators()
+            generators.refresh(name)
+            generated, version = generators.lookup(name)
+            items = generated or {}
+        else:
+            items = self.submenus[name]
+        self._set_model(self._ranked(list(items.keys()), items), items, label, True)
+        if name.startswith(GEN_PREFIX):
+            self._generator, self._generator_version = name, version
+        self._submenu = name
+        self._prefetch_generators()
+
+    def leave_submenu(self) -> bool:
+        """Return to the parent level, restoring its cursor. False at the root."""
+        if not self._levels:
+            return False
+        level = self._levels.pop()
+        self.all_items = level.all_items
+        self.menu_items = level.menu_items
+        self.title = level.title
+        self.is_submenu = level.is_submenu
+        self.selected_index = level.selected_index
+        self.scroll_offset = level.scroll_offset
+        self.query = level.query
+        self.searching = level.searching
+        self._filter = level.filter
+        self._matches = level.matches
+        self._generator = level.generator
+        self._generator_version = level.generator_version
+        self.marks = level.marks
+        self._submenu = level.submenu
+        self._indent_key = None
+        return True
+
+    def _navigate(self, result: Selection) -> Selection | None:
+        """Handle submenu/back transitions in place.
+
+        Returns None when the transition was handled, otherwise *result*.
+        """
+        if result.action == Action.SUBMENU:
+            self.enter_submenu(result.value, result.label)
+            return None
+        if result.action == Action.BACK and self.leave_submenu():
+            return None
+        return result
+
+    # ── Streaming ────────────────────────────────────────────────────────────
+
+    @property
+    def loading(self) -> bool:
+        """True while items are still arriving from a stream or generator."""
+        if self._stream is not None:
+            return True
+        gen = self._generator
+        return gen is not None and self._generators().running(gen)
+
+    def append_items(self, items: Sequence[str]) -> None:
+        """Insert *items* after the existing items, before Back/Exit."""
+        self._check_appendable()
+        if not items:
+            return
+        first_sentinel = self._first_sentinel()
+        if self.menu_items or self.submenus:
+            self.all_items.extend(items, *self._classify(items, self.menu_items))
+        else:
+            self.all_items.extend(items)
+        self._items_grew(first_sentinel)
+
+    def _check_appendable(self) -> None:
+        # A line index is the input itself; the records printed on exit
+        # come from it, so it is never copied to make room for more items.
+        if isinstance(self.all_items.backing, (MappedLines, PipeLines)):
+            raise TypeError("items read from input cannot be appended to")
+
+    def _items_grew(self, first_sentinel: int) -> None:
+        """Bring the filter up to date after the backing store grew.
+
+        *first_sentinel* is the view position Back/Exit had before; a cursor
+        resting on them moves down with them.
+        """
+        self._filter.extend(self._n_items)
+        if self.marks is not None:
+            self.marks.resize(self._n_items)
+        if self._matches is not None:
+            self._matches = self._filter.results
+            self._view_version += 1
+        if self.selected_index >= first_sentinel:
+            self.selected_index += self._first_sentinel() - first_sentinel
+
+    def _poll_stream(self) -> bool:
+        """Take in newly indexed lines. Returns True if anything changed."""
+        if self._stream is None:
+            return False
+        done = self._stream.done
+        n, first_sentinel = self._n_items, self._first_sentinel()
+        # The line index is the backing store; drain() grows it in place.
+        self._stream.drain()
+        grew = self._n_items != n
+        if grew:
+            self._items_grew(first_sentinel)
+        if done:
+            self._stream = None
+            self._rank_input()
+        return grew or done
+
+    # ── Generator submenus ──────────────────────────────────────────────────
+
+    def _generators(self) -> Generators:
+        if self._gen_cache is None:
+            cfg = self.config
+            self._gen_cache = Generators(cfg.generator_ttl, cfg.generator_cache)
+            self._gen_cache.notify = self._wake
+        return self._gen_cache
+
+    def _prefetch_generators(self) -> None:
+        """Start the generators reachable from this level in the background."""
+        for command in self.all_items.commands_of(ItemKind.GENERATOR):
+            self._generators().refresh(command)
+
+    def _poll_generator(self) -> bool:
+        """Swap in fresh output for the generator level being shown."""
+        gen = self._generator
+        if gen is None:
+            return False
+        items, version = self._generators().lookup(gen)
+        if version == self._generator_version:
+            return False
+        items = items or {}
+        current = self._cursor_label()
+        query, searching = self.query, self.searching
+        self._set_model(
+            self._ranked(list(items.keys()), items), items, self.title, True
+        )
+        self._generator, self._generator_version = gen, version
+        self._restore_view(query, searching, current)
+        return True
+
+    def _cursor_label(self) -> str | None:
+        if self.selected_index < self._count():
+            return self.all_items[self._item_index(self.selected_index)]
+        return None
+
+    def _restore_view(self, query: str, searching: bool, label: str | None) -> None:
+        """Re-apply a query and put the cursor back on *label* if still shown."""
+        self.searching = searching
+        if query:
+            self.set_query(query)
+        for pos in range(self._count()):
+            if self.all_items[self._item_index(pos)] == label:
+                self.selected_index = pos
+                break
+
+    # ── Preview ──────────────────────────────────────────────────────────────
+
+    def _poll_preview(self) -> bool:
+        """Point the previewer at the highlighted item. True if it needs a redraw."""
+        if self.preview is None:
+            return False
+        item = None
+        if self.selected_index < self._count():
+            idx = self._item_index(self.selected_index)
+            if idx < self._n_items:
+                item = self.all_items[idx]
+        changed = self.preview.show(item)
+        return self.preview.poll() or changed
+
+    # ── Filtering ────────────────────────────────────────────────────────────
+
+    def _count(self) -> int:
+        """Number of rows in the current (possibly filtered) view."""
+        if self._matches is None:
+            return len(self.all_items)
+        return len(self._matches) + len(self.all_items) - self._n_items
+
+    def _first_sentinel(self) -> int:
+        """View position of the first trailing label (Back/Exit)."""
+        return self._count() - (len(self.all_items) - self._n_items)
+
+    def _item_index(self, pos: int) -> int:
+        """Map a view position to an index into ``all_items``.
+
+        Back/Exit always follow the matches, so they stay reachable.
+        """
+        matches = self._matches
+        if matches is None:
+            return pos
+        if pos < len(matches):
+            return matches[pos]
+        return self._n_items + pos - len(matches)
+
+    def set_query(self, query: str) -> None:
+        """Filter the view down to items fuzzy-matching *query*."""
+        self.query = query
+        self._matches = self._filter.set_query(query)
+        self._view_version += 1
+        self.selected_index = 0
+        self.scroll_offset = 0
+
+    def _handle_search_key(self, key: int | str) -> bool:
+        """Edit the query in search mode. Returns True if the key was consumed."""
+        if isinstance(key, str):
+            if key.isprintable():
+                self.set_query(self.query + key)
+                return True
+            key = ord(key)
+        if key in _KEYS_BACKSPACE:
+            if self.query:
+                self.set_query(self.query[:-1])
+            else:
+                self.searching = False
+            return True
+        if key == _KEY_CLEAR_QUERY:
+            self.set_query("")
+            return True
+        if key == 27:  # Esc leaves search mode and drops the filter
+            self.searching = False
+            self.set_query("")
+            return True
+        return False
+
     # ── Navigation ──────────────────────────────────────────────────────────
 
     def _move_up(self) -> None:
         if self.selected_index > 0:
             self.selected_index -= 1
         else:
-            self.selected_index = len(self.all_items) - 1
+            self.selected_index = self._count() - 1
 
     def _move_down(self) -> None:
-        if self.selected_index < len(self.all_items) - 1:
+        if self.selected_index < self._count() - 1:
             self.selected_index += 1
         else:
             self.selected_index = 0
 
+    # ── Multi-select ─────────────────────────────────────────────────────────
+
+    def _toggle_mark(self) -> None:
+        """Mark or unmark the highlighted item and move to the next row."""
+        assert self.marks is not None
+        if self.selected_index < self._count():
+            idx = self._item_index(self.selected_index)
+            if idx < self._n_items:
+                self.marks.toggle(idx)
+        if self.selected_index < self._count() - 1:
+            self.selected_index += 1
+
+    def _mark_all(self) -> None:
+        """Mark every item in the view; unmark them if they all were already."""
+        marks = self.marks
+        assert marks is not None
+        before = len(marks)
+        if self._matches is None:
+            marks.mark_range(0, self._n_items)
+        else:
+            marks.mark(self._matches)
+        if len(marks) == before:
+            if self._matches is None:
+                marks.clear()
+            else:
+                marks.unmark(self._matches)
+
+    def marked(self) -> list[int]:
+        """Indices into ``all_items`` of the marked items, in input order.
+
+        That is the order of the backing store, which frecency may have
+        shuffled in the view.
+        """
+        if self.marks is None:
+            return []
+        return sorted(self.marks.indices(), key=self.all_items.source_index)
+
     # ── Selection ────────────────────────────────────────────────────────────
 
     def _handle_selection(self, index: int) -> Selection | None:
-        """Resolve what a given index means. Returns None for invalid indices."""
-        if index >= len(self.all_items):
+        """Resolve what a given view position means. None for invalid positions."""
+        if index >= self._count():
             return None
 
-        item = self.all_items[index]
-        if item == _LABEL_BACK:
+        idx = self._item_index(index)
+        items = self.all_items
+        kind = items.kind(idx)
+        if kind == ItemKind.BACK:
             return Selection(Action.BACK)
-        if item == _LABEL_EXIT:
+        if kind == ItemKind.EXIT:
             return Selection(Action.EXIT)
+        if kind != ItemKind.COMMAND:  # a submenu or generator
+            return Selection(Action.SUBMENU, items.command(idx), items[idx])
 
-        command = self.menu_items.get(item, item)
-        if command.startswith(_SUBMENU_PREFIX):
-            name = command[len(_SUBMENU_PREFIX) :]
-            if name in self.submenus:
-                return Selection(Action.SUBMENU, name, item)
-
-        return Selection(Action.COMMAND, command)
+        self.result_index = idx
+        return Selection(Action.COMMAND, items.command(idx))
 
     # ── Rendering ────────────────────────────────────────────────────────────
 
+    def _color_resolver(self) -> Callable[[str], int]:
+        """Map a color field to the number to pass to ``init_pair``.
+
+        On a truecolor terminal (``COLORTERM=truecolor``) hex colors are
+        drawn with their exact RGB: directly when the terminfo entry has
+        direct colors, otherwise by redefining palette slots from 255 down,
+        skipping those the other fields use. Everything else uses the
+        precomputed xterm-256 number.
+        """
+        cfg = self.config
+        truecolor = cfg.truecolor
+        if not truecolor or os.environ.get("COLORTERM") not in ("truecolor", "24bit"):
+            return lambda name: getattr(cfg, name)
+
+        direct = curses.COLORS >= 1 << 24
+        palette = not direct and curses.COLORS >= 256 and curses.can_change_color()
+        slots: dict[int, int] = {}
+        # Slots that fields without a hex color draw with are left alone.
+        taken = {getattr(cfg, f) for f in COLOR_FIELDS if f not in truecolor}
+        free = (slot for slot in range(255, 15, -1) if slot not in taken)
+
+        def color(name: str) -> int:
+            rgb = truecolor.get(name, -1)
+            if rgb < 0 or not (direct or palette):
+                return getattr(cfg, name)
+            if direct:
+                return rgb
+            if rgb not in slots:
+                slot = next(free)
+                # curses takes 0-1000 per channel; round up so the
+                # terminal's truncating conversion back lands on the same byte.
+                r, g, b = (
+                    ((rgb >> shift & 0xFF) * 1000 + 254) // 255 for shift in (16, 8, 0)
+                )
+                curses.init_color(slot, r, g, b)
+                slots[rgb] = slot
+            return slots[rgb]
+
+        return color
+
     def _init_colors(self, stdscr) -> ColorScheme:
         cfg = self.config
         if curses.has_colors():
             curses.use_default_colors()
-            curses.init_pair(1, cfg.foreground, cfg.background)
-            curses.init_pair(2, cfg.selection_foreground, cfg.selection_background)
-            curses.init_pair(3, cfg.prompt_foreground, cfg.background)
+            color = self._color_resolver()
+            bg = color("background")
+            curses.init_pair(1, color("foreground"), bg)
+            curses.init_pair(
+                2, color("selection_foreground"), color("selection_background")
+            )
+            curses.init_pair(3, color("prompt_foreground"), bg)
             return ColorScheme(
                 normal=curses.color_pair(1),
                 selected=curses.color_pair(2),
@@ -110,28 +617,39 @@ class TMenu:
             prompt=curses.A_BOLD,
         )
 
-    def _render_title(self) -> list[str]:
+    def _render_title(self, width: int | None = None) -> tuple[str, ...]:
+        """Title lines, figlet art wrapped to *width* (``config.width``)."""
         if not self.title:
-            return []
-        if pyfiglet is None or not self.config.figlet:
-            return [self.title]
-        try:
-            fig = pyfiglet.Figlet(font=self.config.figlet_font, width=self.config.width)
-            return fig.renderText(self.title).rstrip("\n").split("\n")
-        except Exception:
-            return [self.title]
+            return ()
+        cfg = self.config
+        if not cfg.figlet:
+            return (self.title,)
+        width = cfg.width if width is None else min(width, cfg.width)
+        return render_figlet(self.title, cfg.figlet_font, width, cfg.figlet_cache)
 
-    def _draw(self, stdscr, colors: ColorScheme) -> None:
-        term_h, term_w = stdscr.getmaxyx()
-        stdscr.clear()
+    def _layout_for(self, term_h: int, term_w: int) -> _Layout:
+        """Layout for the current terminal size, computed once per size.
 
+        The list height and title are part of the key too, since entering
+        a submenu or streaming in items changes them, but at a steady size
+        every frame reuses the same layout.
+        """
         cfg = self.config
-        menu_w = min(cfg.width, term_w - 4)
+        rows = min(len(self.all_items), cfg.height)
+        key = (term_h, term_w, self.title, rows, self.preview is not None)
+        if key == self._layout_key and self._layout is not None:
+            return self._layout
 
-        title_lines = self._render_title()
-        items_height = min(len(self.all_items), cfg.height) + 1
+        pane_x = pane_w = 0
+        if self.preview is not None and term_w >= 2 * _PREVIEW_MIN_W:
+            # The list is laid out in the left half, the preview fills the rest.
+            pane_x = term_w // 2
+            pane_w = term_w - pane_x
+            term_w = pane_x
 
-        items_start_y = max(0, (term_h - items_height) // 2)
+        menu_w = min(cfg.width, term_w - 4)
+        title_lines = self._render_title(menu_w)
+        items_start_y = max(0, (term_h - rows - 1) // 2)
         start_y = max(0, items_start_y - len(title_lines))
 
         if cfg.centered:
@@ -140,32 +658,48 @@ class TMenu:
             start_x = 0
             menu_w = term_w - 1
 
-        # Title
+        title = []
         y = start_y
-        for line in title_lines:
-            if y >= term_h:
-                break
-            tx = (
-                start_x + max(0, (menu_w - len(line)) // 2) if cfg.centered else start_x
-            )
-            try:
-                stdscr.addstr(y, tx, line[:menu_w], colors.prompt)
-            except curses.error:
-                pass
+        for line in title_lines[: max(0, term_h - start_y)]:
+            end, line_w = cut(line, menu_w)
+            tx = start_x + max(0, (menu_w - line_w) // 2) if cfg.centered else start_x
+            title.append((y, tx, line[:end]))
             y += 1
 
-        # Separator
-        sep_y = y
+        self._layout_key = key
+        self._layout = _Layout(pane_x, pane_w, start_x, menu_w, tuple(title), y)
+        return self._layout
+
+    def _renderer_for(self, stdscr) -> Renderer:
+        if self._renderer is None or self._renderer.window is not stdscr:
+            self._renderer = Renderer(stdscr)
+        return self._renderer
+
+    def _draw(self, stdscr, colors: ColorScheme) -> None:
+        term_h, term_w = stdscr.getmaxyx()
+        out = self._renderer_for(stdscr)
+        layout = self._layout_for(term_h, term_w)
+        cfg = self.config
+        start_x, menu_w, sep_y = layout.start_x, layout.menu_w, layout.sep_y
+
+        if layout.pane_w:
+            self._draw_preview(out, layout.pane_x, layout.pane_w, term_h, colors)
+
+        for y, x, line in layout.title:
+            out.addstr(y, x, line, colors.prompt)
+
+        # Separator, with the search prompt at its left end
         if sep_y < term_h:
-            try:
-                stdscr.addstr(sep_y, start_x, "─" * menu_w, colors.normal)
-            except curses.error:
-                pass
+            out.addstr(sep_y, start_x, "─" * menu_w, colors.normal)
+            if self.searching or self.query:
+                prompt = tail(f"/{self.query}", menu_w - 1) + " "
+                out.addstr(sep_y, start_x, prompt, colors.prompt)
 
         # Scrollable item list
-        visible = min(len(self.all_items), term_h - sep_y - 1)
+        count = self._count()
+        visible = min(count, term_h - sep_y - 1)
         if visible <= 0:
-            stdscr.refresh()
+            out.commit()
             return
 
         if self.selected_index < self.scroll_offset:
@@ -173,55 +707,111 @@ class TMenu:
         elif self.selected_index >= self.scroll_offset + visible:
             self.scroll_offset = self.selected_index - visible + 1
 
-        if cfg.centered:
-            max_len = max(
-                (
-                    min(len(self.all_items[i + self.scroll_offset]), menu_w - 2)
-                    for i in range(visible)
-                    if i + self.scroll_offset < len(self.all_items)
-                ),
-                default=0,
-            )
-            indent = (menu_w - max_len) // 2
-        else:
-            indent = 0
+        marks = self.marks
+        mark_w = len(_MARKER) if marks is not None else 0
+        row_w = menu_w - mark_w  # room left of the marker column
+        indent = self._centered_indent(row_w, visible, count) if cfg.centered else 0
 
         self._positions = []
         for i in range(visible):
             idx = i + self.scroll_offset
-            if idx >= len(self.all_items):
+            if idx >= count:
                 break
 
-            item = self.all_items[idx]
+            item_idx = self._item_index(idx)
             iy = sep_y + 1 + i
-            display = item[: menu_w - 2] if len(item) > menu_w - 2 else item
-            ix = start_x + indent
+            display, display_w = self.all_items.fit(item_idx, row_w - 2)
+            ix = start_x + indent + mark_w
 
             if cfg.centered:
                 self._positions.append(ItemPosition(iy, start_x, start_x + menu_w, idx))
             else:
-                self._positions.append(ItemPosition(iy, ix, ix + len(display), idx))
+                self._positions.append(ItemPosition(iy, ix, ix + display_w, idx))
 
             if idx == self.selected_index:
                 attr = colors.selected
-                display = " " * indent + display.ljust(menu_w - indent)
+                pad = " " * max(0, row_w - indent - display_w)
+                display = " " * (indent + mark_w) + display + pad
                 ix = start_x
             else:
                 attr = colors.normal
 
-            try:
-                stdscr.addstr(iy, ix, display[:menu_w], attr)
-            except curses.error:
-                pass
+            out.addstr(iy, ix, display, attr)
+            if marks is not None and item_idx in marks:
+                out.addstr(iy, start_x + indent, _MARKER, attr)
 
-        if len(self.all_items) > visible:
-            info = f" [{self.selected_index + 1}/{len(self.all_items)}]"
-            try:
-                stdscr.addstr(sep_y, start_x + menu_w - len(info), info, colors.normal)
-            except curses.error:
-                pass
+            if self._matches is not None and item_idx < self._n_items:
+                self._draw_matches(
+                    out, iy, start_x + indent + mark_w, item_idx, row_w - 2, attr
+                )
+
+        info = ""
+        if count > visible or self.loading or self._matches is not None:
+            info = f" [{self.selected_index + 1}/{count}]"
+            if self.loading:
+                info = info[:-1] + " loading…]"
+        n_marked = len(marks) if marks is not None else 0
+        if n_marked:
+            info = f" {n_marked} marked{info}"
+        if self.status:
+            info = f" {self.status[: menu_w // 2]}{info}"
+        if info:
+            out.addstr(
+                sep_y, start_x + menu_w - display_width(info), info, colors.normal
+            )
+
+        out.commit()
 
-        stdscr.refresh()
+    def _draw_preview(
+        self, out: Renderer, x: int, width: int, height: int, colors: ColorScheme
+    ) -> None:
+        """Draw the preview pane: a border, then the command's output."""
+        assert self.preview is not None
+        lines = self.preview.lines() or []
+        for y in range(height):
+            out.addstr(y, x, "│", colors.normal)
+            if y < len(lines) and lines[y]:
+                end, _ = cut(lines[y], width - 3)
+                out.addstr(y, x + 2, lines[y][:end], colors.normal)
+
+    def _centered_indent(self, menu_w: int, visible: int, count: int) -> int:
+        """Indent that centers the widest visible row.
+
+        Recomputed only when the rows in view (or their contents) change, not
+        on every frame.
+        """
+        end = min(count, self.scroll_offset + visible)
+        key = (self.scroll_offset, end, menu_w, self._view_version)
+        if key != self._indent_key:
+            max_len = max(
+                (
+                    min(self.all_items.width(self._item_index(pos)), menu_w - 2)
+                    for pos in range(self.scroll_offset, end)
+                ),
+                default=0,
+            )
+            self._indent = (menu_w - max_len) // 2
+            self._indent_key = key
+        return self._indent
+
+    def _draw_matches(
+        self, out: Renderer, y: int, x: int, idx: int, width: int, attr: int
+    ):
+        """Re-draw the matched characters of item *idx* highlighted."""
+        item = self.all_items[idx]
+        ascii_item = item.isascii()
+        col = last = 0  # column at which item[last] starts
+        for p in self._filter.positions(idx):
+            if p >= len(item):
+                break
+            if ascii_item:
+                col = p
+            else:
+                col += display_width(item[last:p])
+                last = p
+            if col + char_width(item[p]) > width:
+                break
+            out.addstr(y, x + col, item[p], attr | curses.A_BOLD | curses.A_UNDERLINE)
 
     # ── Input handling ───────────────────────────────────────────────────────
 
@@ -234,19 +824,242 @@ class TMenu:
             return None
 
         if bstate & (curses.BUTTON1_CLICKED | curses.BUTTON1_DOUBLE_CLICKED):
-            is_double = bool(bstate & curses.BUTTON1_DOUBLE_CLICKED)
-            for pos in self._positions:
-                if my == pos.y and pos.x_start <= mx < pos.x_end:
-                    if is_double:
+            # Rows are drawn on consecutive lines, so the row is found by
+            # subtraction rather than a search.
+            positions = self._positions
+            row = my - positions[0].y if positions else -1
+            if 0 <= row < len(positions):
+                pos = positions[row]
+                if pos.x_start <= mx < pos.x_end:
+                    if bstate & curses.BUTTON1_DOUBLE_CLICKED:
                         return self._handle_selection(pos.idx)
                     self.selected_index = pos.idx
-                    break
         return None
 
+    def _handle_key(self, key: int | str) -> Selection | None:
+        """Apply one key press. Returns a Selection that ends the menu, if any."""
+        if self.searching and self._handle_search_key(key):
+            return None
+        if isinstance(key, str):
+            if len(key) != 1 or ord(key) > 255:
+                return None
+            key = ord(key)
+
+        result = None
+        if key == ord("\n"):
+            result = self._handle_selection(self.selected_index)
+
+        elif key == _KEY_SEARCH:
+            self.searching = True
+
+        elif key == _KEY_TOGGLE_MARK and self.marks is not None:
+            self._toggle_mark()
+        elif key == _KEY_MARK_ALL and self.marks is not None:
+            self._mark_all()
+
+        elif key in _KEYS_QUIT:
+            if not self.is_submenu:
+                return _CANCEL
+            result = Selection(Action.BACK)
+
+        elif key == curses.KEY_MOUSE:
+            try:
+                _, mx, my, _, bstate = curses.getmouse()
+                result = self._handle_mouse(bstate, mx, my)
+            except curses.error:
+                pass
+
+        elif key in _KEYS_UP:
+            self._move_up()
+        elif key in _KEYS_DOWN:
+            self._move_down()
+        elif key in _KEYS_HOME:
+            self.selected_index = 0
+        elif key in _KEYS_END:
+            self.selected_index = self._count() - 1
+        elif key == curses.KEY_PPAGE:
+            self.selected_index = max(0, self.selected_index - 10)
+        elif key == curses.KEY_NPAGE:
+            self.selected_index = min(self._count() - 1, self.selected_index + 10)
+        elif ord("1") <= key <= ord("9"):
+            result = self._handle_selection(key - ord("1"))
+
+        if result is not None:
+            return self._navigate(result)
+        return None
+
+    # ── Headless use ─────────────────────────────────────────────────────────
+
+    def finish_loading(self) -> None:
+        """Block until a streamed item source is complete, taken in and
+        ranked."""
+        while self._stream is not None:
+            self._stream.wait()
+            self._poll_stream()
+        if self._ranking is not None:
+            self._ranking.join()
+            self._run_posted()
+
+    def reset(self) -> None:
+        """Back to the root level, with no query and the first row selected."""
+        while self.leave_submenu():
+            pass
+        self.searching = False
+        self.set_query("")
+        if self.marks is not None:
+            self.marks.clear()
+        self.result_index = None
+
+    def feed(self, keys: Iterable[int | str]) -> Selection | None:
+        """Apply *keys* as if typed, without a terminal.
+
+        Returns the Selection that ends the menu, or None if the keys run
+        out first or quit it. A ``gen:`` submenu that is entered waits for
+        its generator, so scripted runs see its items.
+        """
+        for key in keys:
+            result = self._handle_key(key)
+            if result is _CANCEL:
+                return None
+            if result is not None:
+                return result
+            gen = self._generator
+            if gen is not None and self._generators().running(gen):
+                opened_empty = self._n_items == 0
+                self._generators().wait(gen)
+                self._poll_generator()
+                if opened_empty:  # as if the items had been there on entry
+                    self.selected_index = 0
+        return None
+
+    def filter(self, query: str) -> list[int]:
+        """Indices into ``all_items`` of the items matching *query*, best first."""
+        self.set_query(query)
+        if self._matches is None:
+            return list(range(self._n_items))
+        return list(self._matches)
+
+    # ── Live config ──────────────────────────────────────────────────────────
+
+    def replace_menus(
+        self,
+        menu_items: dict[str, str],
+        submenus: dict[str, dict[str, str]],
+        title: str,
+    ) -> None:
+        """Swap in new menus, staying in the open submenus that still exist.
+
+        Each level keeps its query and, where the item is still there, its
+        highlighted item.
+        """
+        trail = []
+        while True:
+            state = (self._submenu, self.title, self.query, self.searching)
+            trail.append((*state, self._cursor_label()))
+            if not self.leave_submenu():
+                break
+        trail.reverse()
+        self.submenus = submenus
+        _, _, query, searching, label = trail[0]
+        items = self._ranked(list(menu_items.keys()), menu_items)
+        self._set_model(items, menu_items, title, self.is_submenu)
+        self._restore_view(query, searching, label)
+        for name, sub_title, query, searching, label in trail[1:]:
+            assert name is not None
+            if not (name.startswith(GEN_PREFIX) or name in submenus):
+                break
+            self.enter_submenu(name, sub_title)
+            self._restore_view(query, searching, label)
+        self._prefetch_generators()
+
+    def set_config(self, config: Config) -> None:
+        """Use *config* from the next frame on. Colors take effect once
+        :meth:`_init_colors` runs again."""
+        self.config = config
+        self._layout_key = self._layout = None
+        self._indent_key = None
+        if self._renderer is not None:
+            self._renderer.invalidate()
+
+    def _watch_config(self, loop: EventLoop) -> None:
+        """Start following :attr:`live`'s files for changes."""
+        from tmenu.watch import POLL_INTERVAL, Watcher
+
+        assert self.live is not None
+        watcher = self._watcher = Watcher(*self.live.watched())
+        fd = watcher.fileno()
+        if fd is not None:
+            loop.add_reader(fd, lambda: self._changed_files.update(watcher.read()))
+            return
+
+        def poll() -> None:
+            if self._watcher is watcher:
+                self._changed_files.update(watcher.read())
+                loop.call_later(POLL_INTERVAL, poll)
+
+        loop.call_later(POLL_INTERVAL, poll)
+
+    def _reload_config(self) -> bool:
+        """Apply pending config file changes. True if the colors changed."""
+        live, watcher = self.live, self._watcher
+        assert live is not None and watcher is not None
+        changed, self._changed_files = self._changed_files, set()
+        changes = live.update(changed)
+        watcher.watch(*live.watched())
+        if changes & {"colors", "display"}:
+            self.set_config(live.config)
+        if changes & {"menus", "title"}:
+            self.replace_menus(live.menu_items, live.submenus, live.title)
+        return "colors" in changes
+
+    # ── Embedding hooks ──────────────────────────────────────────────────────
+
+    def post(self, callback: Callable[[TMenu], object]) -> None:
+        """Run ``callback(menu)`` on the menu's own thread, then redraw.
+
+        Safe to call from any thread, before or while :meth:`run` is active;
+        this is how embedding code feeds a running menu.
+        """
+        self._inbox.append(callback)
+        self._wake()
+
+    def push_items(self, items: Sequence[str]) -> None:
+        """Append *items* to a running menu (thread-safe).
+
+        Raises TypeError here, rather than in the running menu, if its
+        items are read from input.
+        """
+        self._check_appendable()
+        batch = list(items)
+        self.post(lambda menu: menu.append_items(batch))
+
+    def set_status(self, text: str) -> None:
+        """Show *text* on the separator row of a running menu (thread-safe)."""
+        self.post(lambda menu: setattr(menu, "status", text))
+
+    def _wake(self) -> None:
+        loop = self._loop
+        if loop is not None:
+            loop.wake()
+
+    def _run_posted(self) -> bool:
+        ran = False
+        while self._inbox:
+            self._inbox.popleft()(self)
+            ran = True
+        return ran
+
+    # ── Main loop ────────────────────────────────────────────────────────────
+
     def run(self, stdscr) -> Selection | None:
-        """Run the interactive menu loop. Returns a Selection or None if cancelled."""
+        """Run the interactive menu loop. Returns a Selection or None if cancelled.
+
+        Submenus are entered and left in place within this one curses session;
+        only commands, Exit, or Back from a top-level submenu are returned.
+        """
         curses.curs_set(0)
         stdscr.keypad(True)
+        stdscr.nodelay(True)
 
         mouse_mask = curses.BUTTON1_CLICKED | curses.BUTTON1_DOUBLE_CLICKED
         if hasattr(curses, "BUTTON4_PRESSED"):
@@ -255,48 +1068,106 @@ class TMenu:
             mouse_mask |= curses.BUTTON5_PRESSED
         curses.mousemask(mouse_mask)
 
-        colors = self._init_colors(stdscr)
+        with profiling.phase("init_colors"):
+            colors = self._init_colors(stdscr)
+
+        loop = self._loop = EventLoop(0)
+        if self.live is not None:
+            self._watch_config(loop)
+        self._prefetch_generators()
+        sources = [src for src in (self._stream, self.preview) if src is not None]
+        for src in sources:
+            src.notify = loop.wake
+        try:
+            result = self._loop_until_done(stdscr, colors, loop)
+        except KeyboardInterrupt:
+            result = None
+        finally:
+            for src in sources:
+                src.notify = None
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+            self._loop = None
+            loop.close()
+        return None if result is _CANCEL else result
 
+    def _loop_until_done(
+        self, stdscr, colors: ColorScheme, loop: EventLoop
+    ) -> Selection:
+        """Process events, redrawing at most once per frame interval."""
+        dirty = True
+        last_frame = -_FRAME_INTERVAL
+        first_frame = True
+        key_at: float | None = None  # when input arrived that is not yet drawn
+        keys = 0
         while True:
-            self._draw(stdscr, colors)
+            dirty = self._run_posted() or dirty
+            dirty = self._poll_stream() or dirty
+            dirty = self._poll_preview() or dirty
+            dirty = self._poll_generator() or dirty
+            if loop.take_resize():
+                self._resize(stdscr)
+                dirty = True
+            if self._changed_files:
+                if self._reload_config():
+                    colors = self._init_colors(stdscr)
+                dirty = True
 
-            try:
-                key = stdscr.getch()
-            except KeyboardInterrupt:
-                return None
+            timeout = None
+            if dirty:
+                timeout = last_frame + _FRAME_INTERVAL - time.monotonic()
+                if timeout <= 0:
+                    start = time.perf_counter()
+                    self._draw(stdscr, colors)
+                    if trace.enabled:
+                        self._trace_frame(start, key_at, keys)
+                    key_at, keys = None, 0
+                    last_frame = time.monotonic()
+                    dirty = False
+                    timeout = None
+                    if first_frame:
+                        profiling.mark("first frame")
+                        first_frame = False
+            if self.preview is not None:
+                start_at = self.preview.start_at()
+                if start_at is not None:
+                    until = max(0.0, start_at - time.monotonic())
+                    timeout = until if timeout is None else min(timeout, until)
 
-            if key == ord("\n"):
-                result = self._handle_selection(self.selected_index)
+            if not loop.wait(timeout):
+                continue
+            if key_at is None:
+                key_at = time.perf_counter()
+            # Handle everything typed so far, then draw once.
+            while True:
+                try:
+                    key = stdscr.get_wch()
+                except curses.error:  # no more input
+                    break
+                if key == curses.KEY_RESIZE:  # coalesced with SIGWINCH
+                    loop.request_resize()
+                    continue
+                dirty = True
+                keys += 1
+                result = self._handle_key(key)
                 if result is not None:
                     return result
 
-            elif key in _KEYS_QUIT:
-                return Selection(Action.BACK) if self.is_submenu else None
+    def _trace_frame(self, start: float, key_at: float | None, keys: int) -> None:
+        end = time.perf_counter()
+        cells = self._renderer.cells_written if self._renderer else 0
+        trace.span("draw", "frame", start, end - start, cells)
+        if key_at is not None and keys:
+            trace.span("input", "key-to-paint", key_at, end - key_at, keys)
 
-            elif key == curses.KEY_MOUSE:
-                try:
-                    _, mx, my, _, bstate = curses.getmouse()
-                    result = self._handle_mouse(bstate, mx, my)
-                    if result is not None:
-                        return result
-                except curses.error:
-                    pass
-
-            elif key in _KEYS_UP:
-                self._move_up()
-            elif key in _KEYS_DOWN:
-                self._move_down()
-            elif key in _KEYS_HOME:
-                self.selected_index = 0
-            elif key in _KEYS_END:
-                self.selected_index = len(self.all_items) - 1
-            elif key == curses.KEY_PPAGE:
-                self.selected_index = max(0, self.selected_index - 10)
-            elif key == curses.KEY_NPAGE:
-                self.selected_index = min(
-                    len(self.all_items) - 1, self.selected_index + 10
-                )
-            elif ord("1") <= key <= ord("9"):
-                result = self._handle_selection(key - ord("1"))
-                if result is not None:
-                    return result
+    def _resize(self, stdscr) -> None:
+        """Adopt the terminal's new size once a burst of resizes settles."""
+        try:
+            cols, lines = os.get_terminal_size(0)
+        except OSError:
+            return
+        curses.resizeterm(lines, cols)
+        self._layout_key = self._layout = None
+        if self._renderer is not None:
+            self._renderer.invalidate()
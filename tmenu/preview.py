@@ -0,0 +1,175 @@
+"""Asynchronous preview command for the highlighted item."""
+
+from __future__ import annotations
+
+import os
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+_MAX_BYTES = 256 * 1024  # output read per preview; the rest is discarded
+_ANSI = re.compile(r"\x1b(\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(\x07|\x1b\\)|.)")
+
+
+def expand_command(template: str, item: str) -> str:
+    """Substitute ``{}`` in *template* with the quoted item, or append it."""
+    quoted = shlex.quote(item)
+    if "{}" in template:
+        return template.replace("{}", quoted)
+    return f"{template} {quoted}"
+
+
+def clean_output(data: bytes) -> list[str]:
+    """Decode command output into plain lines curses can draw."""
+    text = _ANSI.sub("", data.decode("utf-8", "replace"))
+    return [line.expandtabs(4) for line in text.splitlines()]
+
+
+class _Job:
+    __slots__ = ("item", "proc", "cancelled")
+
+    def __init__(self, item: str):
+        self.item = item
+        self.proc: subprocess.Popen | None = None
+        self.cancelled = False
+
+
+class Previewer:
+    """Run *command* for the highlighted item on a small worker pool.
+
+    :meth:`show` is cheap and called from the input loop on every move. The
+    command only starts once the same item has stayed highlighted for
+    *debounce* seconds, jobs for items no longer highlighted are killed,
+    and finished outputs are kept in an LRU of *cache_size* items so moving
+    back is instant.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        workers: int = 2,
+        cache_size: int = 64,
+        debounce: float = 0.05,
+    ):
+        self.command = command
+        self.debounce = debounce
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, list[str]] = OrderedDict()
+        self._jobs: dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="tmenu-preview")
+        self._want: str | None = None
+        self._due = 0.0
+        self._fresh = False
+        self.notify: Callable[[], None] | None = None  # called when output is ready
+
+    def show(self, item: str | None) -> bool:
+        """Make *item* the one to preview, cancelling work for any other.
+
+        Returns True if that changed the previewed item.
+        """
+        if item == self._want:
+            return False
+        self._want = item
+        self._due = time.monotonic() + self.debounce
+        with self._lock:
+            for job in list(self._jobs.values()):
+                if job.item != item:
+                    self._cancel(job)
+        return True
+
+    def lines(self) -> list[str] | None:
+        """Output for the current item, or None while it is not ready."""
+        with self._lock:
+            lines = self._cache.get(self._want) if self._want is not None else None
+            if lines is not None:
+                self._cache.move_to_end(self._want)
+            return lines
+
+    def start_at(self) -> float | None:
+        """Monotonic time the debounced job for the current item starts at,
+        or None if there is nothing left to start."""
+        item = self._want
+        if item is None or item in self._cache or item in self._jobs:
+            return None
+        return self._due
+
+    @property
+    def pending(self) -> bool:
+        """True while the current item's output is still to come."""
+        return self._want is not None and self._want not in self._cache
+
+    def poll(self) -> bool:
+        """Start the debounced job if due. True if new output is ready to draw."""
+        item = self._want
+        if item is not None and time.monotonic() >= self._due:
+            with self._lock:
+                if item not in self._cache and item not in self._jobs:
+                    job = self._jobs[item] = _Job(item)
+                    self._pool.submit(self._run, job)
+        fresh, self._fresh = self._fresh, False
+        return fresh
+
+    def close(self) -> None:
+        with self._lock:
+            for job in list(self._jobs.values()):
+                self._cancel(job)
+        self._pool.shutdown(wait=False)
+
+    def _cancel(self, job: _Job) -> None:
+        """Kill *job*'s process group. Called with the lock held."""
+        job.cancelled = True
+        self._jobs.pop(job.item, None)
+        if job.proc is not None and job.proc.poll() is None:
+            try:
+                os.killpg(job.proc.pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def _run(self, job: _Job) -> None:
+        with self._lock:
+            if job.cancelled:
+                return
+            try:
+                job.proc = subprocess.Popen(
+                    ["sh", "-c", expand_command(self.command, job.item)],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+            except OSError as e:
+                job.proc = None
+                data = str(e).encode()
+        if job.proc is not None:
+            proc = job.proc
+            assert proc.stdout is not None
+            data = proc.stdout.read(_MAX_BYTES)
+            proc.stdout.close()
+            if proc.poll() is None:
+                try:
+                    os.killpg(proc.pid, signal.SIGTERM)
+                except OSError:
+                    pass
+            proc.wait()
+        lines = clean_output(data)
+
+        with self._lock:
+            if job.cancelled:
+                return
+            self._jobs.pop(job.item, None)
+            self._cache[job.item] = lines
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            if job.item != self._want:
+                return
+            self._fresh = True
+        notify = self.notify
+        if notify is not None:
+            notify()
@@ -0,0 +1,76 @@
+"""Startup timing marks reported by ``--startup-profile``."""
+
+from __future__ import annotations
+
+import atexit
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+
+from tmenu import trace
+
+_T0 = time.perf_counter()
+
+
+class Phase(NamedTuple):
+    name: str
+    start: float  # seconds since tmenu was imported
+    duration: float
+
+
+_phases: list[Phase] = []
+_enabled = False
+
+
+def enabled_by_env() -> bool:
+    return os.environ.get("TMENU_STARTUP_PROFILE", "") not in ("", "0")
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Record how long the enclosed block takes."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _phases.append(Phase(name, start - _T0, end - start))
+        trace.span("phase", name, start, end - start)
+
+
+def mark(name: str) -> None:
+    """Record a point in time, e.g. the first frame."""
+    now = time.perf_counter()
+    _phases.append(Phase(name, now - _T0, 0.0))
+    trace.span("mark", name, now, 0.0)
+
+
+def phases() -> list[Phase]:
+    return list(_phases)
+
+
+def enable() -> None:
+    """Print the report to stderr when the process exits."""
+    global _enabled
+    if not _enabled:
+        _enabled = True
+        atexit.register(flush)
+
+
+def flush() -> None:
+    """Print and clear the recorded phases, if profiling is enabled.
+
+    Call this before ``exec`` since atexit handlers do not run then.
+    """
+    if not _enabled or not _phases:
+        return
+    print("tmenu startup profile (ms):", file=sys.stderr)
+    for p in _phases:
+        print(
+            f"  {p.name:<24} start={p.start * 1000:8.2f}  "
+            f"took={p.duration * 1000:8.2f}",
+            file=sys.stderr,
+        )
+    _phases.clear()
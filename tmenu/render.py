@@ -0,0 +1,89 @@
+"""Differential rendering on top of a curses window."""
+
+from __future__ import annotations
+
+import curses
+import re
+from typing import Tuple
+
+Segment = Tuple[int, str, int]  # (x, text, attr)
+
+# Shown as U+FFFD: control characters, which would move the cursor, and
+# undecodable input bytes, which items keep as surrogate escapes so they can
+# be written back out unchanged. A tab is drawn as one space instead: curses
+# would expand it to the next tab stop, past the one column it is measured as.
+_UNPRINTABLE = re.compile("[\x00-\x08\x0a-\x1f\x7f\udc80-\udcff]")
+
+
+class Renderer:
+    """Collect a frame row by row and write only the rows that changed.
+
+    The previous frame is kept as ``{y: segments}``. On :meth:`commit`, rows
+    that are identical to the last frame are left untouched, changed rows are
+    cleared and rewritten, and the result goes out with a single
+    ``noutrefresh``/``doupdate``. A full ``erase`` only happens after
+    :meth:`invalidate` or when the window size changes.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._prev: dict[int, tuple[Segment, ...]] = {}
+        self._rows: dict[int, list[Segment]] = {}
+        self._size: tuple[int, int] | None = None
+        self.rows_written = 0
+        self.cells_written = 0
+
+    def invalidate(self) -> None:
+        """Force the next commit to repaint the whole window."""
+        self._size = None
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        """Queue *text* at (y, x). Later segments on a row draw over earlier ones."""
+        if text:
+            self._rows.setdefault(y, []).append((x, text, attr))
+
+    def commit(self) -> None:
+        """Write the queued frame and flush it to the terminal."""
+        win = self.window
+        rows = {y: tuple(segs) for y, segs in self._rows.items()}
+        self._rows = {}
+
+        size = win.getmaxyx()
+        if size != self._size:
+            win.erase()
+            prev: dict[int, tuple[Segment, ...]] = {}
+            self._size = size
+        else:
+            prev = self._prev
+
+        written = cells = 0
+        for y in prev.keys() - rows.keys():
+            self._clear_row(y)
+            written += 1
+        for y, segs in rows.items():
+            if prev.get(y) == segs:
+                continue
+            if y in prev:
+                self._clear_row(y)
+            for x, text, attr in segs:
+                if not text.isprintable():
+                    text = _UNPRINTABLE.sub("\ufffd", text.replace("\t", " "))
+                try:
+                    win.addstr(y, x, text, attr)
+                except curses.error:
+                    pass
+                cells += len(text)
+            written += 1
+
+        self._prev = rows
+        self.rows_written = written
+        self.cells_written = cells
+        win.noutrefresh()
+        curses.doupdate()
+
+    def _clear_row(self, y: int) -> None:
+        try:
+            self.window.move(y, 0)
+            self.window.clrtoeol()
+        except curses.error:
+            pass
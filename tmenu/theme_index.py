@@ -0,0 +1,124 @@
+"""Precomputed theme table under ``$XDG_CACHE_HOME/tmenu``.
+
+Every theme directory (the same ones :func:`tmenu.config.load_theme`
+searches) is scanned once and each theme's colors are stored already
+resolved, as xterm-256 numbers plus the exact RGB of hex colors. Applying a
+theme is then a dictionary lookup: no path probing and no hex math. The
+table is rebuilt when a theme directory's listing or the chosen theme file
+changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Tuple
+
+from tmenu.cache import _stamp, _write_atomic
+from tmenu.colors import hex_rgb, parse_color
+from tmenu.config import _load_toml, _theme_dirs, _xdg_cache_home
+
+_FORMAT_VERSION = 1
+
+ResolvedColors = Dict[str, Tuple[int, int]]  # field -> (xterm-256, 0xRRGGBB or -1)
+
+
+class ResolvedTheme(NamedTuple):
+    path: str
+    colors: ResolvedColors
+
+
+_memory: dict | None = None
+
+
+def _index_path(dirs: list[Path]) -> Path:
+    key = "\0".join(str(d) for d in dirs)
+    digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+    return _xdg_cache_home() / "tmenu" / f"themes-{digest}.bin"
+
+
+def resolve_colors(colors: dict) -> ResolvedColors:
+    """Resolve a theme's ``[colors]`` table once, for storage in the index."""
+    return {
+        key: (parse_color(val), hex_rgb(val))
+        for key, val in colors.items()
+        if isinstance(key, str)
+    }
+
+
+def _build(dirs: list[Path]) -> dict:
+    themes: dict[str, dict] = {}
+    # Lowest priority first, so earlier directories override later ones.
+    for d in reversed(dirs):
+        try:
+            paths = sorted(d.glob("*.toml"))
+        except OSError:
+            continue
+        for path in paths:
+            data = _load_toml(path)
+            if data is None:
+                continue
+            colors = data.get("colors")
+            themes[path.stem] = {
+                "path": str(path),
+                "stamp": _stamp(path),
+                "colors": resolve_colors(colors if isinstance(colors, dict) else {}),
+            }
+    return {
+        "version": _FORMAT_VERSION,
+        "dirs": [_stamp(d) for d in dirs],
+        "themes": themes,
+    }
+
+
+def _valid(index: dict, dirs: list[Path]) -> bool:
+    return index.get("version") == _FORMAT_VERSION and index.get("dirs") == [
+        _stamp(d) for d in dirs
+    ]
+
+
+def _load(dirs: list[Path], rebuild: bool = False) -> dict:
+    global _memory
+    if not rebuild and _memory is not None and _valid(_memory, dirs):
+        return _memory
+
+    path = _index_path(dirs)
+    index = None
+    if not rebuild:
+        try:
+            with open(path, "rb") as f:
+                index = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            index = None
+        if not isinstance(index, dict) or not _valid(index, dirs):
+            index = None
+
+    if index is None:
+        index = _build(dirs)
+        try:
+            _write_atomic(path, marshal.dumps(index))
+        except (OSError, ValueError):
+            pass
+    _memory = index
+    return index
+
+
+def lookup(theme_name: str, sources: list[Path] | None = None) -> ResolvedTheme | None:
+    """Resolved colors of *theme_name*, or None if no such theme exists.
+
+    The theme directories and the theme file are appended to *sources*.
+    """
+    dirs = _theme_dirs()
+    if sources is not None:
+        sources.extend(dirs)
+    index = _load(dirs)
+    entry = index["themes"].get(theme_name)
+    if entry is not None and _stamp(Path(entry["path"])) != entry["stamp"]:
+        entry = _load(dirs, rebuild=True)["themes"].get(theme_name)
+    if entry is None:
+        return None
+    if sources is not None:
+        sources.append(Path(entry["path"]))
+    return ResolvedTheme(entry["path"], entry["colors"])
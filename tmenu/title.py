@@ -0,0 +1,80 @@
+"""Title rendering with in-memory and on-disk figlet caches."""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+from tmenu import profiling
+from tmenu.cache import _write_atomic
+from tmenu.config import _xdg_cache_home
+
+_CACHE_VERSION = "1"
+_memory: dict[tuple[str, str, int], tuple[str, ...]] = {}
+
+
+def _disk_path(title: str, font: str, width: int) -> Path:
+    key = "\0".join((_CACHE_VERSION, title, font, str(width)))
+    digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    return _xdg_cache_home() / "tmenu" / "figlet" / digest
+
+
+def _read_disk(path: Path) -> tuple[str, ...] | None:
+    try:
+        return tuple(path.read_text(encoding="utf-8").split("\n"))
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _write_disk(path: Path, lines: tuple[str, ...]) -> None:
+    try:
+        _write_atomic(path, "\n".join(lines).encode("utf-8"))
+    except OSError:
+        pass
+
+
+def _figlet_module():
+    """Import pyfiglet on first use; None if it is not installed."""
+    try:
+        with profiling.phase("import pyfiglet"):
+            import pyfiglet  # type: ignore[import-untyped]
+    except ImportError:
+        return None
+    return pyfiglet
+
+
+def render_figlet(
+    title: str, font: str, width: int, disk_cache: bool = True
+) -> tuple[str, ...]:
+    """Render *title* as figlet art, memoized per (title, font, width).
+
+    Renders are kept for the life of the process, so submenu hops and redraws
+    reuse them. With *disk_cache*, they are also stored under
+    ``$XDG_CACHE_HOME/tmenu/figlet`` so a cold start skips font parsing.
+    Falls back to the plain title if pyfiglet is missing or the font fails.
+    """
+    key = (title, font, width)
+    lines = _memory.get(key)
+    if lines is not None:
+        return lines
+
+    path = _disk_path(title, font, width) if disk_cache else None
+    if path is not None:
+        lines = _read_disk(path)
+
+    if lines is None:
+        pyfiglet = _figlet_module()
+        if pyfiglet is None:
+            lines = (title,)
+        else:
+            try:
+                fig = pyfiglet.Figlet(font=font, width=width)
+                lines = tuple(fig.renderText(title).rstrip("\n").split("\n"))
+            except Exception:
+                lines = (title,)
+            else:
+                if path is not None:
+                    _write_disk(path, lines)
+
+    _memory[key] = lines
+    return lines
@@ -0,0 +1,126 @@
+"""Opt-in event tracing, enabled by ``TMENU_TRACE=path``.
+
+Events are buffered in memory and appended to the trace file when the
+process exits (or right before it ``exec``s a command), one tab-separated
+line each::
+
+    <start ms>  <kind>  <name>  <duration ms>  <value>
+
+Each run starts with a ``#`` header line. ``tmenu --trace-report`` reads
+the file back and prints latency percentiles per event.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import sys
+import time
+from typing import Iterable, NamedTuple
+
+_T0 = time.perf_counter()
+
+path = os.environ.get("TMENU_TRACE") or None
+enabled = path is not None
+
+_events: list[tuple[float, str, str, float, int]] = []
+
+
+def span(kind: str, name: str, start: float, duration: float, value: int = 0) -> None:
+    """Record an event; *start* is a ``time.perf_counter()`` reading."""
+    if enabled:
+        _events.append((start - _T0, kind, name, duration, value))
+
+
+def flush() -> None:
+    """Append buffered events to the trace file and clear them."""
+    if not enabled or not _events:
+        return
+    lines = [
+        f"# tmenu pid={os.getpid()} time={time.strftime('%Y-%m-%dT%H:%M:%S')} "
+        f"argv={' '.join(sys.argv[1:])}\n"
+    ]
+    lines += [
+        f"{start * 1000:.3f}\t{kind}\t{name}\t{duration * 1000:.3f}\t{value}\n"
+        for start, kind, name, duration, value in _events
+    ]
+    _events.clear()
+    try:
+        assert path is not None
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+    except OSError:
+        pass
+
+
+if enabled:
+    atexit.register(flush)
+
+
+# ── Report ───────────────────────────────────────────────────────────────────
+
+
+class Summary(NamedTuple):
+    kind: str
+    name: str
+    count: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    mean_value: float
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted *values*."""
+    return values[min(len(values) - 1, max(0, int(len(values) * q + 0.5) - 1))]
+
+
+def summarize(lines: Iterable[str]) -> list[Summary]:
+    groups: dict[tuple[str, str], tuple[list[float], list[int]]] = {}
+    for line in lines:
+        if line.startswith("#"):
+            continue
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) != 5:
+            continue
+        try:
+            duration, value = float(fields[3]), int(fields[4])
+        except ValueError:
+            continue
+        durations, values = groups.setdefault((fields[1], fields[2]), ([], []))
+        durations.append(duration)
+        values.append(value)
+
+    out = []
+    for (kind, name), (durations, values) in groups.items():
+        durations.sort()
+        out.append(
+            Summary(
+                kind,
+                name,
+                len(durations),
+                _percentile(durations, 0.50),
+                _percentile(durations, 0.90),
+                _percentile(durations, 0.99),
+                durations[-1],
+                sum(values) / len(values),
+            )
+        )
+    return out
+
+
+def report(trace_path: str) -> str:
+    """Percentile table (in ms) for every event recorded in *trace_path*."""
+    with open(trace_path, encoding="utf-8") as f:
+        summaries = summarize(f)
+    rows = [
+        f"{'event':<32} {'n':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"
+        f" {'avg value':>10}"
+    ]
+    for s in summaries:
+        rows.append(
+            f"{s.kind + ':' + s.name:<32} {s.count:>6} {s.p50:>9.3f} {s.p90:>9.3f}"
+            f" {s.p99:>9.3f} {s.max:>9.3f} {s.mean_value:>10.1f}"
+        )
+    return "\n".join(rows)
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import NamedTuple
 
 
@@ -47,4 +47,19 @@ class Config:
     height: int = 10
     figlet: bool = False
     figlet_font: str = "standard"
+    figlet_cache: bool = True
+    frecency: bool = False
+    generator_ttl: int = 60  # seconds before gen: output is refreshed
+    generator_cache: bool = True
     theme_dir: str = ""
+    # Exact 0xRRGGBB of color fields given in hex, for truecolor terminals.
+    truecolor: dict[str, int] = field(default_factory=dict)
+
+
+COLOR_FIELDS = (
+    "foreground",
+    "background",
+    "selection_foreground",
+    "selection_background",
+    "prompt_foreground",
+)
@@ -0,0 +1,275 @@
+"""Live config reloading: file watching and partial re-loading.
+
+:class:`Watcher` reports which config files changed, through inotify on
+Linux and by comparing modification stamps elsewhere. :class:`LiveConfig`
+keeps the config file, its theme and every ``theme_dir`` fragment parsed
+separately, so a change re-reads only the files that were touched and
+rebuilds the merged config from the rest.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import os
+import struct
+from pathlib import Path
+from typing import Iterable
+
+from tmenu.cache import _stamp
+from tmenu.config import (
+    _build_config,
+    _build_menus,
+    _default_config_path,
+    _load_toml,
+    _merge_fragment,
+    _read_fragments,
+    _xdg_config_home,
+)
+from tmenu.types import COLOR_FIELDS, Config
+
+POLL_INTERVAL = 1.0  # seconds between stamp checks without inotify
+
+# <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_DELETE = 0x200
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+# A save is either written in place or renamed over the old file; watching
+# the directory sees both. IN_CREATE is left out: the file is still empty
+# then, and IN_CLOSE_WRITE follows once it has been written.
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then the name
+
+
+def _libc():
+    """libc with the inotify calls, or None where they are unavailable."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class Watcher:
+    """Report changes to a set of files and to the ``*.toml`` in directories.
+
+    With inotify, :meth:`fileno` is a descriptor that becomes readable on a
+    change, and :meth:`read` returns the paths involved. Without it,
+    :meth:`fileno` is None and :meth:`read` compares stamps, to be called
+    every :data:`POLL_INTERVAL` seconds.
+    """
+
+    def __init__(self, files: Iterable[Path] = (), dirs: Iterable[Path] = ()):
+        self._files: set[Path] = set()
+        self._dirs: set[Path] = set()
+        self._fd: int | None = None
+        self._wds: dict[Path, int] = {}  # watched directory -> watch descriptor
+        self._stamps: dict[Path, tuple] = {}
+        self._libc = _libc()
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+        self.watch(files, dirs)
+
+    def fileno(self) -> int | None:
+        return self._fd
+
+    def watch(self, files: Iterable[Path], dirs: Iterable[Path] = ()) -> None:
+        """Replace the watched set."""
+        self._files = {Path(f) for f in files}
+        self._dirs = {Path(d) for d in dirs}
+        self._stamps = self._scan()
+        if self._fd is None:
+            return
+        wanted = {f.parent for f in self._files} | self._dirs
+        for path in self._wds.keys() - wanted:
+            self._libc.inotify_rm_watch(self._fd, self._wds.pop(path))
+        for path in wanted - self._wds.keys():
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(path), ctypes.c_uint32(_IN_MASK)
+            )
+            if wd >= 0:  # a missing directory is simply not watched
+                self._wds[path] = wd
+
+    def _scan(self) -> dict[Path, tuple]:
+        stamps = {f: _stamp(f) for f in self._files}
+        for d in self._dirs:
+            try:
+                stamps.update((p, _stamp(p)) for p in d.glob("*.toml"))
+            except OSError:
+                pass
+        return stamps
+
+    def _relevant(self, path: Path) -> bool:
+        return path in self._files or (
+            path.parent in self._dirs and path.suffix == ".toml"
+        )
+
+    def read(self) -> set[Path]:
+        """Paths changed since the last call (never blocks)."""
+        if self._fd is None:
+            old, self._stamps = self._stamps, self._scan()
+            return {
+                p
+                for p in old.keys() | self._stamps.keys()
+                if old.get(p) != self._stamps.get(p)
+            }
+        dirs = {wd: path for path, wd in self._wds.items()}
+        changed: set[Path] = set()
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+            pos = 0
+            while pos < len(buf):
+                wd, _mask, _cookie, size = _EVENT.unpack_from(buf, pos)
+                pos += _EVENT.size
+                name = buf[pos : pos + size].rstrip(b"\0")
+                pos += size
+                if wd in dirs and name:
+                    path = dirs[wd] / os.fsdecode(name)
+                    if self._relevant(path):
+                        changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class LiveConfig:
+    """A loaded configuration that re-reads only the files that change.
+
+    Holds the same result as :func:`tmenu.config.load_config` in
+    :attr:`config`, :attr:`menu_items`, :attr:`submenus` and :attr:`title`.
+    """
+
+    def __init__(self, config_path: str | None = None):
+        path = _default_config_path(config_path)
+        # Without a config, watch the default location for one to appear.
+        self.path = Path(path) if path else _xdg_config_home() / "tmenu" / "config.toml"
+        self._data: dict = _load_toml(self.path) or {}
+        self._theme: tuple[Path, dict[str, tuple[int, int]]] | None = None
+        self._fragments: dict[Path, dict | None] = {}
+        self._read_theme()
+        self._read_theme_dir()
+        self._rebuild()
+
+    def watched(self) -> tuple[list[Path], list[Path]]:
+        """Files and ``theme_dir`` directories to watch."""
+        files = [self.path]
+        if self._theme is not None:
+            files.append(self._theme[0])
+        theme_dir = self._theme_dir()
+        return files, [theme_dir] if theme_dir is not None else []
+
+    def _display(self) -> dict:
+        display = self._data.get("display", {})
+        return display if isinstance(display, dict) else {}
+
+    def _theme_name(self) -> str:
+        return str(self._display().get("theme", "")).strip()
+
+    def _theme_dir(self) -> Path | None:
+        theme_dir = str(self._display().get("theme_dir", ""))
+        return Path(theme_dir).expanduser() if theme_dir else None
+
+    def _read_theme(self) -> None:
+        name = self._theme_name()
+        self._theme = None
+        if name:
+            from tmenu import theme_index
+
+            theme = theme_index.lookup(name)
+            if theme is not None:
+                self._theme = (Path(theme.path), theme.colors)
+
+    def _reread_theme_file(self) -> None:
+        """Parse just the theme file, without touching the theme index."""
+        from tmenu import theme_index
+
+        assert self._theme is not None
+        path = self._theme[0]
+        data = _load_toml(path)
+        if data is None:  # removed or mid-edit; keep the last good colors
+            return
+        colors = data.get("colors")
+        self._theme = (
+            path,
+            theme_index.resolve_colors(colors if isinstance(colors, dict) else {}),
+        )
+
+    def _read_theme_dir(self) -> None:
+        theme_dir = self._theme_dir()
+        self._fragments = {}
+        if theme_dir is not None and theme_dir.is_dir():
+            self._fragments = {f.path: f.data for f in _read_fragments(theme_dir)}
+
+    def _rebuild(self) -> None:
+        theme_colors = self._theme[1] if self._theme is not None else None
+        self.config, self.title = _build_config(self._data, theme_colors)
+        self.menu_items, self.submenus = _build_menus(self._data)
+        for path in sorted(self._fragments):
+            data = self._fragments[path]
+            if data is not None:
+                _merge_fragment(self.menu_items, self.submenus, data)
+
+    def update(self, changed: Iterable[Path]) -> set[str]:
+        """Re-read the *changed* files and rebuild.
+
+        Returns what differs from before: any of ``"colors"``,
+        ``"display"`` (the other config fields), ``"title"`` and
+        ``"menus"``.
+        """
+        changed = set(changed)
+        old_config, old_title = self.config, self.title
+        old_menus = (self.menu_items, self.submenus)
+
+        if self.path in changed:
+            theme_name, theme_dir = self._theme_name(), self._theme_dir()
+            data = _load_toml(self.path)
+            if data is None and self.path.exists():
+                return set()  # mid-edit syntax error; keep the last good config
+            self._data = data or {}
+            if self._theme_name() != theme_name:
+                self._read_theme()
+            if self._theme_dir() != theme_dir:
+                self._read_theme_dir()
+        if self._theme is not None and self._theme[0] in changed:
+            self._reread_theme_file()
+        theme_dir = self._theme_dir()
+        for path in changed:
+            if theme_dir is not None and path.parent == theme_dir:
+                data = _load_toml(path)
+                if data is not None:
+                    self._fragments[path] = data
+                elif not path.exists():
+                    self._fragments.pop(path, None)
+                # else a mid-edit syntax error; keep the last good parse
+
+        self._rebuild()
+        return _differences(old_config, self.config, old_title, self.title) | (
+            {"menus"} if old_menus != (self.menu_items, self.submenus) else set()
+        )
+
+
+def _differences(old: Config, new: Config, old_title: str, title: str) -> set[str]:
+    changes = set()
+    if old.truecolor != new.truecolor or any(
+        getattr(old, f) != getattr(new, f) for f in COLOR_FIELDS
+    ):
+        changes.add("colors")
+    fields = Config.__dataclass_fields__.keys() - set(COLOR_FIELDS) - {"truecolor"}
+    if any(getattr(old, f) != getattr(new, f) for f in fields):
+        changes.add("display")
+    if old_title != title:
+        changes.add("title")
+    return changes
@@ -0,0 +1,104 @@
+"""Terminal display width of item text.
+
+East Asian wide and fullwidth characters take two columns, combining marks
+and format characters none, everything else one. Characters the renderer
+replaces with U+FFFD (controls, undecodable bytes) count as one, and so
+does a tab, which the renderer draws as a single space.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+from array import array
+from functools import lru_cache
+from typing import Sequence
+
+_ZERO_WIDTH_CATEGORIES = frozenset({"Mn", "Me", "Cf"})
+_MAX_CUT_WIDTHS = 4  # row widths whose truncation points are kept
+
+
+@lru_cache(maxsize=8192)
+def char_width(ch: str) -> int:
+    # A soft hyphen is a format character that terminals still draw.
+    if unicodedata.category(ch) in _ZERO_WIDTH_CATEGORIES and ch != "\u00ad":
+        return 0
+    if unicodedata.east_asian_width(ch) in ("W", "F"):
+        return 2
+    return 1
+
+
+def display_width(text: str) -> int:
+    """Columns *text* takes on the terminal."""
+    if text.isascii():
+        return len(text)
+    return sum(map(char_width, text))
+
+
+def cut(text: str, width: int) -> tuple[int, int]:
+    """Length of the longest prefix of *text* that fits in *width* columns,
+    and the columns that prefix takes."""
+    if text.isascii():
+        end = min(len(text), width)
+        return end, end
+    cols = 0
+    for end, ch in enumerate(text):
+        w = char_width(ch)
+        if cols + w > width:
+            return end, cols
+        cols += w
+    return len(text), cols
+
+
+def tail(text: str, width: int) -> str:
+    """The longest suffix of *text* that fits in *width* columns."""
+    if width <= 0:
+        return ""
+    if text.isascii():
+        return text[-width:]
+    cols = 0
+    for start in range(len(text) - 1, -1, -1):
+        cols += char_width(text[start])
+        if cols > width:
+            return text[start + 1 :]
+    return text
+
+
+class WidthCache:
+    """Display widths of a sequence of items, measured once each.
+
+    Widths are measured lazily, the first time a row is drawn, so a
+    streamed or memory-mapped item set is never scanned as a whole. The
+    truncation point of each item that is too wide is kept per row width,
+    so steady-state redraws only slice.
+    """
+
+    def __init__(self, items: Sequence[str]):
+        self._items = items
+        self._widths = array("l")  # -1 until measured
+        self._cuts: dict[int, dict[int, tuple[int, int]]] = {}
+
+    def width(self, index: int) -> int:
+        widths = self._widths
+        if index >= len(widths):
+            # The item set only grows; cover it up to the row asked for.
+            widths.frombytes(b"\xff" * (widths.itemsize * (index + 1 - len(widths))))
+        w = widths[index]
+        if w < 0:
+            w = widths[index] = display_width(self._items[index])
+        return w
+
+    def fit(self, index: int, width: int) -> tuple[str, int]:
+        """Item *index* cut to at most *width* columns, and its width."""
+        item = self._items[index]
+        w = self.width(index)
+        if w <= width:
+            return item, w
+        cuts = self._cuts.get(width)
+        if cuts is None:
+            if len(self._cuts) >= _MAX_CUT_WIDTHS:
+                self._cuts.clear()
+            cuts = self._cuts[width] = {}
+        point = cuts.get(index)
+        if point is None:
+            point = cuts[index] = cut(item, width)
+        return item[: point[0]], point[1]
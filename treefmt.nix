@@ -5,7 +5,10 @@
     nixfmt.enable = true;
     prettier.enable = true;
     black.enable = true;
-    isort.enable = true;
+    isort = {
+      enable = true;
+      profile = "black";
+    };
     deadnix.enable = true;
     statix.enable = true;
   };